@@ -0,0 +1,99 @@
+"""
+Benchmark'lar için gerçekçi, sentetik upstream yanıtları üreten yardımcı programlar.
+
+Üretilen veriler marketfiyati.org.tr arama ve nearest API'lerinin yanıt biçimini
+taklit eder; aynı tohum (seed) ile her çalıştırmada aynı veriler üretilir.
+"""
+import json
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+_MARKETS = ["A101", "BIM", "Migros", "Şok", "CarrefourSA", "Hakmar", "Tarım Kredi", "Onur Market"]
+_BRANDS = ["Pınar", "Sütaş", "Ülker", "Eti", "Torku", "İçim", "Tat", "Tamek", "Dimes", "Komili"]
+_PRODUCTS = [
+    ("Tam Yağlı Süt", "L"), ("Yarım Yağlı Süt", "L"), ("Beyaz Peynir", "kg"), ("Kaşar Peyniri", "kg"),
+    ("Süzme Yoğurt", "kg"), ("Domates Salçası", "kg"), ("Ayçiçek Yağı", "L"), ("Zeytinyağı", "L"),
+    ("Toz Şeker", "kg"), ("Çay", "kg"), ("Yumurta 30'lu", "adet"), ("Bebek Bezi", "adet"),
+]
+_QUANTITIES = {
+    "L": [("1 L", 1.0), ("500 ml", 0.5), ("2 L", 2.0), ("200 ml", 0.2)],
+    "kg": [("1 kg", 1.0), ("500 g", 0.5), ("250 g", 0.25), ("830 g", 0.83)],
+    "adet": [("30 adet", 30.0), ("10 adet", 10.0), ("1 adet", 1.0)],
+}
+
+
+def _turkish_price(value: float) -> str:
+    return f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def make_depots(depot_count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Nearest API'sinin döndürdüğü biçimde, mesafeye göre sıralı market listesi üretir."""
+    rng = random.Random(seed)
+    depots = []
+    for i in range(depot_count):
+        depots.append({
+            "id": f"depot-{i:05d}",
+            "marketName": rng.choice(_MARKETS),
+            "latitude": 41.0 + rng.uniform(-0.05, 0.05),
+            "longitude": 29.0 + rng.uniform(-0.05, 0.05),
+            "distance": rng.uniform(50, 5000),
+        })
+    depots.sort(key=lambda d: d["distance"])
+    return depots
+
+
+def make_search_payload(
+    product_count: int, depots: List[Dict[str, Any]], coverage: float = 0.6, seed: int = 42,
+    keyword: Optional[str] = None, id_prefix: str = "product-",
+) -> Dict[str, Any]:
+    """
+    Arama API'sinin yanıt biçiminde sentetik bir gövde üretir.
+
+    Args:
+        product_count: Yanıttaki ürün sayısı.
+        depots: Ürünlerin bulunabileceği marketler.
+        coverage: Bir ürünün her markette bulunma olasılığı.
+        seed: Rastgele sayı üreteci tohumu.
+        keyword: Verilirse ürün adları bu kelimeyle üretilir (arama terimiyle eşleşen sonuçlar için).
+        id_prefix: Ürün kimliklerinin öneki; farklı aramaların ürünleri çakışmasın diye değiştirilebilir.
+    """
+    rng = random.Random(seed)
+    content = []
+    for i in range(product_count):
+        name, unit = _PRODUCTS[i % len(_PRODUCTS)]
+        if keyword:
+            name = f"{keyword.title()} {name}"
+        quantity, amount = rng.choice(_QUANTITIES[unit])
+        brand = rng.choice(_BRANDS)
+        base_price = rng.uniform(10, 400)
+        depot_infos = []
+        for depot in depots:
+            if rng.random() > coverage:
+                continue
+            price = round(base_price * rng.uniform(0.85, 1.2), 2)
+            unit_suffix = "adet" if unit == "adet" else unit
+            depot_infos.append({
+                "depotId": depot["id"],
+                "depotName": f"{depot['marketName']} {depot['id']}",
+                "price": price,
+                "unitPrice": f"{_turkish_price(price / amount)} ₺/{unit_suffix}",
+                "marketAdi": depot["marketName"],
+                "latitude": depot["latitude"],
+                "longitude": depot["longitude"],
+            })
+        content.append({
+            "id": f"{id_prefix}{i:06d}",
+            "title": f"{brand} {name} {quantity}",
+            "brand": brand,
+            "imageUrl": f"https://cdn.example.com/{i}.jpg",
+            "refinedQuantityUnit": quantity,
+            "productDepotInfoList": depot_infos,
+        })
+    return {"numberOfFound": product_count, "content": content}
+
+
+def make_scenario(product_count: int, depot_count: int, seed: int = 42) -> Tuple[List[Dict[str, Any]], bytes]:
+    """(market listesi, arama yanıtının ham JSON baytları) ikilisini döndürür."""
+    depots = make_depots(depot_count, seed)
+    payload = make_search_payload(product_count, depots, seed=seed)
+    return depots, json.dumps(payload, ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,259 @@
+"""
+Zenginleştirme ve sıralama sıcak yollarının (hot path) çevrimdışı CPU benchmark'ları.
+
+Her aşama (birim fiyat ayrıştırma, yanıt doğrulama, zenginleştirme, sıralama ve
+çıktı modeline dönüştürme) farklı ölçeklerdeki (ürün x market) sentetik yanıtlarla
+ayrı ayrı ölçülür; süre, verim (satır/sn) ve bellek ayırma (tracemalloc) raporlanır.
+Sonuçlar depoda bulunan temel çizgiyle (benchmarks/baseline.json) karşılaştırılır;
+gerileme varsa komut sıfırdan farklı bir çıkış koduyla biter. Temel çizgi başka bir
+makinede kaydedilmiş olabileceği için süreler, aynı çalıştırmada ölçülen sabit bir
+kalibrasyon iş yüküne oranlanarak karşılaştırılır.
+
+Kullanım:
+    python -m benchmarks.run_benchmarks                  # temel çizgiyle karşılaştırır
+    python -m benchmarks.run_benchmarks --save-baseline  # bilinçli bir değişiklikten sonra temel çizgiyi günceller
+"""
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+import click
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.payloads import make_scenario  # noqa: E402
+from client import MarketFiyatApiClient  # noqa: E402
+from models import DEPOT_FILTER_CONTEXT_KEY, ApiSearchResponse, ShoppingListResult  # noqa: E402
+from utils.pricing import normalize_unit_price, parse_unit_price  # noqa: E402
+from utils.ranking import rank_records  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SCALES = "20x10,100x50,500x200"
+# Temel çizgi dosyasında kalibrasyon ölçümünün tutulduğu anahtar.
+CALIBRATION_KEY = "_calibration"
+
+
+class StageResult(NamedTuple):
+    """Bir aşamanın tek bir ölçekteki ölçüm sonucu."""
+    median_s: float
+    min_s: float
+    rows: int
+    peak_bytes: int
+
+    @property
+    def rows_per_s(self) -> float:
+        return self.rows / self.median_s if self.median_s else float("inf")
+
+
+def _time_stage(func: Callable[[], Any], repeat: int, min_time: float) -> Tuple[float, float]:
+    """
+    Fonksiyonu, her tekrar en az `min_time` saniye sürecek kadar art arda çalıştırır.
+
+    Returns:
+        (tek çağrının medyan süresi, en kısa süresi) ikilisi.
+    """
+    func()  # ısınma
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1 << 20:
+            break
+        number *= 2
+    samples = [elapsed / number]
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat - 1):
+            started = time.perf_counter()
+            for _ in range(number):
+                func()
+            samples.append((time.perf_counter() - started) / number)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return statistics.median(samples), min(samples)
+
+
+def _peak_allocation(func: Callable[[], Any]) -> int:
+    """Fonksiyonun tek bir çağrısı sırasında ayrılan en yüksek bellek miktarını (bayt) döndürür."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return max(0, peak - baseline)
+
+
+def _calibration_workload() -> int:
+    """Makinenin hızını ölçmek için kullanılan, projeden bağımsız sabit bir Python iş yükü."""
+    values = [(i * 7919) % 10007 for i in range(20000)]
+    index = {v: str(v) for v in values}
+    return sum(len(index[v]) for v in sorted(values))
+
+
+def build_stages(product_count: int, depot_count: int) -> Dict[str, Tuple[Callable[[], Any], int]]:
+    """Bir ölçek için ölçülecek aşamaları {ad: (fonksiyon, işlenen satır sayısı)} olarak hazırlar."""
+    depots, raw = make_scenario(product_count, depot_count)
+    # Gerçek kullanımda olduğu gibi marketlerin bir kısmı yarıçap dışında kalır ve ayrıştırmada elenir.
+    nearby = depots[: max(1, len(depots) * 3 // 4)]
+    context = {DEPOT_FILTER_CONTEXT_KEY: {d["id"] for d in nearby}}
+    store_map = {d["id"]: d for d in nearby}
+
+    response = ApiSearchResponse.model_validate_json(raw, context=context)
+    unit_prices = [d.unit_price for item in response.content for d in item.product_depot_info_list]
+    records = MarketFiyatApiClient._enrich_response("süt", response, store_map)
+    raw_normalize = normalize_unit_price.__wrapped__
+
+    def serialize():
+        top = rank_records(records, "price", 100)
+        return ShoppingListResult(
+            products=[r.to_detailed_price() for r in top], found_prices_count=len(top)
+        ).model_dump_json()
+
+    return {
+        "parse_unit_price": (lambda: [parse_unit_price(u) for u in unit_prices], len(unit_prices)),
+        "normalize_unit_price_cold": (lambda: [raw_normalize(u) for u in unit_prices], len(unit_prices)),
+        "validate_response": (lambda: ApiSearchResponse.model_validate_json(raw, context=context), len(unit_prices)),
+        "enrich": (lambda: MarketFiyatApiClient._enrich_response("süt", response, store_map), len(records)),
+        "rank_price_top20": (lambda: rank_records(records, "price", 20), len(records)),
+        "rank_unit_price_full": (lambda: rank_records(records, "unit_price"), len(records)),
+        "rank_per_product_top5": (lambda: rank_records(records, "price", 5, per_product=True), len(records)),
+        "serialize_top100": (serialize, min(100, len(records))),
+    }
+
+
+def _calibrate(repeat: int, min_time: float) -> float:
+    """Kalibrasyon iş yükünün en kısa süresini döndürür."""
+    return _time_stage(_calibration_workload, repeat, min_time)[1]
+
+
+def run(scales: List[Tuple[int, int]], repeat: int, min_time: float) -> Tuple[Dict[str, StageResult], float]:
+    """
+    Aşamaları ölçer. Makine yükü çalıştırma boyunca değişebildiği için kalibrasyon her
+    ölçekten önce ve sonda yeniden ölçülür; aşamalarla tutarlı olarak en kısa süre kullanılır.
+
+    Returns:
+        (ölçüm sonuçları, kalibrasyon iş yükünün en kısa süresi) ikilisi.
+    """
+    results: Dict[str, StageResult] = {}
+    calibrations = []
+    for product_count, depot_count in scales:
+        calibrations.append(_calibrate(repeat, min_time))
+        scale = f"{product_count}x{depot_count}"
+        for stage, (func, rows) in build_stages(product_count, depot_count).items():
+            median_s, min_s = _time_stage(func, repeat, min_time)
+            results[f"{scale}/{stage}"] = StageResult(median_s, min_s, rows, _peak_allocation(func))
+    calibrations.append(_calibrate(repeat, min_time))
+    return results, min(calibrations)
+
+
+def _speed_ratio(baseline: Dict[str, Dict[str, float]], calibration_s: float) -> float:
+    """Bu makinenin, temel çizginin kaydedildiği makineye göre yavaşlık oranını döndürür."""
+    base = baseline.get(CALIBRATION_KEY)
+    if not base or not base.get("min_s") or not calibration_s:
+        return 1.0
+    return calibration_s / base["min_s"]
+
+
+def compare(
+    results: Dict[str, StageResult], baseline: Dict[str, Dict[str, float]], tolerance: float, memory_tolerance: float,
+    calibration_s: float = 0.0,
+) -> List[str]:
+    """Temel çizgiye göre (makine hızına oranlanmış) gerileyen ölçümlerin açıklamalarını döndürür."""
+    ratio = _speed_ratio(baseline, calibration_s)
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        # Gürültüye en az duyarlı değer en kısa süre olduğu için karşılaştırma onunla yapılır.
+        expected_s = base["min_s"] * ratio
+        if result.min_s > expected_s * (1 + tolerance):
+            regressions.append(
+                f"{name}: süre {expected_s * 1e6:.1f} µs -> {result.min_s * 1e6:.1f} µs "
+                f"(+{(result.min_s / expected_s - 1) * 100:.0f}%)"
+            )
+        if base.get("peak_bytes") and result.peak_bytes > base["peak_bytes"] * (1 + memory_tolerance):
+            regressions.append(
+                f"{name}: bellek {base['peak_bytes'] / 1024:.1f} KiB -> {result.peak_bytes / 1024:.1f} KiB"
+            )
+    return regressions
+
+
+def _parse_scales(spec: str) -> List[Tuple[int, int]]:
+    scales = []
+    for part in spec.split(","):
+        products, depots = part.lower().split("x")
+        scales.append((int(products), int(depots)))
+    return scales
+
+
+def _print_table(results: Dict[str, StageResult], baseline: Dict[str, Dict[str, float]], ratio: float) -> None:
+    header = f"{'benchmark':<42} {'medyan':>12} {'en kısa':>12} {'satır/sn':>14} {'tepe bellek':>12} {'fark':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        base = baseline.get(name)
+        delta = f"{(r.min_s / (base['min_s'] * ratio) - 1) * 100:+.0f}%" if base else "-"
+        print(
+            f"{name:<42} {r.median_s * 1e6:>10.1f}µs {r.min_s * 1e6:>10.1f}µs "
+            f"{r.rows_per_s:>14,.0f} {r.peak_bytes / 1024:>9.1f}KiB {delta:>8}"
+        )
+
+
+@click.command()
+@click.option('--scales', default=DEFAULT_SCALES, help='Virgülle ayrılmış "ürün x market" ölçekleri, örn. 20x10,500x200.')
+@click.option('--repeat', default=7, help='Her aşama için ölçüm tekrarı sayısı.')
+@click.option('--min-time', default=0.05, help='Bir ölçüm tekrarının en az süresi (saniye).')
+@click.option('--baseline', 'baseline_path', default=DEFAULT_BASELINE, help='Temel çizgi (baseline) JSON dosyası.')
+@click.option('--save-baseline', is_flag=True, help='Sonuçları temel çizgi olarak kaydeder.')
+@click.option('--tolerance', default=0.25, help='Süredeki izin verilen en fazla artış oranı.')
+@click.option('--memory-tolerance', default=0.25, help='Tepe bellekteki izin verilen en fazla artış oranı.')
+def main(scales, repeat, min_time, baseline_path, save_baseline, tolerance, memory_tolerance):
+    """Sıcak yolları ölçer ve temel çizgiyle karşılaştırır."""
+    results, calibration_s = run(_parse_scales(scales), max(repeat, 1), min_time)
+
+    baseline: Dict[str, Dict[str, float]] = {}
+    if os.path.exists(baseline_path) and not save_baseline:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    ratio = _speed_ratio(baseline, calibration_s)
+    if baseline:
+        print(f"Makine hızı oranı (bu makine / temel çizgi): {ratio:.2f}\n")
+    _print_table(results, baseline, ratio)
+
+    if save_baseline:
+        saved = {CALIBRATION_KEY: {"min_s": calibration_s}}
+        saved.update((name, r._asdict()) for name, r in results.items())
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(saved, f, indent=2)
+            f.write("\n")
+        print(f"\nTemel çizgi '{baseline_path}' dosyasına kaydedildi.")
+        return
+    if not baseline:
+        print(f"\nTemel çizgi bulunamadı ('{baseline_path}'); kaydetmek için --save-baseline kullanın.")
+        sys.exit(1)
+
+    regressions = compare(results, baseline, tolerance, memory_tolerance, calibration_s)
+    if regressions:
+        print("\nGERİLEME TESPİT EDİLDİ:")
+        for line in regressions:
+            print(f"  - {line}")
+        sys.exit(1)
+    print("\nTemel çizgiye göre gerileme yok.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,90 @@
 # client.py (Başlıklar olmadan, sadece resim URL'si eklenmiş versiyon)
 
 import os
+import json
 import asyncio
+import hashlib
+import importlib.util
+import time
+import logging
 import httpx
 from dotenv import load_dotenv
-from typing import List, Optional, Dict, Any
+from typing import Any, Awaitable, Callable, Container, Dict, List, NamedTuple, Optional, Set, Tuple
 
 # .env dosyasındaki değişkenleri yükle
 load_dotenv()
 
 # Güncellediğimiz modelleri import ediyoruz
-from models import ApiSearchResponse, DetailedProductPrice
+from models import DEPOT_FILTER_CONTEXT_KEY, ApiSearchResponse, ContentItem, PriceRecord, ShoppingListJob
+from utils.cache import TTLCache
+from utils.geo import DepotRegistry, NearestStoreCache, stores_within
+from utils.metrics import MetricsRegistry
+from utils.shared_cache import SharedCache
+from utils.singleflight import SingleFlight
+from utils.snapshot import PriceSnapshotStore
+from utils.text import QueryCanonicalizer, RelevanceIndex, load_synonyms
+from utils.upstream import UpstreamExecutor
+
+# Sunucunun "MCP_Server" logger'ının alt logger'ı; kayıtlar sunucu loglarına (dosya ve konsol) yazılır.
+logger = logging.getLogger("MCP_Server.client")
+
+
+class ShoppingListSearch(NamedTuple):
+    """`find_products_in_shopping_list` sonucu: bulunan fiyat kayıtları ve süre aşımına uğrayan ürünler."""
+    records: List[PriceRecord]
+    timed_out_products: List[str]
+
+def _depot_set_hash(depot_ids: List[str]) -> str:
+    """Market ID kümesi için sıralamadan bağımsız, kararlı bir özet üretir."""
+    joined = "\n".join(sorted(set(depot_ids)))
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()
+
+def _merge_search_responses(responses: List[ApiSearchResponse]) -> ApiSearchResponse:
+    """
+    Farklı market grupları veya sayfalar için dönen yanıtları tek bir yanıtta birleştirir.
+    Aynı ürün birden fazla yanıtta geçiyorsa market fiyatları tek üründe toplanır.
+    """
+    merged: Dict[Any, ContentItem] = {}
+    for response in responses:
+        for item in response.content:
+            item_key = item.id or (item.title, item.brand, item.refined_quantity_unit)
+            existing = merged.get(item_key)
+            if existing is None:
+                merged[item_key] = item
+                continue
+            known_depots = {d.depot_id for d in existing.product_depot_info_list}
+            new_depots = [d for d in item.product_depot_info_list if d.depot_id not in known_depots]
+            if new_depots:
+                # Önbellekteki nesneler paylaşıldığı için yerinde değiştirmek yerine kopyalıyoruz.
+                merged[item_key] = existing.model_copy(
+                    update={"product_depot_info_list": existing.product_depot_info_list + new_depots}
+                )
+    return ApiSearchResponse(content=list(merged.values()))
+
+def build_http_client() -> httpx.AsyncClient:
+    """
+    Upstream için bağlantı havuzu ve keep-alive ayarlı bir httpx istemcisi oluşturur.
+    UPSTREAM_HTTP2=auto (varsayılan) iken HTTP/2 yalnızca `h2` paketi kuruluysa açılır.
+    """
+    http2_setting = os.getenv("UPSTREAM_HTTP2", "auto").lower()
+    h2_installed = importlib.util.find_spec("h2") is not None
+    http2 = h2_installed if http2_setting == "auto" else http2_setting in ("1", "true", "yes")
+    if http2 and not h2_installed:
+        logger.warning("UPSTREAM_HTTP2 açık ama 'h2' paketi kurulu değil; HTTP/1.1 kullanılacak (pip install 'httpx[http2]').")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=int(os.getenv("UPSTREAM_MAX_CONNECTIONS", 100)),
+        max_keepalive_connections=int(os.getenv("UPSTREAM_MAX_KEEPALIVE_CONNECTIONS", 20)),
+        keepalive_expiry=float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY_SECONDS", 30.0)),
+    )
+    return httpx.AsyncClient(
+        timeout=float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", 30.0)), limits=limits, http2=http2
+    )
 
 class MarketFiyatApiClient:
     def __init__(self):
-        self.client = httpx.AsyncClient(timeout=30.0)
+        # httpx istemcisi ilk upstream isteğinde, isteği yapan sürecin ve olay döngüsünün içinde oluşturulur.
+        self._client: Optional[httpx.AsyncClient] = None
         
         self.nearest_url = os.getenv("NEAREST_API_URL")
         self.search_url = os.getenv("SEARCH_API_URL")
@@ -22,65 +92,599 @@ class MarketFiyatApiClient:
         if not self.nearest_url or not self.search_url:
             raise ValueError(".env dosyasında NEAREST_API_URL ve SEARCH_API_URL tanımlanmalıdır.")
 
+        # Aşama süreleri, upstream durum kodları ve yanıt boyutları için ölçümler (METRICS_ENABLED=false ile kapatılır).
+        self.metrics = MetricsRegistry(enabled=os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes"))
+
+        # Tüm upstream istekleri host bazında uyarlanabilir eş zamanlılık sınırı,
+        # yeniden deneme ve devre kesici üzerinden yürütülür.
+        self.upstream = UpstreamExecutor(
+            lambda: self.client,
+            max_retries=int(os.getenv("UPSTREAM_MAX_RETRIES", 2)),
+            backoff_base=float(os.getenv("UPSTREAM_BACKOFF_BASE_SECONDS", 0.2)),
+            backoff_max=float(os.getenv("UPSTREAM_BACKOFF_MAX_SECONDS", 2.0)),
+            initial_limit=int(os.getenv("UPSTREAM_CONCURRENCY_INITIAL", 16)),
+            min_limit=int(os.getenv("UPSTREAM_CONCURRENCY_MIN", 2)),
+            max_limit=int(os.getenv("UPSTREAM_CONCURRENCY_MAX", 64)),
+            target_latency=float(os.getenv("UPSTREAM_TARGET_LATENCY_SECONDS", 1.0)),
+            failure_threshold=int(os.getenv("UPSTREAM_BREAKER_FAILURES", 5)),
+            reset_timeout=float(os.getenv("UPSTREAM_BREAKER_RESET_SECONDS", 15.0)),
+            metrics=self.metrics,
+        )
+
+        # En yakın market sonuçları coğrafi karolara göre önbelleğe alınır.
+        self.nearest_ttl = float(os.getenv("NEAREST_CACHE_TTL_SECONDS", 600))
+        self.nearest_cache = NearestStoreCache(
+            tile_deg=float(os.getenv("NEAREST_CACHE_TILE_DEG", 0.002)),
+            maxsize=int(os.getenv("NEAREST_CACHE_MAXSIZE", 2048)),
+            ttl=self.nearest_ttl,
+        )
+
+        # Nearest yanıtlarından ve arama sonuçlarındaki market koordinatlarından beslenen yerel
+        # market kaydı. Daha önce taranmış bir bölgenin içindeki sorgular API'ye gitmeden,
+        # mesafeler yerel olarak hesaplanarak yanıtlanır.
+        self.depot_registry = None
+        if os.getenv("DEPOT_REGISTRY_ENABLED", "true").lower() in ("1", "true", "yes"):
+            self.depot_registry = DepotRegistry(
+                cell_deg=float(os.getenv("DEPOT_REGISTRY_CELL_DEG", 0.01)),
+                coverage_ttl=float(os.getenv("DEPOT_REGISTRY_TTL_SECONDS", 86400)),
+            )
+
+        # Arama sonuçları (kelime, market kümesi) anahtarıyla önbelleğe alınır.
+        # TTL dolduktan sonra kayıt bir süre daha bayat olarak sunulur ve arka planda yenilenir.
+        self.search_cache = TTLCache(
+            maxsize=int(os.getenv("SEARCH_CACHE_MAXSIZE", 4096)),
+            ttl=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", 300)),
+            stale_ttl=float(os.getenv("SEARCH_CACHE_STALE_SECONDS", 900)),
+        )
+        self._refresh_tasks: Dict[Any, asyncio.Task] = {}
+
+        # İsteğe bağlı disk deposu: arama sonuçları SQLite'a yazılır, market bazında tazelik
+        # takip edilir ve yalnızca eskiyen marketler upstream'den yeniden istenir.
+        snapshot_path = os.getenv("PRICE_SNAPSHOT_DB")
+        self.snapshot_store = PriceSnapshotStore(snapshot_path) if snapshot_path else None
+        self.snapshot_max_age = float(os.getenv("PRICE_SNAPSHOT_MAX_AGE_SECONDS", 900))
+
+        # Ürün adları Türkçe kurallarıyla sadeleştirilir; "Süt", "sut " ve "SÜT" aynı önbellek
+        # anahtarını ve aynı upstream isteğini paylaşır. Eş anlamlılar tablosu bir JSON dosyasıyla genişletilebilir.
+        self.canonicalizer = QueryCanonicalizer(load_synonyms(os.getenv("QUERY_SYNONYMS_FILE")))
+        # Arama sonuçları, sorgu kelimelerinin en az bu oranı başlık/markada geçmiyorsa elenir (0 = süzme yok).
+        self.min_relevance = float(os.getenv("SEARCH_MIN_RELEVANCE", 0.5))
+
+        # Aynı anda gelen özdeş nearest/search istekleri tek bir upstream isteğini paylaşır.
+        self._inflight = SingleFlight()
+
+        # İsteğe bağlı, çalışanlar (worker) arası paylaşılan disk önbelleği: bellekte bulunamayan
+        # nearest ve arama sonuçları önce buradan okunur; aynı isteği yalnızca bir çalışan yapar.
+        shared_cache_path = os.getenv("SHARED_CACHE_DB")
+        self.shared_cache = SharedCache(
+            shared_cache_path, lease_seconds=float(os.getenv("SHARED_CACHE_LEASE_SECONDS", 10))
+        ) if shared_cache_path else None
+
+        # Geniş yarıçaplarda market listesi gruplara bölünüp paralel aranır (0 = bölme yok).
+        self.depot_batch_size = int(os.getenv("SEARCH_DEPOT_BATCH_SIZE", 0))
+        self.page_size = int(os.getenv("SEARCH_PAGE_SIZE", 20))
+        # `limit` ilk sayfadan fazlasını gerektirdiğinde en fazla kaç sayfa çekileceği.
+        self.max_pages = int(os.getenv("SEARCH_MAX_PAGES", 5))
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Upstream httpx istemcisi; ilk kullanımda oluşturulur."""
+        if self._client is None:
+            self._client = build_http_client()
+        return self._client
+
+    def normalize_keyword(self, keyword: str) -> str:
+        """Arama kelimesinin önbellek ve istatistiklerde kullanılan normalize biçimini döndürür."""
+        return self.canonicalizer.canonicalize(keyword).key
+
+    def _cached_tile_stores(self, latitude: float, longitude: float, radius_km: int) -> Optional[List[Dict[str, Any]]]:
+        """Karonun market kümesini yalnızca yerel kayıttan veya önbellekten döndürür."""
+        if self.depot_registry is not None:
+            _, tile_lat, tile_lon = self.nearest_cache.snap(latitude, longitude)
+            local_stores = self.depot_registry.find_within(
+                tile_lat, tile_lon, radius_km + self.nearest_cache.padding_km
+            )
+            if local_stores is not None:
+                return local_stores
+        return self.nearest_cache.get_tile(latitude, longitude, radius_km)
+
+    async def _find_tile_stores(self, latitude: float, longitude: float, radius_km: int) -> List[Dict[str, Any]]:
+        """
+        Koordinatın karosundaki herhangi bir noktadan `radius_km` içinde kalabilecek marketleri
+        önce yerel kayıttan veya önbellekten, yoksa API'den getirir. Aynı karodaki tüm
+        kullanıcılar aynı kümeyi alır; böylece arama, disk ve paylaşılan önbellek anahtarları
+        da aynı olur. Kullanıcının kendi yarıçapına göre süzme sonuç satırlarında yapılır.
+        """
+        cached_stores = self._cached_tile_stores(latitude, longitude, radius_km)
+        if cached_stores is not None:
+            return cached_stores
+
+        # Sorgu, karo merkezine sabitlenir ki aynı karodaki tüm istekler aynı sonucu paylaşsın. Yarıçap
+        # karonun yarım köşegeni kadar genişletilir; böylece karodaki her nokta için istenen daire kapsanır.
+        tile, tile_lat, tile_lon = self.nearest_cache.snap(latitude, longitude)
+        query_radius_km = self.nearest_cache.query_radius(radius_km)
+        nearest_payload = {"latitude": tile_lat, "longitude": tile_lon, "distance": query_radius_km}
+
+        async def _fetch_upstream() -> Tuple[List[Dict[str, Any]], bool]:
+            with self.metrics.stage("nearest"):
+                response_nearest = await self.upstream.post(self.nearest_url, json=nearest_payload)
+            self.metrics.payload_bytes.observe(len(response_nearest.content), "nearest")
+            return response_nearest.json(), True
+
+        async def _fetch() -> List[Dict[str, Any]]:
+            nearby_stores, _, _ = await self._shared_fetch(
+                f"nearest:{tile[0]}:{tile[1]}:{radius_km}", self.nearest_ttl, _fetch_upstream,
+                encode=lambda stores: json.dumps(stores).encode("utf-8"), decode=json.loads,
+            )
+            self.nearest_cache.set(latitude, longitude, radius_km, nearby_stores)
+            if self.depot_registry is not None:
+                # Upstream'in taradığı daire genişletilmiş yarıçaplı olandır; karodaki her nokta bunun içindedir.
+                self.depot_registry.add_stores(nearby_stores, tile_lat, tile_lon, query_radius_km)
+            return nearby_stores
+
+        nearby_stores = await self._inflight.do(("nearest", tile, radius_km), _fetch)
+        return stores_within(nearby_stores, tile_lat, tile_lon, radius_km + self.nearest_cache.padding_km)
+
+    async def _find_nearby_stores(self, latitude: float, longitude: float, radius_km: int) -> List[Dict[str, Any]]:
+        """Yarıçap içindeki marketleri, mesafeleri kullanıcının kendi konumundan hesaplanmış olarak döndürür."""
+        tile_stores = await self._find_tile_stores(latitude, longitude, radius_km)
+        return stores_within(tile_stores, latitude, longitude, radius_km)
+
+    async def _post_search(self, payload: Dict[str, Any]) -> ApiSearchResponse:
+        """
+        Arama isteğini API'ye gönderir ve yanıtı ham baytlardan doğrudan doğrular.
+        İstekte olmayan marketler ayrıştırma sırasında elenir.
+        """
+        with self.metrics.stage("search_upstream"):
+            response = await self.upstream.post(self.search_url, json=payload)
+        self.metrics.payload_bytes.observe(len(response.content), "search")
+        with self.metrics.stage("search_validate"):
+            api_response = ApiSearchResponse.model_validate_json(
+                response.content, context={DEPOT_FILTER_CONTEXT_KEY: set(payload["depots"])}
+            )
+        if self.depot_registry is not None:
+            for item in api_response.content:
+                for depot_info in item.product_depot_info_list:
+                    self.depot_registry.add_depot_location(depot_info.depot_id, depot_info.latitude, depot_info.longitude)
+        return api_response
+
+    async def _load_search(self, payload: Dict[str, Any]) -> Tuple[ApiSearchResponse, bool]:
+        """
+        Arama sonucunu disk deposu üzerinden yükler: sayfa diskte tazeyse oradan okunur,
+        değilse API'ye sorulur ve sonuç depoya yazılır. API'ye ulaşılamazsa aynı sayfanın
+        diskteki eski hali kullanılır.
+
+        Returns:
+            (yanıt, eski_veriden_mi) ikilisi.
+        """
+        if self.snapshot_store is None:
+            return await self._post_search(payload), False
+
+        keyword = self.normalize_keyword(payload["keywords"])
+        depot_set = _depot_set_hash(payload["depots"])
+        page, size = payload["pages"], payload["size"]
+        with self.metrics.stage("snapshot_read"):
+            stored = await asyncio.to_thread(
+                self.snapshot_store.read, keyword, depot_set, page, size, self.snapshot_max_age
+            )
+        if stored is not None:
+            return stored, False
+
+        try:
+            fetched = await self._post_search(payload)
+        except Exception as e:
+            fallback = await asyncio.to_thread(self.snapshot_store.read, keyword, depot_set, page, size, None)
+            if fallback is None:
+                raise
+            logger.warning(f"'{payload['keywords']}' için API'ye ulaşılamadı, diskteki eski fiyatlar kullanılıyor: {e}")
+            return fallback, True
+
+        with self.metrics.stage("snapshot_write"):
+            await asyncio.to_thread(self.snapshot_store.write, keyword, depot_set, page, size, fetched)
+        return fetched, False
+
+    async def _shared_fetch(
+        self,
+        key: str,
+        ttl: float,
+        fetch: Callable[[], Awaitable[Tuple[Any, bool]]],
+        encode: Callable[[Any], bytes],
+        decode: Callable[[bytes], Any],
+        min_fresh: float = 0.0,
+    ) -> Tuple[Any, bool, float]:
+        """
+        Değeri çalışanlar arası paylaşılan önbellekten okur; yoksa kirayı alıp `fetch` ile
+        getirir ve önbelleğe yazar. Kira başka bir çalışandaysa onun sonucu beklenir.
+
+        Args:
+            key: Paylaşılan önbellek anahtarı.
+            ttl: Yeni getirilen değerin taze kalma süresi.
+            fetch: (değer, önbelleğe_alınabilir_mi) döndüren getirme fonksiyonu.
+            encode: Değeri baytlara çeviren fonksiyon.
+            decode: Baytlardan değeri üreten fonksiyon.
+            min_fresh: Paylaşılan kaydın en az bu kadar saniye daha taze olması gerekir.
+
+        Returns:
+            (değer, önbelleğe_alınabilir_mi, kalan tazelik süresi) üçlüsü.
+        """
+        store = self.shared_cache
+        if store is None:
+            value, cacheable = await fetch()
+            return value, cacheable, ttl
+
+        give_up_at = time.monotonic() + store.lease_seconds
+        claimed = False
+        first_lookup = True
+        while True:
+            # İsabet/ıska mantıksal arama başına bir kez sayılır; kira beklerken yapılan okumalar sayılmaz.
+            hit = await asyncio.to_thread(store.get, key, min_fresh, first_lookup)
+            first_lookup = False
+            if hit is not None:
+                return decode(hit[0]), True, hit[1]
+            if time.monotonic() >= give_up_at:
+                break
+            claimed = await asyncio.to_thread(store.claim, key)
+            if claimed:
+                break
+            await asyncio.sleep(store.poll_interval)
+
+        try:
+            value, cacheable = await fetch()
+            if cacheable:
+                await asyncio.to_thread(store.set, key, encode(value), ttl)
+            return value, cacheable, ttl
+        finally:
+            if claimed:
+                await asyncio.to_thread(store.release, key)
+
+    async def _fetch_search(self, cache_key: Any, payload: Dict[str, Any], min_fresh: float = 0.0) -> ApiSearchResponse:
+        """Arama isteğini, özdeş eş zamanlı isteklerle paylaşarak yapar ve önbelleğe yazar."""
+        async def _load() -> Tuple[ApiSearchResponse, bool]:
+            api_response, from_fallback = await self._load_search(payload)
+            # Kesinti sırasında sunulan eski veri, API düzelince hemen yenilenebilsin diye önbelleğe alınmaz.
+            return api_response, not from_fallback
+
+        async def _fetch() -> ApiSearchResponse:
+            api_response, cacheable, ttl = await self._shared_fetch(
+                "search:" + "|".join(str(part) for part in cache_key), self.search_cache.ttl, _load,
+                encode=lambda response: response.model_dump_json(by_alias=True).encode("utf-8"),
+                decode=ApiSearchResponse.model_validate_json, min_fresh=min_fresh,
+            )
+            if cacheable:
+                self.search_cache.set(cache_key, api_response, ttl=ttl)
+            return api_response
+
+        return await self._inflight.do(("search",) + cache_key, _fetch)
+
+    async def _refresh_search(self, cache_key: Any, payload: Dict[str, Any]) -> None:
+        """Bayat bir arama kaydını arka planda yeniler."""
+        try:
+            await self._fetch_search(cache_key, payload)
+        except Exception as e:
+            logger.warning(f"'{payload['keywords']}' araması arka planda yenilenirken hata: {e}")
+        finally:
+            self._refresh_tasks.pop(cache_key, None)
+
+    def _search_request(self, product_name: str, depot_ids: List[str], page: int) -> Tuple[Any, Dict[str, Any]]:
+        """Bir sonuç sayfası için önbellek anahtarını ve API payload'unu üretir."""
+        canonical = self.canonicalizer.canonicalize(product_name)
+        payload = {"keywords": canonical.query, "depots": depot_ids, "pages": page, "size": self.page_size}
+        cache_key = (canonical.key, _depot_set_hash(depot_ids), page, self.page_size)
+        return cache_key, payload
+
+    async def _search_page(self, product_name: str, depot_ids: List[str], page: int) -> ApiSearchResponse:
+        """Bir ürünün tek bir sonuç sayfasını arar; mümkünse sonucu önbellekten sunar."""
+        cache_key, payload = self._search_request(product_name, depot_ids, page)
+
+        entry = self.search_cache.get_entry(cache_key)
+        if entry is not None:
+            cached_response, is_stale = entry
+            if is_stale and cache_key not in self._refresh_tasks:
+                self._refresh_tasks[cache_key] = asyncio.create_task(self._refresh_search(cache_key, payload))
+            return cached_response
+
+        return await self._fetch_search(cache_key, payload)
+
+    def _depot_batches(self, depot_ids: List[str]) -> List[List[str]]:
+        """Market listesini yapılandırılmış boyutta gruplara böler."""
+        size = self.depot_batch_size
+        if size <= 0 or len(depot_ids) <= size:
+            return [depot_ids]
+        return [depot_ids[i:i + size] for i in range(0, len(depot_ids), size)]
+
+    def _has_more_pages(self, response: ApiSearchResponse, page: int) -> bool:
+        """Upstream'in bu sayfadan sonra da sonuç döndüreceğini gösteren bilgilere bakar."""
+        if len(response.content) < self.page_size:
+            return False
+        return response.number_of_found is None or (page + 1) * self.page_size < response.number_of_found
+
+    async def _search_product(
+        self, product_name: str, depot_ids: List[str], limit: Optional[int] = None,
+        row_depots: Optional[Container[str]] = None,
+    ) -> ApiSearchResponse:
+        """
+        Bir ürünü verilen marketlerde arar. Market listesi gruplara bölünüp paralel
+        aranır; her grupta, yarıçap içindeki fiyat satırı sayısı `limit`e ulaşana ve
+        upstream daha fazla sonuç olduğunu bildirdiği sürece sonraki sayfalar da çekilir.
+        `row_depots` verilirse yalnızca bu marketlerin (kullanıcının yarıçapındakilerin)
+        satırları sayılır.
+        """
+        async def _search_batch(batch: List[str]) -> List[ApiSearchResponse]:
+            responses = []
+            rows = 0
+            for page in range(max(1, self.max_pages)):
+                response = await self._search_page(product_name, batch, page)
+                responses.append(response)
+                # Yanıttaki market listeleri ayrıştırmada istenen marketlere göre süzüldüğü için
+                # buradaki sayı, sonuçta kullanılabilecek fiyat satırı sayısıdır.
+                rows += sum(
+                    len(item.product_depot_info_list) if row_depots is None
+                    else sum(1 for d in item.product_depot_info_list if d.depot_id in row_depots)
+                    for item in response.content
+                )
+                if not limit or rows >= limit or not self._has_more_pages(response, page):
+                    break
+            return responses
+
+        batch_results = await asyncio.gather(
+            *[_search_batch(batch) for batch in self._depot_batches(depot_ids)], return_exceptions=True
+        )
+        errors = [r for r in batch_results if isinstance(r, BaseException)]
+        if len(errors) == len(batch_results):
+            raise errors[0]
+        for error in errors:
+            logger.warning(f"'{product_name}' ürünü bir market grubunda aranırken hata: {error}")
+
+        responses = [r for batch in batch_results if not isinstance(batch, BaseException) for r in batch]
+        merged = responses[0] if len(responses) == 1 else _merge_search_responses(responses)
+        return self._filter_relevant(product_name, merged)
+
+    def _filter_relevant(self, product_name: str, response: ApiSearchResponse) -> ApiSearchResponse:
+        """
+        Başlığında veya markasında sorgu kelimeleri yeterince geçmeyen ürünleri, zenginleştirme
+        ve sıralamadan önce eler. Hiçbir ürün eşleşmezse upstream sonucu olduğu gibi bırakılır.
+        """
+        if self.min_relevance <= 0 or not response.content:
+            return response
+        with self.metrics.stage("relevance_filter"):
+            index = RelevanceIndex((item.title, item.brand) for item in response.content)
+            scores = index.scores(self.canonicalizer.canonicalize(product_name).query)
+        relevant = [item for item, score in zip(response.content, scores) if score >= self.min_relevance]
+        if not relevant or len(relevant) == len(response.content):
+            return response
+        # Önbellekteki yanıt paylaşıldığı için yerinde değiştirmek yerine yeni bir yanıt oluşturulur.
+        return ApiSearchResponse.model_construct(content=relevant, number_of_found=response.number_of_found)
+
+    async def prefetch(
+        self, product_name: str, latitude: float, longitude: float, radius_km: int, refresh_margin: float
+    ) -> None:
+        """
+        Bir ürünün ilk sonuç sayfasını, önbellekteki kaydın tazeliği `refresh_margin`
+        saniyeden az kaldıysa önceden yeniler.
+        """
+        stores = await self._find_tile_stores(latitude, longitude, radius_km)
+        depot_ids = sorted(store["id"] for store in stores)
+        if not depot_ids:
+            return
+
+        for batch in self._depot_batches(depot_ids):
+            cache_key, payload = self._search_request(product_name, batch, 0)
+            remaining = self.search_cache.ttl_remaining(cache_key)
+            if remaining is None or remaining < refresh_margin:
+                await self._fetch_search(cache_key, payload, min_fresh=refresh_margin)
+
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        """Önbelleklerin isabet/ıska sayaçlarını döndürür."""
+        search_stats = self.search_cache.stats()
+        search_stats["refreshing"] = len(self._refresh_tasks)
+        return {
+            "nearest": self.nearest_cache.stats(),
+            "depot_registry": self.depot_registry.stats() if self.depot_registry is not None else {},
+            "snapshot": self.snapshot_store.stats() if self.snapshot_store is not None else {},
+            "search": search_stats,
+            "inflight": {"active": len(self._inflight), "shared": self._inflight.shared},
+            "shared": self.shared_cache.stats() if self.shared_cache is not None else {},
+        }
+
+    def upstream_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Upstream host'ları için eş zamanlılık, devre kesici ve yeniden deneme sayaçlarını döndürür."""
+        return self.upstream.stats()
+
     async def find_products_in_shopping_list(
-        self, product_names: List[str], latitude: float, longitude: float, radius_km: int
-    ) -> List[DetailedProductPrice]:
+        self, product_names: List[str], latitude: float, longitude: float, radius_km: int,
+        limit: Optional[int] = None, deadline: Optional[float] = None,
+        on_product_done: Optional[Callable[[str, List[PriceRecord]], Awaitable[None]]] = None
+    ) -> ShoppingListSearch:
+        """
+        `deadline` (saniye) verilirse tüm arama bu süreyle sınırlanır; süre dolduğunda
+        bitmemiş aramalar iptal edilir ve o ana kadar bulunan fiyatlar döndürülür.
+        `on_product_done` verilirse her ürünün araması biter bitmez fiyatlarıyla çağrılır.
+        """
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + deadline if deadline else None
+
+        def _remaining() -> Optional[float]:
+            return None if deadline_at is None else max(0.0, deadline_at - loop.time())
+
         # ADIM 1: Yarıçap İçindeki Marketleri Bul
         try:
-            nearest_payload = {"latitude": latitude, "longitude": longitude, "distance": radius_km}
-            response_nearest = await self.client.post(self.nearest_url, json=nearest_payload)
-            response_nearest.raise_for_status()
-            nearby_stores: List[Dict[str, Any]] = response_nearest.json()
+            tile_stores = await asyncio.wait_for(
+                self._find_tile_stores(latitude, longitude, radius_km), timeout=_remaining()
+            )
+            nearby_stores = stores_within(tile_stores, latitude, longitude, radius_km)
 
             if not nearby_stores:
-                print("Belirtilen alanda hiç market bulunamadı.")
-                return []
+                logger.info("Belirtilen alanda hiç market bulunamadı.")
+                return ShoppingListSearch([], [])
             
             store_details_map = {store["id"]: store for store in nearby_stores}
-            depot_ids = list(store_details_map.keys())
+            # Arama karonun market kümesiyle yapılır; yarıçap dışındaki satırlar zenginleştirmede elenir.
+            depot_ids = sorted(store["id"] for store in tile_stores)
 
+        except asyncio.TimeoutError:
+            logger.warning("En yakın marketler aranırken süre doldu.")
+            return ShoppingListSearch([], list(product_names))
         except Exception as e:
-            print(f"En yakın marketler aranırken hata oluştu: {e}")
-            return []
+            logger.error(f"En yakın marketler aranırken hata oluştu: {e}")
+            return ShoppingListSearch([], [])
 
         # ADIM 2: Bulunan Marketlerde Ürünleri Paralel Olarak Ara
-        async def _search_one_product(product_name: str) -> Optional[ApiSearchResponse]:
-            payload = {"keywords": product_name, "depots": depot_ids, "size": 20}
+        async def _search_one_product(product_name: str) -> List[PriceRecord]:
             try:
-                response = await self.client.post(self.search_url, json=payload)
-                response.raise_for_status()
-                return ApiSearchResponse.model_validate(response.json())
+                response = await self._search_product(product_name, depot_ids, limit, store_details_map)
             except Exception as e:
-                print(f"'{product_name}' ürünü aranırken hata: {e}")
-                return None
+                logger.error(f"'{product_name}' ürünü aranırken hata: {e}")
+                response = None
+            with self.metrics.stage("enrich"):
+                records = self._enrich_response(product_name, response, store_details_map)
+            if on_product_done is not None:
+                try:
+                    await on_product_done(product_name, records)
+                except Exception as e:
+                    logger.warning(f"'{product_name}' ürününün ara sonucu iletilirken hata: {e}")
+            return records
         
-        tasks = [_search_one_product(name) for name in product_names]
-        api_responses = await asyncio.gather(*tasks)
-
-        all_found_prices: List[DetailedProductPrice] = []
-        for response in api_responses:
-            if response and response.content:
-                for item in response.content:
-                    for depot_info in item.product_depot_info_list:
-                        depot_id = depot_info.depot_id 
+        tasks = [asyncio.create_task(_search_one_product(name)) for name in product_names]
+        if not tasks:
+            return ShoppingListSearch([], [])
+        _, pending = await asyncio.wait(tasks, timeout=_remaining())
+        for task in pending:
+            task.cancel()
+        if pending:
+            # Paylaşılan upstream istekleri iptal edilmez; tamamlanınca önbelleği doldururlar.
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        timed_out_products = [name for name, task in zip(product_names, tasks) if task.cancelled()]
+        all_found_records: List[PriceRecord] = [
+            record for task in tasks if not task.cancelled() for record in task.result()
+        ]
+        return ShoppingListSearch(all_found_records, timed_out_products)
+
+    async def find_products_for_jobs(
+        self, jobs: List[ShoppingListJob], limit: Optional[int] = None, deadline: Optional[float] = None
+    ) -> List[ShoppingListSearch]:
+        """
+        Birden çok alışveriş listesini tek seferde arar. Aynı market kümesine düşen
+        işlerdeki aynı (normalize edilmiş) ürünler upstream'de yalnızca bir kez aranır
+        ve sonuç her işe kendi market mesafeleriyle dağıtılır.
+
+        Returns:
+            İşlerle aynı sırada, her iş için bir ShoppingListSearch.
+        """
+        loop = asyncio.get_running_loop()
+        deadline_at = loop.time() + deadline if deadline else None
+
+        def _remaining() -> Optional[float]:
+            return None if deadline_at is None else max(0.0, deadline_at - loop.time())
+
+        # ADIM 1: Her İşin Marketlerini Bul (aynı karodaki işler tek istek paylaşır)
+        store_tasks = [
+            asyncio.create_task(self._find_tile_stores(job.latitude, job.longitude, job.radius_km))
+            for job in jobs
+        ]
+        if not store_tasks:
+            return []
+        _, pending = await asyncio.wait(store_tasks, timeout=_remaining())
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        results: List[Optional[ShoppingListSearch]] = [None] * len(jobs)
+        store_maps: List[Dict[str, Dict[str, Any]]] = [{} for _ in jobs]
+        tile_depots: List[frozenset] = [frozenset() for _ in jobs]
+        # karonun market kümesi -> normalize edilmiş ürün -> upstream'e gönderilecek ürün adı
+        groups: Dict[frozenset, Dict[str, str]] = {}
+        # karonun market kümesi -> bu kümeyi paylaşan işlerin yarıçapındaki marketler
+        group_rows: Dict[frozenset, Set[str]] = {}
+        for i, (job, task) in enumerate(zip(jobs, store_tasks)):
+            if task.cancelled():
+                results[i] = ShoppingListSearch([], list(job.product_list))
+                continue
+            if task.exception() is not None:
+                logger.error(f"En yakın marketler aranırken hata oluştu: {task.exception()}")
+                results[i] = ShoppingListSearch([], [])
+                continue
+            nearby_stores = stores_within(task.result(), job.latitude, job.longitude, job.radius_km)
+            if not nearby_stores:
+                results[i] = ShoppingListSearch([], [])
+                continue
+            store_maps[i] = {store["id"]: store for store in nearby_stores}
+            tile_depots[i] = frozenset(store["id"] for store in task.result())
+            group_rows.setdefault(tile_depots[i], set()).update(store_maps[i])
+            keywords = groups.setdefault(tile_depots[i], {})
+            for name in job.product_list:
+                keywords.setdefault(self.normalize_keyword(name), name)
+
+        # ADIM 2: Her (market kümesi, ürün) çiftini bir kez ara
+        async def _search(product_name: str, depot_ids: List[str], row_depots: Set[str]) -> Optional[ApiSearchResponse]:
+            try:
+                return await self._search_product(product_name, depot_ids, limit, row_depots)
+            except Exception as e:
+                logger.error(f"'{product_name}' ürünü aranırken hata: {e}")
+                return None
+
+        search_tasks: Dict[Tuple[frozenset, str], asyncio.Task] = {
+            (depots, normalized): asyncio.create_task(_search(name, sorted(depots), group_rows[depots]))
+            for depots, keywords in groups.items()
+            for normalized, name in keywords.items()
+        }
+        if search_tasks:
+            _, pending = await asyncio.wait(search_tasks.values(), timeout=_remaining())
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+        # ADIM 3: Sonuçları İşlere Dağıt
+        for i, job in enumerate(jobs):
+            if results[i] is not None:
+                continue
+            depots = tile_depots[i]
+            records: List[PriceRecord] = []
+            timed_out_products: List[str] = []
+            for name in job.product_list:
+                task = search_tasks[(depots, self.normalize_keyword(name))]
+                if task.cancelled():
+                    timed_out_products.append(name)
+                    continue
+                with self.metrics.stage("enrich"):
+                    records.extend(self._enrich_response(name, task.result(), store_maps[i]))
+            results[i] = ShoppingListSearch(records, timed_out_products)
+        return results
+
+    @staticmethod
+    def _enrich_response(
+        product_name: str, response: Optional[ApiSearchResponse], store_details_map: Dict[str, Dict[str, Any]]
+    ) -> List[PriceRecord]:
+        """
+        Arama yanıtındaki fiyatları yakındaki marketlerin mesafe bilgisiyle eşleştirir.
+        Ürün alanları kopyalanmaz; kayıtlar yanıttaki nesnelere referans tutar.
+        """
+        found_records: List[PriceRecord] = []
+        if response and response.content:
+            # Aynı market birçok üründe geçtiği için mesafe dönüşümünü bir kez yapıyoruz.
+            distances: Dict[str, float] = {}
+            for item in response.content:
+                for depot_info in item.product_depot_info_list:
+                    depot_id = depot_info.depot_id
+                    distance_in_km = distances.get(depot_id)
+                    if distance_in_km is None:
                         store_details = store_details_map.get(depot_id)
-                        
-                        if store_details:
-                            distance_in_km = store_details.get("distance", 0) / 1000.0
-                            
-                            detailed_price = DetailedProductPrice(
-                                product_title=item.title,
-                                product_quantity=item.refined_quantity_unit,
-                                price=depot_info.price,
-                                unit_price=depot_info.unit_price,
-                                market_name=depot_info.market_adi,
-                                distance_km=distance_in_km,
-                                # GÜNCELLEME: API'den gelen resim adresini modele ekliyoruz.
-                                image_url=item.image_url
-                            )
-                            all_found_prices.append(detailed_price)
-                            
-        return all_found_prices
+                        if not store_details:
+                            continue
+                        distance_in_km = distances[depot_id] = store_details.get("distance", 0) / 1000.0
+                    found_records.append(PriceRecord(item, depot_info, distance_in_km, product_name))
+        return found_records
 
     async def close_client(self):
-        await self.client.aclose()
\ No newline at end of file
+        for task in list(self._refresh_tasks.values()):
+            task.cancel()
+        self._inflight.cancel_all()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self.snapshot_store is not None:
+            self.snapshot_store.close()
+        if self.shared_cache is not None:
+            self.shared_cache.close()
\ No newline at end of file
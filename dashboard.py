@@ -1,17 +1,25 @@
 import os
 from dotenv import load_dotenv
 load_dotenv()
-import json
 import jwt
 from datetime import datetime, timedelta
 from cryptography.hazmat.primitives import serialization
 from cryptography.hazmat.primitives.asymmetric import rsa
 from flask import Flask, request, redirect, url_for, render_template_string
 
+from utils.auth import append_revoked_token
+from utils.token_store import TokenStore
+
 # --- Yapılandırma Ayarları (Doğrudan Market Fiyatı Sunucusu için) ---
 PRIVATE_KEY_FILE = "private_key.pem"
 PUBLIC_KEY_FILE = "public_key.pem"
+# Eski sürümlerin kullandığı dosya; varsa ilk açılışta TOKEN_DB'ye aktarılır.
 TOKENS_FILE = "tokens.json" 
+TOKEN_DB = os.getenv("TOKEN_DB", "tokens.db")
+# Panelde bir sayfada gösterilecek token sayısı.
+TOKENS_PAGE_SIZE = int(os.getenv("TOKENS_PAGE_SIZE", 50))
+# İptal edilen token'ların özetleri bu dosyaya eklenir; MCP sunucusu dosya değiştikçe yeniden okur.
+REVOKED_TOKENS_FILE = os.getenv("REVOKED_TOKENS_FILE", "revoked_tokens.txt")
 
 # ISSUER: Token'ı kimin ürettiğini belirtir. Bu genellikle dashboard'un kendi adresidir.
 ISSUER_URL = os.getenv("DASHBOARD_ISSUER_URL")
@@ -60,21 +68,21 @@ def load_private_key():
         with open(PRIVATE_KEY_FILE, "rb") as f:
             return serialization.load_pem_private_key(f.read(), password=None)
 
-# --- Token Yönetimi Fonksiyonları ---
-def load_tokens():
-    """Aktif token listesini JSON dosyasından yükler."""
-    if not os.path.exists(TOKENS_FILE):
-        return []
-    try:
-        with open(TOKENS_FILE, "r") as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        return []
-
-def save_tokens(tokens):
-    """Aktif token listesini JSON dosyasına kaydeder."""
-    with open(TOKENS_FILE, "w") as f:
-        json.dump(tokens, f, indent=2)
+# --- Token Yönetimi ---
+# Depo ve özel anahtar her istekte yeniden açılmasın diye süreç başına bir kez yüklenir.
+token_store = TokenStore(TOKEN_DB)
+migrated = token_store.import_json(TOKENS_FILE)
+if migrated:
+    print(f"'{TOKENS_FILE}' dosyasındaki {migrated} token '{TOKEN_DB}' deposuna aktarıldı.")
+
+_private_key = None
+
+def get_private_key():
+    """Özel anahtarı ilk kullanımda yükler ve sonraki isteklerde bellekteki nesneyi döndürür."""
+    global _private_key
+    if _private_key is None:
+        _private_key = load_private_key()
+    return _private_key
 
 # --- HTML Arayüz Şablonu ---
 HTML_TEMPLATE = """
@@ -106,19 +114,23 @@ HTML_TEMPLATE = """
             <button type="submit">Token Oluştur</button>
         </form>
         
-        <h2>Aktif Token'lar</h2>
+        <h2>Aktif Token'lar ({{ total }})</h2>
         {% for token_info in tokens %}
             <div class="token">
                 <p><strong>Kullanıcı:</strong> {{ token_info.subject }}</p>
                 <p><strong>Token:</strong> <code>{{ token_info.token }}</code></p>
                 <form action="/revoke" method="post" style="display:inline;">
-                    <input type="hidden" name="token_to_revoke" value="{{ token_info.token }}">
+                    <input type="hidden" name="token_hash" value="{{ token_info.token_hash }}">
                     <button type="submit" style="background-color:#dc3545;">İptal Et</button>
                 </form>
             </div>
         {% else %}
             <p>Aktif token bulunmuyor.</p>
         {% endfor %}
+        <p>
+            {% if page > 0 %}<a href="{{ url_for('index', page=page - 1) }}">&laquo; Önceki</a>{% endif %}
+            {% if has_next %}<a href="{{ url_for('index', page=page + 1) }}">Sonraki &raquo;</a>{% endif %}
+        </p>
     </div>
 </body>
 </html>
@@ -127,9 +139,14 @@ HTML_TEMPLATE = """
 # --- Web Rotaları ---
 @app.route("/")
 def index():
-    """Ana paneli ve aktif tokenları gösterir."""
-    tokens = load_tokens()
-    return render_template_string(HTML_TEMPLATE, tokens=tokens)
+    """Ana paneli ve aktif tokenları sayfa sayfa gösterir."""
+    page = max(request.args.get("page", 0, type=int), 0)
+    total = token_store.count_active()
+    tokens = token_store.list_active(page, TOKENS_PAGE_SIZE)
+    return render_template_string(
+        HTML_TEMPLATE, tokens=tokens, page=page,
+        has_next=(page + 1) * TOKENS_PAGE_SIZE < total, total=total,
+    )
 
 @app.route("/generate", methods=["POST"])
 def generate_token_route():
@@ -138,8 +155,6 @@ def generate_token_route():
     if not subject:
         return "Kullanıcı adı gerekli", 400
     
-    private_key = load_private_key()
-    
     token = jwt.encode(
         {
             "iss": ISSUER_URL,
@@ -147,27 +162,25 @@ def generate_token_route():
             "aud": AUDIENCE,
             "exp": datetime.utcnow() + timedelta(days=365)
         },
-        private_key,
+        get_private_key(),
         algorithm="RS256"
     )
 
-    tokens = load_tokens()
-    tokens.append({"subject": subject, "token": token})
-    save_tokens(tokens)
+    token_store.add(subject, token)
     
     return redirect(url_for('index'))
 
 @app.route("/revoke", methods=["POST"])
 def revoke_token_route():
-    """Bir token'ı aktif listeden kaldırarak iptal eder."""
-    token_to_revoke = request.form.get("token_to_revoke")
-    tokens = load_tokens()
-    tokens = [t for t in tokens if t.get("token") != token_to_revoke]
-    save_tokens(tokens)
+    """Bir token'ı iptal edilmiş olarak işaretler."""
+    revoked_token = token_store.revoke(request.form.get("token_hash", ""))
+    if revoked_token is not None:
+        # MCP sunucusu iptali bu dosyadan öğrenir.
+        append_revoked_token(REVOKED_TOKENS_FILE, revoked_token)
     
     return redirect(url_for('index'))
 
 # --- Ana Çalıştırma Bloğu ---
 if __name__ == "__main__":
-    load_private_key()
+    get_private_key()
     app.run(host="0.0.0.0", port=8050, debug=True)
\ No newline at end of file
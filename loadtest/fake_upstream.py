@@ -0,0 +1,156 @@
+"""
+Yük testleri için marketfiyati.org.tr nearest ve search API'lerinin yerel taklidi.
+
+Gecikme, hata oranı ve yanıt boyutu komut satırından ayarlanır. Yanıtlar
+koordinat ve arama kelimesinden türetilen tohumlarla üretildiği için aynı istek
+her seferinde aynı veriyi döndürür. Gelen istekler uç nokta bazında sayılır ve
+`/stats` adresinden okunabilir; yük testi upstream çoğaltma oranını buradan hesaplar.
+
+Kullanım:
+    python -m loadtest.fake_upstream --port 8091 --latency-ms 150 --error-rate 0.02
+"""
+import asyncio
+import os
+import random
+import sys
+import zlib
+from typing import Any, Dict, List
+
+import click
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.payloads import make_depots, make_search_payload  # noqa: E402
+
+
+def _seed(*parts: Any) -> int:
+    return zlib.crc32("|".join(str(p) for p in parts).encode("utf-8"))
+
+
+class FakeUpstream:
+    """Nearest ve search uç noktalarını taklit eden, istekleri sayan sahte API."""
+
+    def __init__(
+        self,
+        latency_ms: float = 100.0,
+        jitter_ms: float = 50.0,
+        error_rate: float = 0.0,
+        depot_count: int = 30,
+        total_found: int = 60,
+        max_page_size: int = 20,
+        coverage: float = 0.6,
+    ):
+        """
+        Args:
+            latency_ms: Her yanıttan önce beklenen ortalama süre.
+            jitter_ms: Gecikmeye eklenen rastgele sapmanın üst sınırı.
+            error_rate: İsteklerin 503 ile yanıtlanma olasılığı (0-1).
+            depot_count: Nearest yanıtındaki market sayısı.
+            total_found: Bir aramanın toplam sonuç sayısı (sayfalamayı belirler).
+            max_page_size: Bir arama sayfasındaki en fazla ürün sayısı.
+            coverage: Bir ürünün her markette bulunma olasılığı.
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.depot_count = depot_count
+        self.total_found = total_found
+        self.max_page_size = max_page_size
+        self.coverage = coverage
+        # market kimliği -> market bilgisi; arama yanıtlarında konum ve zincir adı buradan alınır.
+        self._depots: Dict[str, Dict[str, Any]] = {}
+        self.counts: Dict[str, int] = {"nearest": 0, "search": 0, "errors": 0}
+
+    async def _delay_or_fail(self, endpoint: str):
+        self.counts[endpoint] += 1
+        delay = self.latency_ms + random.uniform(0, self.jitter_ms)
+        await asyncio.sleep(max(delay, 0.0) / 1000.0)
+        if self.error_rate and random.random() < self.error_rate:
+            self.counts["errors"] += 1
+            return Response("Service Unavailable", status_code=503)
+        return None
+
+    def _nearby_depots(self, latitude: float, longitude: float, radius_km: float) -> List[Dict[str, Any]]:
+        key = f"{latitude:.4f},{longitude:.4f}"
+        depots = make_depots(self.depot_count, seed=_seed("nearest", key, radius_km))
+        scale = max(radius_km, 0.1) / 5.0
+        for depot in depots:
+            # Üretilen marketler (41, 29) çevresindedir; istenen noktaya ve yarıçapa taşınır.
+            depot["id"] = f"{key}-{depot['id']}"
+            depot["latitude"] = latitude + (depot["latitude"] - 41.0) * scale
+            depot["longitude"] = longitude + (depot["longitude"] - 29.0) * scale
+            depot["distance"] = depot["distance"] * scale
+            self._depots[depot["id"]] = depot
+        return depots
+
+    async def nearest(self, request: Request) -> Response:
+        failure = await self._delay_or_fail("nearest")
+        if failure is not None:
+            return failure
+        body = await request.json()
+        return JSONResponse(
+            self._nearby_depots(float(body["latitude"]), float(body["longitude"]), float(body.get("distance", 1)))
+        )
+
+    async def search(self, request: Request) -> Response:
+        failure = await self._delay_or_fail("search")
+        if failure is not None:
+            return failure
+        body = await request.json()
+        keyword = str(body.get("keywords", ""))
+        page = int(body.get("pages", 0))
+        size = min(int(body.get("size", self.max_page_size)), self.max_page_size)
+        count = max(0, min(size, self.total_found - page * size))
+        depots = [
+            self._depots.get(depot_id) or {
+                "id": depot_id, "marketName": "Bilinmeyen", "latitude": 41.0, "longitude": 29.0, "distance": 0.0
+            }
+            for depot_id in body.get("depots", [])
+        ]
+        payload = make_search_payload(
+            count, depots, coverage=self.coverage, seed=_seed("search", keyword, page),
+            keyword=keyword, id_prefix=f"{_seed(keyword):08x}-{page}-",
+        )
+        payload["numberOfFound"] = self.total_found
+        return JSONResponse(payload)
+
+    async def stats(self, request: Request) -> Response:
+        if request.method == "DELETE":
+            for key in self.counts:
+                self.counts[key] = 0
+        return JSONResponse(self.counts)
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/nearest", self.nearest, methods=["POST"]),
+            Route("/search", self.search, methods=["POST"]),
+            Route("/stats", self.stats, methods=["GET", "DELETE"]),
+        ])
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1', help='Dinlenecek adres.')
+@click.option('--port', default=8091, help='Dinlenecek port.')
+@click.option('--latency-ms', default=100.0, help='Ortalama yanıt gecikmesi (ms).')
+@click.option('--jitter-ms', default=50.0, help='Gecikmeye eklenen rastgele sapmanın üst sınırı (ms).')
+@click.option('--error-rate', default=0.0, help='503 ile yanıtlanan isteklerin oranı (0-1).')
+@click.option('--depots', 'depot_count', default=30, help='Nearest yanıtındaki market sayısı.')
+@click.option('--total-found', default=60, help='Bir aramanın toplam sonuç sayısı.')
+@click.option('--page-size', 'max_page_size', default=20, help='Bir arama sayfasındaki en fazla ürün sayısı.')
+@click.option('--coverage', default=0.6, help='Bir ürünün her markette bulunma olasılığı.')
+def main(host, port, latency_ms, jitter_ms, error_rate, depot_count, total_found, max_page_size, coverage):
+    """Sahte nearest/search API'sini başlatır."""
+    upstream = FakeUpstream(
+        latency_ms=latency_ms, jitter_ms=jitter_ms, error_rate=error_rate, depot_count=depot_count,
+        total_found=total_found, max_page_size=max_page_size, coverage=coverage,
+    )
+    uvicorn.run(upstream.app(), host=host, port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
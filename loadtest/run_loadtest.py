@@ -0,0 +1,342 @@
+"""
+Uçtan uca yük testi: sahte upstream API'sini ve gerçek MCP sunucusunu ayrı
+süreçlerde başlatır, SSE (veya streamable-http) üzerinden bağlanan çok sayıda eş
+zamanlı MCP istemcisiyle `find_shopping_list_prices` aracını çağırır ve sonuçları raporlar.
+
+Rapor; verim (çağrı/sn), gecikme yüzdelikleri (p50/p95/p99), sonuç dağılımı ve
+araç çağrısı başına düşen upstream isteği sayısını (çoğaltma oranı) içerir.
+
+Kullanım:
+    python -m loadtest.run_loadtest --clients 50 --duration 60 --latency-ms 150
+    python -m loadtest.run_loadtest --error-rate 0.05 --env SEARCH_CACHE_TTL_SECONDS=0
+    python -m loadtest.run_loadtest --transport streamable-http --workers 4
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import click
+import httpx
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from mcp.client.streamable_http import streamable_http_client
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_SCRIPT = os.path.join(ROOT_DIR, "market_fiyati_mcp_server.py")
+
+# Gerçekçi alışveriş listeleri; istemciler bunlardan rastgele seçer.
+SHOPPING_LISTS = [
+    ["süt", "ekmek", "yumurta"],
+    ["beyaz peynir", "zeytin", "domates", "salatalık"],
+    ["ayçiçek yağı", "toz şeker", "un"],
+    ["bebek bezi", "ıslak mendil"],
+    ["çay", "kahve", "süt"],
+    ["makarna", "domates salçası", "kıyma"],
+    ["deterjan", "bulaşık deterjanı", "yumuşatıcı"],
+    ["yoğurt", "ayran", "kaşar peyniri", "tereyağı"],
+    ["pirinç", "bulgur", "mercimek", "nohut"],
+    ["tavuk göğsü", "patates", "soğan"],
+    ["su", "maden suyu"],
+    ["elma", "muz", "portakal", "mandalina", "limon"],
+]
+# Şehir merkezleri; her istemci konumu bunların çevresinde üretilir.
+CITY_CENTERS = [(41.0082, 28.9784), (39.9334, 32.8597), (38.4237, 27.1428), (37.0000, 35.3213)]
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Sıralı listede en yakın sıra (nearest-rank) yöntemiyle yüzdelik değeri döndürür."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(pct / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def make_locations(count: int, seed: int = 7) -> List[Tuple[float, float]]:
+    """Şehir merkezlerinin birkaç kilometre çevresinde sabit tohumlu konumlar üretir."""
+    rng = random.Random(seed)
+    locations = []
+    for i in range(count):
+        lat, lon = CITY_CENTERS[i % len(CITY_CENTERS)]
+        locations.append((round(lat + rng.uniform(-0.05, 0.05), 6), round(lon + rng.uniform(-0.05, 0.05), 6)))
+    return locations
+
+
+async def _wait_for_port(port: int, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Süreç beklenmedik şekilde kapandı (çıkış kodu {process.returncode}).")
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            await writer.wait_closed()
+            return
+        except OSError:
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f"{port} portu {timeout:.0f} saniye içinde açılmadı.")
+
+
+def _stop(process: Optional[subprocess.Popen]) -> None:
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+class LoadStats:
+    """İstemcilerin ölçtüğü çağrı süreleri ve sonuçları."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.outcomes: Dict[str, int] = {"ok": 0, "error_message": 0, "failed": 0}
+        self.failures: Dict[str, int] = {}
+
+    def record(self, seconds: float, outcome: str, detail: Optional[str] = None) -> None:
+        self.latencies.append(seconds)
+        self.outcomes[outcome] += 1
+        if detail:
+            self.failures[detail] = self.failures.get(detail, 0) + 1
+
+
+@asynccontextmanager
+async def _mcp_session(transport: str, url: str, headers: Dict[str, str]) -> AsyncIterator[ClientSession]:
+    """Seçili transport ile başlatılmış bir MCP istemci oturumu açar."""
+    if transport == "sse":
+        async with sse_client(url, headers=headers, sse_read_timeout=600) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+        return
+    async with httpx.AsyncClient(headers=headers, timeout=httpx.Timeout(30, read=600)) as http_client:
+        async with streamable_http_client(url, http_client=http_client) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session
+
+
+async def _run_client(
+    client_id: int, transport: str, url: str, headers: Dict[str, str], end_time: float, start_delay: float,
+    locations: List[Tuple[float, float]], tool_args: Dict[str, Any], think_time: float, stats: LoadStats,
+) -> None:
+    """Tek bir MCP oturumu açar ve süre dolana kadar art arda araç çağrısı yapar."""
+    rng = random.Random(client_id)
+    await asyncio.sleep(start_delay)
+    try:
+        async with _mcp_session(transport, url, headers) as session:
+            while time.monotonic() < end_time:
+                latitude, longitude = rng.choice(locations)
+                arguments = {
+                    "product_list": rng.choice(SHOPPING_LISTS),
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    **tool_args,
+                }
+                started = time.perf_counter()
+                try:
+                    result = await session.call_tool("find_shopping_list_prices", arguments)
+                except Exception as e:
+                    stats.record(time.perf_counter() - started, "failed", type(e).__name__)
+                    continue
+                elapsed = time.perf_counter() - started
+                structured = result.structuredContent or {}
+                if result.isError:
+                    stats.record(elapsed, "failed", "tool_error")
+                elif structured.get("error_message"):
+                    stats.record(elapsed, "error_message", structured["error_message"][:80])
+                else:
+                    stats.record(elapsed, "ok")
+                if think_time:
+                    await asyncio.sleep(rng.uniform(0, 2 * think_time))
+    except Exception as e:
+        stats.failures[f"oturum: {type(e).__name__}"] = stats.failures.get(f"oturum: {type(e).__name__}", 0) + 1
+
+
+def build_report(
+    stats: LoadStats, elapsed: float, upstream_counts: Dict[str, int], clients: int, config: Dict[str, Any]
+) -> Dict[str, Any]:
+    latencies = sorted(stats.latencies)
+    calls = len(latencies)
+    upstream_requests = upstream_counts.get("nearest", 0) + upstream_counts.get("search", 0)
+    return {
+        "config": config,
+        "clients": clients,
+        "duration_seconds": round(elapsed, 3),
+        "calls": calls,
+        "outcomes": stats.outcomes,
+        "failures": stats.failures,
+        "throughput_per_second": round(calls / elapsed, 3) if elapsed else 0.0,
+        "latency_seconds": {
+            "mean": round(sum(latencies) / calls, 4) if calls else 0.0,
+            "p50": round(percentile(latencies, 50), 4),
+            "p95": round(percentile(latencies, 95), 4),
+            "p99": round(percentile(latencies, 99), 4),
+            "max": round(latencies[-1], 4) if latencies else 0.0,
+        },
+        "upstream": {
+            **upstream_counts,
+            "requests": upstream_requests,
+            # Araç çağrısı başına upstream'e giden istek sayısı (önbellek ve birleştirme etkisi).
+            "amplification": round(upstream_requests / calls, 3) if calls else 0.0,
+        },
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    latency = report["latency_seconds"]
+    upstream = report["upstream"]
+    outcomes = report["outcomes"]
+    print("\n=== Yük Testi Sonuçları ===")
+    print(f"İstemci sayısı       : {report['clients']}")
+    print(f"Süre                 : {report['duration_seconds']:.1f} sn")
+    print(f"Araç çağrısı         : {report['calls']} "
+          f"(başarılı {outcomes['ok']}, hata mesajlı {outcomes['error_message']}, başarısız {outcomes['failed']})")
+    print(f"Verim                : {report['throughput_per_second']:.2f} çağrı/sn")
+    print(f"Gecikme (sn)         : ort {latency['mean']:.3f}  p50 {latency['p50']:.3f}  "
+          f"p95 {latency['p95']:.3f}  p99 {latency['p99']:.3f}  en fazla {latency['max']:.3f}")
+    print(f"Upstream istekleri   : nearest {upstream.get('nearest', 0)}, search {upstream.get('search', 0)}, "
+          f"enjekte edilen hata {upstream.get('errors', 0)}")
+    print(f"Upstream çoğaltma    : çağrı başına {upstream['amplification']:.2f} istek")
+    if report["failures"]:
+        print("Hatalar:")
+        for detail, count in sorted(report["failures"].items(), key=lambda item: -item[1]):
+            print(f"  {count:>6} x {detail}")
+
+
+async def run_load_test(
+    clients: int, duration: float, ramp_up: float, think_time: float, location_count: int,
+    tool_args: Dict[str, Any], upstream_args: List[str], server_env: Dict[str, str],
+    auth_token: Optional[str], server_port: int, upstream_port: int, transport: str, workers: int,
+) -> Dict[str, Any]:
+    upstream_port = upstream_port or _free_port()
+    server_port = server_port or _free_port()
+    upstream_url = f"http://127.0.0.1:{upstream_port}"
+    workdir = tempfile.mkdtemp(prefix="market_loadtest_")
+
+    env = {
+        **os.environ,
+        "NEAREST_API_URL": f"{upstream_url}/nearest",
+        "SEARCH_API_URL": f"{upstream_url}/search",
+        # Arka plan ön yüklemesi upstream sayımlarını bozmasın diye varsayılan olarak kapalıdır.
+        "PREFETCH_ENABLED": "false",
+        "PYTHONUNBUFFERED": "1",
+        **server_env,
+    }
+    upstream_log = open(os.path.join(workdir, "fake_upstream.log"), "w")
+    server_log = open(os.path.join(workdir, "server.log"), "w")
+    upstream_proc = server_proc = None
+    try:
+        upstream_proc = subprocess.Popen(
+            [sys.executable, "-m", "loadtest.fake_upstream", "--port", str(upstream_port), *upstream_args],
+            cwd=ROOT_DIR, stdout=upstream_log, stderr=subprocess.STDOUT,
+        )
+        await _wait_for_port(upstream_port, upstream_proc, timeout=30)
+        # Token verilmezse sunucu, public_key.pem bulunmayan geçici bir dizinde yetkilendirmesiz çalıştırılır.
+        server_proc = subprocess.Popen(
+            [sys.executable, SERVER_SCRIPT, "--host", "127.0.0.1", "--port", str(server_port),
+             "--transport", transport, "--workers", str(workers)],
+            cwd=ROOT_DIR if auth_token else workdir, env=env, stdout=server_log, stderr=subprocess.STDOUT,
+        )
+        await _wait_for_port(server_port, server_proc, timeout=60)
+        server_url = f"http://127.0.0.1:{server_port}" + ("/sse" if transport == "sse" else "/mcp")
+        print(f"Sahte upstream: {upstream_url}  |  MCP sunucusu: {server_url}  |  loglar: {workdir}")
+
+        async with httpx.AsyncClient() as http:
+            await http.delete(f"{upstream_url}/stats")
+            stats = LoadStats()
+            locations = make_locations(location_count)
+            headers = {"Authorization": f"Bearer {auth_token}"} if auth_token else {}
+            started = time.monotonic()
+            end_time = started + ramp_up + duration
+            await asyncio.gather(*(
+                _run_client(
+                    i, transport, server_url, headers, end_time,
+                    ramp_up * i / max(clients, 1), locations, tool_args, think_time, stats,
+                )
+                for i in range(clients)
+            ))
+            elapsed = time.monotonic() - started
+            upstream_counts = (await http.get(f"{upstream_url}/stats")).json()
+    finally:
+        _stop(server_proc)
+        _stop(upstream_proc)
+        upstream_log.close()
+        server_log.close()
+
+    config = {"transport": transport, "workers": workers, "tool_args": tool_args, "upstream_args": upstream_args, "server_env": server_env,
+              "ramp_up": ramp_up, "think_time": think_time, "locations": location_count}
+    return build_report(stats, elapsed, upstream_counts, clients, config)
+
+
+def _parse_env(pairs: Tuple[str, ...]) -> Dict[str, str]:
+    env = {}
+    for pair in pairs:
+        if "=" not in pair:
+            raise click.BadParameter(f"'{pair}' KEY=VALUE biçiminde olmalı.", param_hint="--env")
+        key, value = pair.split("=", 1)
+        env[key.strip()] = value
+    return env
+
+
+@click.command()
+@click.option('--clients', default=20, help='Eş zamanlı MCP istemcisi (oturum) sayısı.')
+@click.option('--duration', default=30.0, help='Ölçüm süresi (saniye, ramp-up hariç).')
+@click.option('--ramp-up', default=5.0, help='İstemcilerin kademeli olarak başlatıldığı süre (saniye).')
+@click.option('--think-time', default=0.0, help='İstemcinin çağrılar arasında beklediği ortalama süre (saniye).')
+@click.option('--locations', 'location_count', default=20, help='İstemcilerin seçtiği farklı konum sayısı (önbellek isabetini belirler).')
+@click.option('--limit', default=10, help='Araç çağrısındaki limit parametresi.')
+@click.option('--radius-km', default=1, help='Araç çağrısındaki arama yarıçapı.')
+@click.option('--latency-ms', default=100.0, help='Sahte upstream\'in ortalama gecikmesi (ms).')
+@click.option('--jitter-ms', default=50.0, help='Sahte upstream gecikmesine eklenen rastgele sapma (ms).')
+@click.option('--error-rate', default=0.0, help='Sahte upstream\'in 503 döndürme oranı (0-1).')
+@click.option('--depots', default=30, help='Nearest yanıtındaki market sayısı.')
+@click.option('--total-found', default=60, help='Bir aramanın toplam sonuç sayısı.')
+@click.option('--page-size', default=20, help='Sahte upstream\'in bir sayfada döndürdüğü en fazla ürün sayısı.')
+@click.option('--transport', default='sse', type=click.Choice(['sse', 'streamable-http']), help='Sunucunun transport tipi.')
+@click.option('--workers', default=1, help='Sunucunun çalışan süreç sayısı (1\'den fazlası streamable-http gerektirir).')
+@click.option('--env', 'env_pairs', multiple=True, help='Sunucuya geçirilecek ortam değişkeni (KEY=VALUE), tekrarlanabilir.')
+@click.option('--auth-token', default=None, help='Sunucu yetkilendirme ile çalışacaksa kullanılacak Bearer token.')
+@click.option('--server-port', default=0, help='MCP sunucusunun portu (0 = boş bir port seçilir).')
+@click.option('--upstream-port', default=0, help='Sahte upstream\'in portu (0 = boş bir port seçilir).')
+@click.option('--json-output', default=None, help='Raporun ayrıca yazılacağı JSON dosyası.')
+def main(clients, duration, ramp_up, think_time, location_count, limit, radius_km, latency_ms, jitter_ms,
+         error_rate, depots, total_found, page_size, transport, workers, env_pairs, auth_token, server_port,
+         upstream_port, json_output):
+    """Sahte upstream'e karşı gerçek MCP sunucusunu yük altında ölçer."""
+    upstream_args = [
+        "--latency-ms", str(latency_ms), "--jitter-ms", str(jitter_ms), "--error-rate", str(error_rate),
+        "--depots", str(depots), "--total-found", str(total_found), "--page-size", str(page_size),
+    ]
+    report = asyncio.run(run_load_test(
+        clients=clients, duration=duration, ramp_up=ramp_up, think_time=think_time,
+        location_count=location_count, tool_args={"limit": limit, "radius_km": radius_km},
+        upstream_args=upstream_args, server_env=_parse_env(env_pairs), auth_token=auth_token,
+        server_port=server_port, upstream_port=upstream_port, transport=transport, workers=workers,
+    ))
+    print_report(report)
+    if json_output:
+        with open(json_output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nRapor '{json_output}' dosyasına yazıldı.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,102 +1,285 @@
 # market_fiyati_mcp_server.py (Yapısal Veri Gönderecek Şekilde Güncellenmiş Final Versiyon)
 
 import os
-import re
 import asyncio
-import atexit
 import logging
-from typing import List, Dict, Any, Optional
+import time
+from typing import Any, Dict, List, Optional
 from collections import namedtuple
+from contextlib import asynccontextmanager, contextmanager
 
 # 3. parti kütüphaneler
 import click
 import jwt
+import uvicorn
+from cryptography.hazmat.primitives import serialization
 from dotenv import load_dotenv
 from pydantic import Field
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context, FastMCP
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
 
 # Kendi modüllerimiz
-from client import MarketFiyatApiClient
+from client import MarketFiyatApiClient, ShoppingListSearch
 # GÜNCELLEME: Artık yeni yapıda olan ShoppingListResult modelini kullanacağız.
-from models import ShoppingListResult
+from models import (
+    BasketOptimizationResult, BatchShoppingListResult, PriceRecord, ProductSearchUpdate,
+    ShoppingListJob, ShoppingListResult,
+)
+from utils.auth import RevocationList, token_hash
+from utils.cache import TTLCache
 from utils.logging import setup_logger
+from utils.metrics import MetricsRegistry, TraceIdFilter, traced_call
+from utils.basket import optimize_basket
+from utils.prefetch import PrefetchScheduler
+from utils.ranking import group_records, rank_records
 
 # .env dosyasındaki değişkenleri yükle
 load_dotenv()
 
 # --- Yardımcı Fonksiyonlar ---
-def parse_unit_price(unit_price_str: Optional[str]) -> float:
-    """'101,37 ₺/kg' gibi bir metni 101.37 sayısına çevirir."""
-    if not unit_price_str:
-        return float('inf')
-    try:
-        cleaned_str = re.sub(r'[^\d,]', '', unit_price_str).replace(',', '.')
-        return float(cleaned_str)
-    except (ValueError, TypeError):
-        return float('inf')
+def build_shopping_list_result(
+    search: ShoppingListSearch, sort_by: str, limit: Optional[int], rank_per_product: bool, group_by_product: bool
+) -> ShoppingListResult:
+    """İstemcinin bulduğu kayıtları sıralayıp n8n'e gönderilecek sonuç modeline dönüştürür."""
+    found_records = search.records
+    timed_out_products = search.timed_out_products
+
+    if not found_records:
+        # GÜNCELLEME: Hata durumunda yeni modele uygun boş bir liste gönderiyoruz.
+        error_message = "Listenizdeki ürünlerin hiçbiri bu bölgede bulunamadı."
+        if timed_out_products:
+            error_message = "Arama süre sınırı içinde tamamlanamadı, hiçbir fiyat bulunamadı."
+        return ShoppingListResult(
+            products=[], found_prices_count=0,
+            timed_out_products=timed_out_products, error_message=error_message
+        )
+
+    with metrics.stage("rank"):
+        found_records = rank_records(found_records, sort_by, limit, per_product=rank_per_product)
+    
+    # GÜNCELLEME: Metin formatlama döngüsü tamamen kaldırıldı.
+    # Artık doğrudan işlenmiş ve sıralanmış ürün listesini döndürüyoruz.
+    # n8n bu yapısal veriyi alıp kendisi formatlayacak.
+    # Pydantic modellerine yalnızca döndürülecek kayıtlar dönüştürülür.
+    with metrics.stage("serialize"):
+        if group_by_product:
+            return ShoppingListResult(
+                products=[],
+                grouped_products=group_records(found_records),
+                found_prices_count=len(found_records),
+                timed_out_products=timed_out_products
+            )
+        return ShoppingListResult(
+            products=[r.to_detailed_price() for r in found_records], 
+            found_prices_count=len(found_records),
+            timed_out_products=timed_out_products
+        )
+
+# Araç çağrısı için varsayılan süre sınırı (saniye). 0 verilirse süre sınırı uygulanmaz.
+DEFAULT_TOOL_DEADLINE_SECONDS = float(os.getenv("TOOL_DEADLINE_SECONDS", 20))
+# Sepet planlamasında km başına mesafe maliyeti (TL) ve kombinasyon aramasının sınırları.
+BASKET_DISTANCE_COST_PER_KM = float(os.getenv("BASKET_DISTANCE_COST_PER_KM", 5.0))
+BASKET_MAX_STORES = int(os.getenv("BASKET_MAX_STORES", 4))
+BASKET_MAX_CANDIDATE_STORES = int(os.getenv("BASKET_MAX_CANDIDATE_STORES", 20))
+# Toplu araçta tek çağrıda kabul edilen en fazla iş sayısı.
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", 100))
 
 # --- Loglama ve Kaynak Yönetimi ---
-logger = setup_logger("MCP_Server")
+# Logger, API istemcisi ve ön getirme zamanlayıcısı modül içe aktarılırken değil, sunucuyu
+# çalıştıran süreçte `init_runtime` ile kurulur; çok çalışanlı modda her çalışan kendi kaynaklarını oluşturur.
+logger = logging.getLogger("MCP_Server")
+api_client: Optional[MarketFiyatApiClient] = None
+prefetch_scheduler: Optional[PrefetchScheduler] = None
 
-logger.info("MarketFiyatApiClient başlatılıyor...")
-api_client = MarketFiyatApiClient()
+# --- Ölçümler (Metrics) ---
+# Çalışma ortamı kurulana kadar ölçüm noktaları kapalı bir kayda yazar.
+metrics = MetricsRegistry(enabled=False)
+# Bu süreden uzun süren araç çağrılarının aşama dökümü loglanır (0 = kapalı).
+METRICS_SLOW_CALL_SECONDS = float(os.getenv("METRICS_SLOW_CALL_SECONDS", 5))
+# '/metrics' uç noktası MCP uç noktalarıyla aynı portta sunulur. 'auto' (varsayılan) iken yetkilendirme
+# açıksa aynı bearer token ile korunur; yetkilendirme yoksa yalnızca yerel bir adrese bağlanıldığında açılır.
+METRICS_ENDPOINT = os.getenv("METRICS_ENDPOINT", "auto").lower()
+_LOCAL_HOSTS = {"127.0.0.1", "localhost", "::1"}
 
-def cleanup():
-    """Uygulama kapandığında tüm kaynakları temizler."""
-    logger.info("\nSunucu kapatılıyor, API istemci oturumu temizleniyor...")
-    try:
-        loop = asyncio.get_running_loop()
-        if loop.is_running():
-            loop.create_task(api_client.close_client())
-        else:
-            asyncio.run(api_client.close_client())
-    except RuntimeError:
-        asyncio.run(api_client.close_client())
+def _cache_gauge_values():
+    for cache_name, stats in api_client.cache_stats().items():
+        for stat_name, value in stats.items():
+            yield (cache_name, stat_name), value
+
+def _upstream_gauge_values():
+    for host, stats in api_client.upstream_stats().items():
+        for stat_name, value in stats.items():
+            if isinstance(value, (int, float)):
+                yield (host, stat_name), value
+
+def _prefetch_gauge_values():
+    if prefetch_scheduler is None:
+        return
+    for stat_name, value in prefetch_scheduler.stats().items():
+        yield (stat_name,), value
+
+def init_runtime() -> MarketFiyatApiClient:
+    """
+    Logger'ı, API istemcisini, ölçümleri ve ön getirme zamanlayıcısını kurar.
+    Tekrar çağrılırsa mevcut API istemcisini döndürür.
+    """
+    global api_client, metrics, prefetch_scheduler
+    if api_client is not None:
+        return api_client
+
+    setup_logger("MCP_Server")
+    # Log kayıtlarına o anki araç çağrısının izleme kimliği eklenir.
+    logger.addFilter(TraceIdFilter())
 
-atexit.register(cleanup)
+    logger.info("MarketFiyatApiClient başlatılıyor...")
+    api_client = MarketFiyatApiClient()
+
+    metrics = api_client.metrics
+    metrics.gauge("cache_stats", "Önbellek, market kaydı ve eş zamanlı istek sayaçları.", ["cache", "stat"], _cache_gauge_values)
+    metrics.gauge("upstream_stats", "Upstream host'ları için eş zamanlılık sınırı ve istek sayaçları.", ["host", "stat"], _upstream_gauge_values)
+
+    # Sık sorulan (ürün, bölge) çiftlerini önbellek süresi dolmadan arka planda yenileyen zamanlayıcı.
+    # Bütçe tüm sunucu içindir; birden fazla çalışan varsa aralarında eşit bölünür.
+    if os.getenv("PREFETCH_ENABLED", "true").lower() in ("1", "true", "yes"):
+        workers = max(1, int(os.getenv("MCP_WORKERS", 1)))
+        prefetch_scheduler = PrefetchScheduler(
+            api_client,
+            interval=float(os.getenv("PREFETCH_INTERVAL_SECONDS", 30)),
+            budget_per_minute=float(os.getenv("PREFETCH_BUDGET_PER_MINUTE", 30)) / workers,
+            max_hot=int(os.getenv("PREFETCH_MAX_HOT", 200)),
+            half_life=float(os.getenv("PREFETCH_HALF_LIFE_SECONDS", 3600)),
+            min_score=float(os.getenv("PREFETCH_MIN_SCORE", 2)),
+            refresh_margin=float(os.getenv("PREFETCH_REFRESH_MARGIN_SECONDS", 60)),
+            logger=setup_logger("PrefetchScheduler"),
+        )
+        metrics.gauge("prefetch_stats", "Ön getirme zamanlayıcısının tur, istek ve bütçe sayaçları.", ["stat"], _prefetch_gauge_values)
+    return api_client
+
+async def shutdown_runtime():
+    """Sunucu kapanırken ön getirme görevini durdurur ve API istemcisinin kaynaklarını kapatır."""
+    global api_client, prefetch_scheduler
+    logger.info("Sunucu kapatılıyor, API istemci oturumu temizleniyor...")
+    if prefetch_scheduler is not None:
+        await prefetch_scheduler.stop()
+        prefetch_scheduler = None
+    if api_client is not None:
+        await api_client.close_client()
+        api_client = None
+
+class _ToolCall:
+    """Bir araç çağrısının izleme kimliği ve sonucu."""
+    __slots__ = ("trace_id", "outcome")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.outcome = "ok"
+
+@contextmanager
+def tool_call(tool_name: str):
+    """
+    Araç çağrısını yeni bir izleme kimliğiyle ölçer. Çağrı `METRICS_SLOW_CALL_SECONDS`
+    süresini aşarsa, ölçülen aşamaların toplam süreleri izleme kimliğiyle birlikte loglanır.
+    """
+    if not metrics.enabled:
+        yield _ToolCall("")
+        return
+    with traced_call() as (trace_id, stages):
+        call = _ToolCall(trace_id)
+        started = time.perf_counter()
+        try:
+            yield call
+        except BaseException:
+            call.outcome = "error"
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            if METRICS_SLOW_CALL_SECONDS and elapsed >= METRICS_SLOW_CALL_SECONDS:
+                breakdown = ", ".join(f"{name}={seconds:.3f}s" for name, seconds in sorted(stages.items(), key=lambda kv: -kv[1]))
+                logger.warning(f"Yavaş araç çağrısı '{tool_name}' ({elapsed:.2f} sn, trace_id={trace_id}): {breakdown}")
+            metrics.record_stage(f"tool.{tool_name}", elapsed)
+            metrics.tool_calls.inc(tool_name, call.outcome)
 
 # --- Güvenlik Bileşenleri ---
 PUBLIC_KEY_FILE = "public_key.pem"
+# Dashboard'un iptal ettiği token'ların özetlerini eklediği dosya; sunucu değiştikçe yeniden okur.
+REVOKED_TOKENS_FILE = os.getenv("REVOKED_TOKENS_FILE", "revoked_tokens.txt")
 ISSUER_URL = os.getenv("DASHBOARD_ISSUER_URL")
 AUDIENCE = os.getenv("DASHBOARD_AUDIENCE")
 AuthInfo = namedtuple("AuthInfo", ["claims", "expires_at", "scopes", "client_id"])
 
 class SimpleBearerAuthProvider:
-    def __init__(self, public_key: bytes, issuer: str, audience: str):
-        self.public_key = public_key
+    def __init__(
+        self, public_key: bytes, issuer: str, audience: str,
+        revocation_list: Optional[RevocationList] = None,
+        cache_maxsize: int = 1024, cache_ttl: float = 3600.0,
+    ):
+        # PEM anahtarı her doğrulamada yeniden ayrıştırılmasın diye bir kez yüklenir.
+        self.public_key = serialization.load_pem_public_key(public_key)
         self.issuer = issuer
         self.audience = audience
+        self.revocation_list = revocation_list
+        # Doğrulanmış token'lar, özetleri anahtar olacak şekilde en fazla `exp` anına kadar önbellekte tutulur;
+        # böylece aynı token'la gelen isteklerde RSA imza doğrulaması tekrarlanmaz.
+        self._verified = TTLCache(maxsize=cache_maxsize, ttl=cache_ttl)
         self.logger = setup_logger(self.__class__.__name__)
 
     async def verify_token(self, token: str) -> Dict[str, Any]:
+        digest = token_hash(token)
+        if self.revocation_list is not None and self.revocation_list.is_revoked(digest):
+            self._verified.pop(digest)
+            self.logger.warning("İptal edilmiş bir token ile erişim denendi.")
+            raise Exception("Geçersiz token")
+
+        auth_info = self._verified.get(digest)
+        if auth_info is not None:
+            return auth_info
+
         try:
             decoded_token = jwt.decode(
                 token, self.public_key, algorithms=["RS256"],
                 audience=self.audience, issuer=self.issuer,
             )
             client_id = decoded_token.get("sub")
-            return AuthInfo(claims=decoded_token, expires_at=decoded_token.get("exp"), scopes=[], client_id=client_id)
+            auth_info = AuthInfo(claims=decoded_token, expires_at=decoded_token.get("exp"), scopes=[], client_id=client_id)
         except jwt.PyJWTError as e:
             self.logger.error(f"Token doğrulama hatası: {e}")
             raise Exception("Geçersiz token")
 
+        expires_at = decoded_token.get("exp")
+        ttl = self._verified.ttl if expires_at is None else min(self._verified.ttl, expires_at - time.time())
+        if ttl > 0:
+            self._verified.set(digest, auth_info, ttl=ttl)
+        return auth_info
+
 # --- Ana Sunucu Sınıfı ---
 class MarketMCPServer:
-    def __init__(self, host: str, port: int, transport: str):
+    def __init__(self, host: str, port: int, transport: str, stateless_http: bool = False):
         self.host = host
         self.port = port
         self.transport = transport
+        # True ise streamable-http istekleri oturum durumu tutmadan işlenir (çok çalışanlı mod için gerekir).
+        self.stateless_http = stateless_http
         self.mcp = None
 
-    async def initialize(self) -> FastMCP:
+    def build(self) -> FastMCP:
+        """Çalışma ortamını kurar ve araçları kayıtlı FastMCP sunucusunu oluşturur."""
+        init_runtime()
         logger.info("MCP sunucusu hazırlanıyor...")
         auth_provider = None
-        if self.transport == 'sse':
+        if self.transport != 'stdio':
             try:
                 with open(PUBLIC_KEY_FILE, "rb") as f:
                     public_key = f.read()
                 auth_provider = SimpleBearerAuthProvider(
-                    public_key=public_key, issuer=ISSUER_URL, audience=AUDIENCE
+                    public_key=public_key, issuer=ISSUER_URL, audience=AUDIENCE,
+                    revocation_list=RevocationList(
+                        REVOKED_TOKENS_FILE,
+                        check_interval=float(os.getenv("REVOCATION_CHECK_INTERVAL_SECONDS", 1.0)),
+                    ),
+                    cache_maxsize=int(os.getenv("AUTH_CACHE_MAXSIZE", 1024)),
+                    cache_ttl=float(os.getenv("AUTH_CACHE_TTL_SECONDS", 3600)),
                 )
                 logger.info("Yetkilendirme sağlayıcı başarıyla yüklendi.")
             except FileNotFoundError:
@@ -108,11 +291,62 @@ class MarketMCPServer:
             name="MarketFiyatiV2",
             instructions="Türkiye'deki zincir marketlerde bir alışveriş listesindeki ürünlerin fiyatlarını bulan gelişmiş bir asistan.",
             host=self.host, port=self.port,
+            stateless_http=self.stateless_http,
             token_verifier=auth_provider,
             auth=auth_config,
         )
         self._register_tools()
+        if metrics.enabled and self._metrics_endpoint_allowed(auth_provider is not None):
+            self._register_metrics_route(auth_provider)
         return self.mcp
+
+    def _metrics_endpoint_allowed(self, has_auth: bool) -> bool:
+        """METRICS_ENDPOINT ayarına göre '/metrics' uç noktasının açılıp açılmayacağını belirler."""
+        if METRICS_ENDPOINT in ("1", "true", "yes"):
+            return True
+        if METRICS_ENDPOINT in ("0", "false", "no"):
+            return False
+        if has_auth or self.host in _LOCAL_HOSTS:
+            return True
+        logger.warning(
+            f"Yetkilendirme olmadan '{self.host}' adresine bağlanıldığı için '/metrics' kapalı; "
+            "açmak için METRICS_ENDPOINT=true ayarlayın."
+        )
+        return False
+
+    def build_app(self) -> Starlette:
+        """
+        Seçili transport için ASGI uygulamasını oluşturur. API istemcisi ve arka plan
+        görevleri, uygulamanın lifespan'i kapanırken (uvicorn'un düzgün kapanışında) kapatılır.
+        """
+        mcp = self.mcp or self.build()
+        app = mcp.sse_app() if self.transport == 'sse' else mcp.streamable_http_app()
+        transport_lifespan = app.router.lifespan_context
+
+        @asynccontextmanager
+        async def lifespan(app: Starlette):
+            async with transport_lifespan(app):
+                try:
+                    yield
+                finally:
+                    await shutdown_runtime()
+
+        app.router.lifespan_context = lifespan
+        return app
+
+    def _register_metrics_route(self, auth_provider: Optional[SimpleBearerAuthProvider] = None):
+        @self.mcp.custom_route("/metrics", methods=["GET"])
+        async def metrics_endpoint(request: Request) -> PlainTextResponse:
+            # Özel rotalar MCP'nin yetkilendirme katmanından geçmez; token burada doğrulanır.
+            if auth_provider is not None:
+                scheme, _, token = request.headers.get("authorization", "").partition(" ")
+                try:
+                    if scheme.lower() != "bearer" or not token:
+                        raise Exception("Token yok")
+                    await auth_provider.verify_token(token.strip())
+                except Exception:
+                    return PlainTextResponse("Yetkisiz", status_code=401, headers={"WWW-Authenticate": "Bearer"})
+            return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
         
     def _register_tools(self):
         @self.mcp.tool()
@@ -122,58 +356,192 @@ class MarketMCPServer:
             longitude: float = Field(..., description="Aramanın yapılacağı merkez noktanın boylam bilgisi."),
             radius_km: int = Field(default=1, description="Arama yapılacak alanın kilometre cinsinden yarıçapı. Varsayılan 1'dir."),
             limit: Optional[int] = Field(None, description="Sonuçların kaç ürünle sınırlandırılacağı. Belirtilmezse tümü gelir."),
-            sort_by: str = Field("price", description="Sonuçların neye göre sıralanacağı. 'price' (fiyat) veya 'unit_price' (birim fiyat) olabilir. Varsayılan 'price'dır.")
+            sort_by: str = Field("price", description="Sonuçların neye göre sıralanacağı. 'price' (fiyat) veya 'unit_price' (kg / L / adet başına birim fiyat; önce kg, sonra L, sonra adet başına fiyatlar kendi içinde sıralanır, birim fiyatı okunamayanlar en sona kalır) olabilir. Varsayılan 'price'dır."),
+            rank_per_product: bool = Field(False, description="True ise sıralama ve 'limit' listedeki her ürün için ayrı ayrı uygulanır. Varsayılan olarak tüm sonuçlar birlikte sıralanır."),
+            timeout_seconds: Optional[float] = Field(None, description="Aramanın en fazla kaç saniye süreceği. Süre dolduğunda o ana kadar bulunan fiyatlar döner. Belirtilmezse sunucu varsayılanı kullanılır."),
+            stream: bool = Field(False, description="True ise her ürünün fiyatları, araması biter bitmez MCP ilerleme bildirimiyle gönderilir. Son yanıt yine tüm sonuçların özetidir."),
+            group_by_product: bool = Field(False, description="True ise sonuçlar 'grouped_products' alanında, her ürün bir kez ve market fiyatlarının listesiyle döner. Büyük sonuçlarda yanıtı küçültür."),
+            ctx: Context = None
         ) -> ShoppingListResult:
-            logger.info(f"Araç çağrıldı: products={product_list}, limit={limit}, sort_by={sort_by}")
-            try:
-                found_products = await api_client.find_products_in_shopping_list(
-                    product_names=product_list, latitude=latitude, longitude=longitude, radius_km=radius_km
-                )
+            logger.info(f"Araç çağrıldı: products={product_list}, limit={limit}, sort_by={sort_by}, per_product={rank_per_product}, timeout={timeout_seconds}, stream={stream}, grouped={group_by_product}")
+            deadline = timeout_seconds if timeout_seconds is not None else DEFAULT_TOOL_DEADLINE_SECONDS
+            if prefetch_scheduler is not None:
+                prefetch_scheduler.ensure_running()
+                prefetch_scheduler.record(product_list, latitude, longitude, radius_km)
 
-                if not found_products:
-                    # GÜNCELLEME: Hata durumunda yeni modele uygun boş bir liste gönderiyoruz.
-                    return ShoppingListResult(products=[], found_prices_count=0, error_message="Listenizdeki ürünlerin hiçbiri bu bölgede bulunamadı.")
+            on_product_done = None
+            if stream and ctx is not None:
+                completed = 0
 
-                if sort_by.lower() == 'unit_price':
-                    found_products.sort(key=lambda p: parse_unit_price(p.unit_price))
-                else:
-                    found_products.sort(key=lambda p: p.price)
+                async def _stream_product(product_name: str, records: List[PriceRecord]) -> None:
+                    nonlocal completed
+                    completed += 1
+                    product_records = rank_records(records, sort_by, limit)
+                    update = ProductSearchUpdate(
+                        product_name=product_name,
+                        products=[r.to_detailed_price() for r in product_records],
+                        found_prices_count=len(product_records)
+                    )
+                    meta = ctx.request_context.meta
+                    if meta is not None and meta.progressToken is not None:
+                        await ctx.report_progress(completed, len(product_list), message=update.model_dump_json())
+                    else:
+                        # İstemci ilerleme token'ı göndermediyse ara sonucu log bildirimi olarak ilet.
+                        await ctx.log("info", update.model_dump_json(), logger_name="find_shopping_list_prices")
 
-                if limit and limit > 0:
-                    found_products = found_products[:limit]
+                on_product_done = _stream_product
+
+            with tool_call("find_shopping_list_prices") as call:
+                try:
+                    search = await api_client.find_products_in_shopping_list(
+                        product_names=product_list, latitude=latitude, longitude=longitude, radius_km=radius_km,
+                        limit=limit, deadline=deadline if deadline > 0 else None, on_product_done=on_product_done
+                    )
+                    if search.timed_out_products:
+                        logger.warning(f"Süre sınırı ({deadline} sn) doldu, tamamlanamayan ürünler: {search.timed_out_products}")
+                    return build_shopping_list_result(search, sort_by, limit, rank_per_product, group_by_product)
                 
-                # GÜNCELLEME: Metin formatlama döngüsü tamamen kaldırıldı.
-                # Artık doğrudan işlenmiş ve sıralanmış ürün listesini döndürüyoruz.
-                # n8n bu yapısal veriyi alıp kendisi formatlayacak.
-                return ShoppingListResult(
-                    products=found_products, 
-                    found_prices_count=len(found_products)
+                except Exception as e:
+                    call.outcome = "error"
+                    logger.exception("Araç çalıştırılırken beklenmedik bir hata oluştu.")
+                    # GÜNCELLEME: Hata durumunda yeni modele uygun boş bir liste gönderiyoruz.
+                    return ShoppingListResult(products=[], found_prices_count=0, error_message=f"Teknik bir hata oluştu: {str(e)}")
+
+        @self.mcp.tool()
+        async def find_shopping_list_prices_batch(
+            jobs: List[ShoppingListJob] = Field(..., description="Her biri bir alışveriş listesi ve konumdan oluşan işler. Aynı market kümesini paylaşan işlerde her ürün bir kez aranır."),
+            limit: Optional[int] = Field(None, description="Her işin sonuçlarının kaç ürünle sınırlandırılacağı. Belirtilmezse tümü gelir."),
+            sort_by: str = Field("price", description="Sonuçların neye göre sıralanacağı. 'price' (fiyat) veya 'unit_price' (kg / L / adet başına birim fiyat; önce kg, sonra L, sonra adet başına fiyatlar kendi içinde sıralanır, birim fiyatı okunamayanlar en sona kalır) olabilir. Varsayılan 'price'dır."),
+            rank_per_product: bool = Field(False, description="True ise sıralama ve 'limit' her işte listedeki her ürün için ayrı ayrı uygulanır."),
+            group_by_product: bool = Field(False, description="True ise her işin sonuçları 'grouped_products' alanında ürün bazında gruplanmış döner."),
+            timeout_seconds: Optional[float] = Field(None, description="Tüm toplu aramanın en fazla kaç saniye süreceği. Belirtilmezse sunucu varsayılanı kullanılır.")
+        ) -> BatchShoppingListResult:
+            logger.info(f"Toplu araç çağrıldı: jobs={len(jobs)}, limit={limit}, sort_by={sort_by}, timeout={timeout_seconds}")
+            if len(jobs) > BATCH_MAX_JOBS:
+                return BatchShoppingListResult(
+                    results=[], error_message=f"Tek çağrıda en fazla {BATCH_MAX_JOBS} iş gönderilebilir."
                 )
-                
-            except Exception as e:
-                logger.exception("Araç çalıştırılırken beklenmedik bir hata oluştu.")
-                # GÜNCELLEME: Hata durumunda yeni modele uygun boş bir liste gönderiyoruz.
-                return ShoppingListResult(products=[], found_prices_count=0, error_message=f"Teknik bir hata oluştu: {str(e)}")
+            deadline = timeout_seconds if timeout_seconds is not None else DEFAULT_TOOL_DEADLINE_SECONDS
+            if prefetch_scheduler is not None:
+                prefetch_scheduler.ensure_running()
+                for job in jobs:
+                    prefetch_scheduler.record(job.product_list, job.latitude, job.longitude, job.radius_km)
+
+            with tool_call("find_shopping_list_prices_batch") as call:
+                try:
+                    searches = await api_client.find_products_for_jobs(
+                        jobs, limit=limit, deadline=deadline if deadline > 0 else None
+                    )
+                    return BatchShoppingListResult(results=[
+                        build_shopping_list_result(search, sort_by, limit, rank_per_product, group_by_product)
+                        for search in searches
+                    ])
+                except Exception as e:
+                    call.outcome = "error"
+                    logger.exception("Toplu araç çalıştırılırken beklenmedik bir hata oluştu.")
+                    return BatchShoppingListResult(results=[], error_message=f"Teknik bir hata oluştu: {str(e)}")
+
+        @self.mcp.tool()
+        async def optimize_shopping_basket(
+            product_list: List[str] = Field(..., description="Sepete konulacak ürünlerin listesi. Örnek: ['süt', 'yumurta', 'ekmek']"),
+            latitude: float = Field(..., description="Aramanın yapılacağı merkez noktanın enlem bilgisi."),
+            longitude: float = Field(..., description="Aramanın yapılacağı merkez noktanın boylam bilgisi."),
+            radius_km: int = Field(default=1, description="Arama yapılacak alanın kilometre cinsinden yarıçapı. Varsayılan 1'dir."),
+            max_stores: int = Field(2, description="Bölünmüş sepette uğranabilecek en fazla market sayısı. Varsayılan 2'dir."),
+            distance_cost_per_km: Optional[float] = Field(None, description="Mesafe ağırlıklı sepette marketlerin km başına TL maliyeti. Belirtilmezse sunucu varsayılanı kullanılır."),
+            sort_by: str = Field("price", description="Bir markette aynı ürünün birden çok ambalajı varsa hangisinin seçileceği. 'price' (en düşük tutar) veya 'unit_price' (kg / L / adet başına birim fiyat; büyük ambalajı tercih edebilir) olabilir. Marketler her durumda gerçek fiyat toplamıyla karşılaştırılır. Varsayılan 'price'dır."),
+            timeout_seconds: Optional[float] = Field(None, description="Aramanın en fazla kaç saniye süreceği. Belirtilmezse sunucu varsayılanı kullanılır.")
+        ) -> BasketOptimizationResult:
+            """
+            Tüm fiyat satırları yerine en ucuz tek market sepetini, en fazla 'max_stores'
+            markete bölünmüş en ucuz sepeti ve mesafe ağırlıklı sepeti özet olarak döndürür.
+            """
+            logger.info(f"Sepet aracı çağrıldı: products={product_list}, max_stores={max_stores}, sort_by={sort_by}, timeout={timeout_seconds}")
+            deadline = timeout_seconds if timeout_seconds is not None else DEFAULT_TOOL_DEADLINE_SECONDS
+            if prefetch_scheduler is not None:
+                prefetch_scheduler.ensure_running()
+                prefetch_scheduler.record(product_list, latitude, longitude, radius_km)
+
+            with tool_call("optimize_shopping_basket") as call:
+                try:
+                    search = await api_client.find_products_in_shopping_list(
+                        product_names=product_list, latitude=latitude, longitude=longitude, radius_km=radius_km,
+                        deadline=deadline if deadline > 0 else None
+                    )
+                    with metrics.stage("basket_optimize"):
+                        result = optimize_basket(
+                            search.records, product_list,
+                            max_stores=min(max(max_stores, 1), BASKET_MAX_STORES),
+                            distance_cost_per_km=distance_cost_per_km if distance_cost_per_km is not None else BASKET_DISTANCE_COST_PER_KM,
+                            max_candidates=BASKET_MAX_CANDIDATE_STORES,
+                            sort_by=sort_by,
+                        )
+                    result.timed_out_products = search.timed_out_products
+                    if result.cheapest_single_store is None:
+                        result.error_message = "Listenizdeki ürünlerin hiçbiri bu bölgede bulunamadı."
+                    return result
+                except Exception as e:
+                    call.outcome = "error"
+                    logger.exception("Sepet aracı çalıştırılırken beklenmedik bir hata oluştu.")
+                    return BasketOptimizationResult(error_message=f"Teknik bir hata oluştu: {str(e)}")
             
+def create_app() -> Starlette:
+    """
+    uvicorn için ASGI uygulama fabrikası. Her çalışan süreç bu fonksiyonla kendi sunucusunu
+    ve API istemcisini kurar; ayarlar `main` tarafından ortam değişkenleriyle aktarılır.
+    """
+    server = MarketMCPServer(
+        host=os.getenv("MCP_SERVER_HOST", "0.0.0.0"),
+        port=int(os.getenv("MCP_SERVER_PORT", 8071)),
+        transport=os.getenv("MCP_TRANSPORT", "streamable-http"),
+        stateless_http=os.getenv("MCP_STATELESS_HTTP", "false").lower() in ("1", "true", "yes"),
+    )
+    return server.build_app()
+
+async def _serve_stdio(host: str, port: int):
+    mcp = MarketMCPServer(host=host, port=port, transport='stdio').build()
+    try:
+        await mcp.run_stdio_async()
+    finally:
+        await shutdown_runtime()
+
 # --- Sunucuyu Başlatan Komut Satırı Arayüzü ---
 @click.command()
 @click.option('--host', default='0.0.0.0', help='Sunucunun çalışacağı adres.')
 @click.option('--port', default=int(os.getenv("MCP_SERVER_PORT", 8071)), help='Sunucunun çalışacağı port.')
-@click.option('--transport', default='sse', help='Transport tipi (sse veya stdio).')
-def main(host, port, transport):
+@click.option('--transport', default='sse', type=click.Choice(['sse', 'streamable-http', 'stdio']), help='Transport tipi (sse, streamable-http veya stdio).')
+@click.option('--workers', default=int(os.getenv("MCP_WORKERS", 1)), help='Aynı portu paylaşan çalışan süreç sayısı (1\'den fazlası yalnızca streamable-http ile).')
+def main(host, port, transport, workers):
     """Market Fiyatı MCP sunucusunu başlatır."""
-    async def _run():
-        server = MarketMCPServer(host=host, port=port, transport=transport)
-        mcp = await server.initialize()
-        logger.info("MCP sunucusu başarıyla hazırlandı.")
-        return mcp
-    
+    setup_logger("MCP_Server")
+    if transport == 'stdio':
+        asyncio.run(_serve_stdio(host, port))
+        return
+    if workers > 1 and transport != 'streamable-http':
+        # SSE oturumları onları açan sürecin belleğinde tutulur; istekler başka çalışana düşerse oturum bulunamaz.
+        raise click.UsageError("Birden fazla çalışan yalnızca '--transport streamable-http' ile kullanılabilir.")
+
+    os.environ.update({
+        "MCP_SERVER_HOST": host, "MCP_SERVER_PORT": str(port), "MCP_TRANSPORT": transport, "MCP_WORKERS": str(workers),
+    })
+    if workers > 1:
+        # İstekler herhangi bir çalışana düşebileceği için oturumsuz (stateless) mod kullanılır ve
+        # nearest/search sonuçları çalışanlar arasında disk önbelleğiyle paylaşılır.
+        os.environ["MCP_STATELESS_HTTP"] = "true"
+        if not os.getenv("SHARED_CACHE_DB"):
+            os.environ["SHARED_CACHE_DB"] = "shared_cache.db"
+
     try:
-        mcp_instance = asyncio.run(_run())
-        logger.info(f"Sunucu {host}:{port} adresinde {transport} transportu ile başlatılıyor...")
-        mcp_instance.run(transport=transport)
+        logger.info(f"Sunucu {host}:{port} adresinde {transport} transportu ile {workers} çalışanla başlatılıyor...")
+        if workers > 1:
+            uvicorn.run(
+                "market_fiyati_mcp_server:create_app", factory=True, host=host, port=port, workers=workers,
+                app_dir=os.path.dirname(os.path.abspath(__file__)), log_level="info",
+            )
+        else:
+            uvicorn.run(create_app(), host=host, port=port, log_level="info")
     except Exception as e:
         logger.error(f"Sunucu başlatılamadı: {str(e)}", exc_info=True)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,13 +1,23 @@
 # models.py (Resim gösterme özelliği için güncellenmiş Final Versiyon)
 
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
+from typing import Any, List, Optional
+
+from utils.pricing import normalize_unit_price
 
 # ==============================================================================
 # BÖLÜM 1: API Yanıt Modelleri
 # Bu modeller, marketfiyati.org.tr API'sinden gelen JSON verisini birebir karşılar.
 # ==============================================================================
 
+# Doğrulama bağlamında (context) bu anahtarla bir market ID kümesi verilirse,
+# kümede olmayan marketler daha doğrulanmadan elenir. Örnek:
+#   ApiSearchResponse.model_validate_json(raw_bytes, context={DEPOT_FILTER_CONTEXT_KEY: {"id1", "id2"}})
+DEPOT_FILTER_CONTEXT_KEY = "depot_ids"
+
+def _depot_filter(info: ValidationInfo) -> Optional[set]:
+    return info.context.get(DEPOT_FILTER_CONTEXT_KEY) if info.context else None
+
 class ProductDepotInfo(BaseModel):
     """
     API'den gelen, bir ürünün tek bir marketteki fiyat ve konum bilgisidir.
@@ -24,6 +34,7 @@ class ContentItem(BaseModel):
     API'den gelen, bir ürünün genel bilgilerini ve tüm marketlerdeki 
     fiyatlarını içeren ana model.
     """
+    id: Optional[str] = None
     title: str
     brand: Optional[str] = None
     # GÜNCELLEME: API'den gelen resim adresini yakalamak için eklendi.
@@ -31,11 +42,29 @@ class ContentItem(BaseModel):
     refined_quantity_unit: Optional[str] = Field(None, alias="refinedQuantityUnit")
     product_depot_info_list: List[ProductDepotInfo] = Field(..., alias="productDepotInfoList")
 
+    @field_validator("product_depot_info_list", mode="before")
+    @classmethod
+    def _drop_unknown_depots(cls, value: Any, info: ValidationInfo) -> Any:
+        """Bağlamda market filtresi varsa, listede olmayan marketleri doğrulamadan önce atar."""
+        depot_ids = _depot_filter(info)
+        if depot_ids is None or not isinstance(value, list):
+            return value
+        return [d for d in value if isinstance(d, dict) and d.get("depotId") in depot_ids]
+
 class ApiSearchResponse(BaseModel):
     """
     API'nin /search uç noktasından dönen tüm yanıtı kapsayan üst model.
     """
     content: List[ContentItem]
+    number_of_found: Optional[int] = Field(None, alias="numberOfFound")
+
+    @field_validator("content", mode="after")
+    @classmethod
+    def _drop_items_without_depots(cls, value: List[ContentItem], info: ValidationInfo) -> List[ContentItem]:
+        """Market filtresi uygulandıysa, hiçbir yakın markette bulunmayan ürünleri atar."""
+        if _depot_filter(info) is None:
+            return value
+        return [item for item in value if item.product_depot_info_list]
 
 
 # ==============================================================================
@@ -58,11 +87,73 @@ class DetailedProductPrice(BaseModel):
     image_url: Optional[str] = None
 
 
+class PriceRecord:
+    """
+    Zenginleştirme sırasında her (ürün, market) çifti için oluşturulan hafif kayıt.
+
+    Ürün başlığı, miktar ve resim gibi alanlar kopyalanmaz; API yanıtındaki
+    `ContentItem` ve `ProductDepotInfo` nesnelerine referans tutulur. Pydantic
+    modeline yalnızca n8n'e gönderilecek kayıtlar için dönüştürülür.
+    """
+    __slots__ = ("item", "depot", "distance_km", "product_name", "unit_price_value", "unit_price_unit")
+
+    def __init__(self, item: ContentItem, depot: ProductDepotInfo, distance_km: Optional[float], product_name: str):
+        self.item = item
+        self.depot = depot
+        self.distance_km = distance_km
+        # Bu kaydı bulan, kullanıcının listesindeki arama kelimesi.
+        self.product_name = product_name
+        # Sıralamada tekrar tekrar ayrıştırılmaması için kg / L / adet başına fiyat bir kez hesaplanır.
+        # Birim ('kg', 'L', 'adet' veya tanınmazsa None) farklı birimlerin tek eksende karşılaştırılmaması için saklanır.
+        self.unit_price_value, self.unit_price_unit = normalize_unit_price(depot.unit_price)
+
+    def to_detailed_price(self) -> DetailedProductPrice:
+        return DetailedProductPrice(
+            product_title=self.item.title,
+            product_quantity=self.item.refined_quantity_unit,
+            price=self.depot.price,
+            unit_price=self.depot.unit_price,
+            market_name=self.depot.market_adi,
+            distance_km=self.distance_km,
+            image_url=self.item.image_url,
+        )
+
+
 # ==============================================================================
-# BÖLÜM 3: Araç Çıktı Modeli
+# BÖLÜM 3: Araç Girdi Modeli
+# Toplu araçta her bir alışveriş listesi işini tanımlayan model.
+# ==============================================================================
+
+class ShoppingListJob(BaseModel):
+    """'find_shopping_list_prices_batch' aracına gönderilen tek bir alışveriş listesi işi."""
+    product_list: List[str] = Field(description="Fiyatları bulunacak ürünlerin listesi.")
+    latitude: float = Field(description="Aramanın yapılacağı merkez noktanın enlem bilgisi.")
+    longitude: float = Field(description="Aramanın yapılacağı merkez noktanın boylam bilgisi.")
+    radius_km: int = Field(1, description="Arama yapılacak alanın kilometre cinsinden yarıçapı.")
+
+
+# ==============================================================================
+# BÖLÜM 4: Araç Çıktı Modeli
 # MCP aracımızın n8n Agent'ına döndürdüğü nihai sonuç modeli.
 # ==============================================================================
 
+class MarketOffer(BaseModel):
+    """Gruplanmış çıktıda bir ürünün tek bir marketteki fiyatı."""
+    price: float
+    unit_price: Optional[str] = None
+    market_name: str
+    distance_km: Optional[float] = None
+
+class GroupedProduct(BaseModel):
+    """
+    Gruplanmış çıktıda her ürün bir kez yer alır; başlık, miktar ve resim
+    tekrarlanmadan ürünün tüm market fiyatları `offers` altında listelenir.
+    """
+    product_title: str
+    product_quantity: Optional[str] = None
+    image_url: Optional[str] = None
+    offers: List[MarketOffer]
+
 class ShoppingListResult(BaseModel):
     """
     'find_shopping_list_prices' aracının çıktısını tanımlar. Bu çıktı,
@@ -70,5 +161,60 @@ class ShoppingListResult(BaseModel):
     """
     # GÜNCELLEME: 'summary' alanı kaldırıldı, yerine 'products' listesi geldi.
     products: List[DetailedProductPrice] = Field(description="Bulunan ürünlerin detaylı listesi.")
+    grouped_products: List[GroupedProduct] = Field(default_factory=list, description="Gruplanmış çıktı istendiyse, her ürün bir kez ve market fiyatlarıyla birlikte.")
     found_prices_count: int = Field(description="Bulunan toplam fiyat sayısı.")
-    error_message: Optional[str] = Field(None, description="Bir hata oluştuysa veya hiçbir ürün bulunamadıysa hata mesajı.")
\ No newline at end of file
+    timed_out_products: List[str] = Field(default_factory=list, description="Süre sınırı dolduğu için araması tamamlanamayan ürünler.")
+    error_message: Optional[str] = Field(None, description="Bir hata oluştuysa veya hiçbir ürün bulunamadıysa hata mesajı.")
+
+class ProductSearchUpdate(BaseModel):
+    """
+    Akış (stream) modunda, tek bir ürünün araması biter bitmez MCP ilerleme
+    bildirimiyle gönderilen ara sonuç.
+    """
+    product_name: str = Field(description="Araması tamamlanan ürün.")
+    products: List[DetailedProductPrice] = Field(description="Bu ürün için bulunan fiyatlar.")
+    found_prices_count: int = Field(description="Bu ürün için bulunan fiyat sayısı.")
+
+class BatchShoppingListResult(BaseModel):
+    """
+    'find_shopping_list_prices_batch' aracının çıktısı. `results`, gönderilen
+    işlerle aynı sırada her iş için bir ShoppingListResult içerir.
+    """
+    results: List[ShoppingListResult] = Field(description="İşlerle aynı sırada, her iş için sonuç.")
+    error_message: Optional[str] = Field(None, description="Toplu çağrının tamamı başarısız olduysa hata mesajı.")
+
+class BasketItem(BaseModel):
+    """Sepet planında listedeki bir ürün için seçilen fiyat."""
+    product_name: str = Field(description="Kullanıcının listesindeki ürün.")
+    product_title: str
+    product_quantity: Optional[str] = None
+    price: float
+    unit_price: Optional[str] = None
+    market_name: str
+
+class BasketStore(BaseModel):
+    """Sepet planında uğranacak bir market ve o marketten alınacakların toplamı."""
+    market_name: str
+    distance_km: Optional[float] = None
+    subtotal: float
+    item_count: int
+
+class BasketPlan(BaseModel):
+    """Bir alışveriş stratejisine göre hesaplanmış sepet."""
+    total_price: float = Field(description="Seçilen ürünlerin toplam fiyatı.")
+    total_distance_km: float = Field(description="Uğranacak marketlerin mesafelerinin toplamı.")
+    stores: List[BasketStore] = Field(description="Uğranacak marketler.")
+    items: List[BasketItem] = Field(description="Her ürün için seçilen fiyat ve market.")
+    missing_products: List[str] = Field(default_factory=list, description="Bu planın marketlerinde bulunamayan ürünler.")
+
+class BasketOptimizationResult(BaseModel):
+    """
+    'optimize_shopping_basket' aracının çıktısı. Tüm fiyat satırları yerine
+    yalnızca üç sepet planının özeti döner.
+    """
+    cheapest_single_store: Optional[BasketPlan] = Field(None, description="Tüm listenin tek bir marketten alındığı en ucuz sepet.")
+    cheapest_split: Optional[BasketPlan] = Field(None, description="En fazla 'max_stores' markete bölünmüş en ucuz sepet.")
+    distance_weighted: Optional[BasketPlan] = Field(None, description="Fiyat ile market mesafelerinin birlikte değerlendirildiği sepet.")
+    unavailable_products: List[str] = Field(default_factory=list, description="Hiçbir yakın markette bulunamayan ürünler.")
+    timed_out_products: List[str] = Field(default_factory=list, description="Süre sınırı dolduğu için araması tamamlanamayan ürünler.")
+    error_message: Optional[str] = Field(None, description="Bir hata oluştuysa veya hiçbir ürün bulunamadıysa hata mesajı.")
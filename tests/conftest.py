@@ -0,0 +1,18 @@
+import os
+import sys
+
+# Modüller proje kökünden (client, models, utils) içe aktarılır.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class FakeTimer:
+    """Testlerde `timer` parametresine verilen, elle ilerletilen saat."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
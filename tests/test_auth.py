@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+import market_fiyati_mcp_server as server
+from utils.auth import RevocationList, append_revoked_token, token_hash
+
+from conftest import FakeTimer
+
+ISSUER = "https://panel.example"
+AUDIENCE = "market-fiyati-mcp"
+
+
+def test_token_hash_is_stable_sha256():
+    assert token_hash("abc") == "ba7816bf8f01cfea414140de5dae2223b00361a396177a9cb410ff61f20015ad"
+
+
+def test_revocation_list_reads_only_appended_lines(tmp_path):
+    path = str(tmp_path / "revoked.txt")
+    timer = FakeTimer()
+    revoked = RevocationList(path, check_interval=1.0, timer=timer)
+    assert not revoked.is_revoked(token_hash("t1"))
+
+    append_revoked_token(path, "t1")
+    # Kontrol aralığı dolmadan dosyaya tekrar bakılmaz.
+    assert not revoked.is_revoked(token_hash("t1"))
+    timer.advance(1)
+    assert revoked.is_revoked(token_hash("t1"))
+
+    append_revoked_token(path, "t2")
+    timer.advance(1)
+    assert revoked.is_revoked(token_hash("t2"))
+    assert revoked.is_revoked(token_hash("t1"))
+    assert revoked.stats() == {"revoked": 2, "reloads": 2}
+
+
+def test_revocation_list_waits_for_complete_line(tmp_path):
+    path = tmp_path / "revoked.txt"
+    timer = FakeTimer()
+    revoked = RevocationList(str(path), check_interval=0, timer=timer)
+    digest = token_hash("t1")
+    path.write_text(digest[:10], encoding="utf-8")
+    assert not revoked.is_revoked(digest)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(digest[10:] + "\n")
+    timer.advance(1)
+    assert revoked.is_revoked(digest)
+
+
+def test_revocation_list_reloads_truncated_file(tmp_path):
+    path = tmp_path / "revoked.txt"
+    timer = FakeTimer()
+    revoked = RevocationList(str(path), check_interval=0, timer=timer)
+    path.write_text(token_hash("uzun-bir-token") + "\n" + token_hash("t2") + "\n", encoding="utf-8")
+    assert revoked.is_revoked(token_hash("t2"))
+
+    path.write_text(token_hash("t3") + "\n", encoding="utf-8")
+    timer.advance(1)
+    assert revoked.is_revoked(token_hash("t3"))
+    assert not revoked.is_revoked(token_hash("t2"))
+
+    path.unlink()
+    timer.advance(1)
+    assert not revoked.is_revoked(token_hash("t3"))
+
+
+@pytest.fixture
+def keys():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_pem = private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private_key, public_pem
+
+
+@pytest.fixture
+def provider_factory(keys, monkeypatch):
+    # Testler logs/ dizinine yazmasın.
+    monkeypatch.setattr(server, "setup_logger", logging.getLogger)
+    _, public_pem = keys
+
+    def factory(**kwargs):
+        return server.SimpleBearerAuthProvider(public_pem, ISSUER, AUDIENCE, **kwargs)
+
+    return factory
+
+
+def _token(private_key, expires_in=3600, **claims):
+    payload = {"sub": "n8n", "iss": ISSUER, "aud": AUDIENCE, "exp": int(time.time()) + expires_in, **claims}
+    return jwt.encode(payload, private_key, algorithm="RS256")
+
+
+def _count_decodes(monkeypatch):
+    calls = []
+    real_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(1)
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(server.jwt, "decode", counting_decode)
+    return calls
+
+
+def test_verified_token_is_cached(keys, provider_factory, monkeypatch):
+    private_key, _ = keys
+    provider = provider_factory()
+    token = _token(private_key)
+    decodes = _count_decodes(monkeypatch)
+
+    first = asyncio.run(provider.verify_token(token))
+    second = asyncio.run(provider.verify_token(token))
+    assert first.client_id == "n8n"
+    assert second is first
+    assert len(decodes) == 1
+
+
+def test_invalid_tokens_are_rejected_and_not_cached(keys, provider_factory, monkeypatch):
+    private_key, _ = keys
+    provider = provider_factory()
+    decodes = _count_decodes(monkeypatch)
+    wrong_audience = _token(private_key, aud="başka")
+    for _ in range(2):
+        with pytest.raises(Exception, match="Geçersiz token"):
+            asyncio.run(provider.verify_token(wrong_audience))
+    assert len(decodes) == 2
+
+    with pytest.raises(Exception, match="Geçersiz token"):
+        asyncio.run(provider.verify_token(_token(private_key, expires_in=-10)))
+
+
+def test_cache_entry_does_not_outlive_token_expiry(keys, provider_factory):
+    private_key, _ = keys
+    provider = provider_factory(cache_ttl=3600)
+    token = _token(private_key, expires_in=30)
+    asyncio.run(provider.verify_token(token))
+    remaining = provider._verified.ttl_remaining(token_hash(token))
+    assert remaining is not None and remaining <= 30
+
+
+def test_revoked_token_is_rejected_even_when_cached(keys, provider_factory, tmp_path):
+    private_key, _ = keys
+    path = str(tmp_path / "revoked.txt")
+    timer = FakeTimer()
+    provider = provider_factory(revocation_list=RevocationList(path, check_interval=0, timer=timer))
+    token = _token(private_key)
+    asyncio.run(provider.verify_token(token))
+
+    append_revoked_token(path, token)
+    timer.advance(1)
+    with pytest.raises(Exception, match="Geçersiz token"):
+        asyncio.run(provider.verify_token(token))
+    assert token_hash(token) not in provider._verified
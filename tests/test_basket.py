@@ -0,0 +1,116 @@
+from models import ContentItem, PriceRecord, ProductDepotInfo
+from utils.basket import optimize_basket
+
+
+def _record(product_name, depot_id, price, unit_price=None, distance_km=1.0, title=None, quantity=None):
+    item = ContentItem.model_construct(
+        id=f"{product_name}-{title or ''}", title=title or product_name.title(), brand=None, image_url=None,
+        refined_quantity_unit=quantity, product_depot_info_list=[],
+    )
+    depot = ProductDepotInfo.model_construct(
+        depot_id=depot_id, price=price, unit_price=unit_price, market_adi=f"market-{depot_id}",
+        latitude=41.0, longitude=29.0,
+    )
+    return PriceRecord(item, depot, distance_km, product_name)
+
+
+def _chosen(plan):
+    return {item.product_name: (item.market_name, item.price) for item in plan.items}
+
+
+def test_single_store_covers_most_products_at_lowest_total():
+    records = [
+        _record("süt", "a", 30.0), _record("ekmek", "a", 10.0),
+        _record("süt", "b", 25.0), _record("ekmek", "b", 12.0),
+        _record("süt", "c", 20.0),
+    ]
+    result = optimize_basket(records, ["süt", "ekmek"], sort_by="price")
+    single = result.cheapest_single_store
+    # c en ucuz sütü sunsa da ekmeği yok; tüm listeyi karşılayanlardan en ucuzu b.
+    assert _chosen(single) == {"süt": ("market-b", 25.0), "ekmek": ("market-b", 12.0)}
+    assert single.total_price == 37.0
+    assert single.missing_products == []
+    assert result.unavailable_products == []
+
+
+def test_split_picks_cheapest_product_per_store():
+    records = [
+        _record("süt", "a", 30.0), _record("ekmek", "a", 10.0),
+        _record("süt", "b", 25.0), _record("ekmek", "b", 12.0),
+        _record("süt", "c", 20.0),
+    ]
+    split = optimize_basket(records, ["süt", "ekmek"], max_stores=2, sort_by="price").cheapest_split
+    assert _chosen(split) == {"süt": ("market-c", 20.0), "ekmek": ("market-a", 10.0)}
+    assert split.total_price == 30.0
+    assert {store.market_name: store.item_count for store in split.stores} == {"market-a": 1, "market-c": 1}
+
+
+def test_distance_weighted_plan_prefers_nearby_store():
+    records = [
+        _record("süt", "yakın", 22.0, distance_km=0.5),
+        _record("süt", "uzak", 20.0, distance_km=5.0),
+    ]
+    result = optimize_basket(records, ["süt"], distance_cost_per_km=1.0, sort_by="price")
+    assert _chosen(result.cheapest_split) == {"süt": ("market-uzak", 20.0)}
+    assert _chosen(result.distance_weighted) == {"süt": ("market-yakın", 22.0)}
+
+
+def test_unit_price_only_chooses_package_within_store():
+    records = [
+        _record("süt", "a", 35.0, "35,00 ₺/L", title="Süt 1 L", quantity="1 L"),
+        _record("süt", "a", 150.0, "30,00 ₺/L", title="Süt 5 L", quantity="5 L"),
+    ]
+    by_price = optimize_basket(records, ["süt"])
+    assert [(i.product_title, i.market_name) for i in by_price.cheapest_single_store.items] == [("Süt 1 L", "market-a")]
+
+    by_unit = optimize_basket(records, ["süt"], sort_by="unit_price")
+    assert [(i.product_title, i.market_name) for i in by_unit.cheapest_single_store.items] == [("Süt 5 L", "market-a")]
+    # Plan tutarı birim fiyattan değil, gerçek fiyattan hesaplanır.
+    assert by_unit.cheapest_single_store.total_price == 150.0
+
+    # Başka bir market aynı ürünü daha düşük tutara sunuyorsa marketler tutarla karşılaştırılır.
+    records.append(_record("süt", "b", 36.0, "36,00 ₺/L", title="Süt 1 L", quantity="1 L"))
+    by_unit = optimize_basket(records, ["süt"], sort_by="unit_price")
+    assert [(i.product_title, i.market_name) for i in by_unit.cheapest_single_store.items] == [("Süt 1 L", "market-b")]
+
+
+def test_unit_price_mode_compares_stores_by_actual_total():
+    # Birim fiyatlar farklı birimlerde olduğundan toplanamaz; market a'nın TL/adet değeri
+    # düşük olsa da b aynı listeyi daha ucuza karşılar.
+    records = [
+        _record("peynir", "a", 100.0, "200,00 ₺/kg"), _record("yumurta", "a", 25.0, "2,50 ₺/adet"),
+        _record("peynir", "b", 60.0, "240,00 ₺/kg"), _record("yumurta", "b", 20.0, "2,00 ₺/adet"),
+    ]
+    result = optimize_basket(records, ["peynir", "yumurta"], sort_by="unit_price", distance_cost_per_km=0.0)
+    assert result.cheapest_single_store.total_price == 80.0
+    assert {store.market_name for store in result.cheapest_single_store.stores} == {"market-b"}
+    assert result.cheapest_split.total_price == 80.0
+
+
+def test_unit_price_falls_back_to_price_when_unknown():
+    records = [
+        _record("ekmek", "a", 12.0, None, title="Ekmek büyük"),
+        _record("ekmek", "a", 10.0, None, title="Ekmek küçük"),
+    ]
+    plan = optimize_basket(records, ["ekmek"], sort_by="unit_price").cheapest_single_store
+    assert [item.product_title for item in plan.items] == ["Ekmek küçük"]
+
+
+def test_missing_and_unavailable_products_are_reported():
+    records = [_record("süt", "a", 30.0), _record("ekmek", "b", 10.0)]
+    result = optimize_basket(records, ["süt", "ekmek", "havyar"], max_stores=1)
+    assert result.unavailable_products == ["havyar"]
+    assert len(result.cheapest_single_store.items) == 1
+    assert len(result.cheapest_single_store.missing_products) == 1
+
+
+def test_no_records_returns_empty_result():
+    result = optimize_basket([], ["süt"])
+    assert result.cheapest_single_store is None
+    assert result.unavailable_products == ["süt"]
+
+
+def test_duplicate_product_names_are_collapsed():
+    records = [_record("süt", "a", 30.0)]
+    plan = optimize_basket(records, ["süt", "süt"]).cheapest_single_store
+    assert len(plan.items) == 1
@@ -0,0 +1,86 @@
+import pytest
+
+from utils.cache import TTLCache
+
+from conftest import FakeTimer
+
+
+def test_entry_expires_after_ttl():
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=5, timer=timer)
+    cache.set("k", "v")
+    assert cache.get("k") == "v"
+    assert "k" in cache
+    timer.advance(5)
+    assert cache.get("k") is None
+    assert "k" not in cache
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_per_entry_ttl_overrides_default():
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=60, timer=timer)
+    cache.set("kısa", 1, ttl=1)
+    cache.set("uzun", 2)
+    timer.advance(2)
+    assert cache.get("kısa") is None
+    assert cache.get("uzun") == 2
+
+
+def test_stale_entry_is_served_within_stale_window():
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=10, stale_ttl=20, timer=timer)
+    cache.set("k", "v")
+
+    assert cache.get_entry("k") == ("v", False)
+    timer.advance(15)
+    # Taze süre doldu: get() ıska verir, get_entry() bayat değeri döndürür.
+    assert cache.get("k") is None
+    assert cache.get_entry("k") == ("v", True)
+    assert cache.get_entry("k", allow_stale=False) is None
+    assert cache.ttl_remaining("k") == pytest.approx(-5)
+
+    timer.advance(15)
+    assert cache.get_entry("k") is None
+    assert cache.ttl_remaining("k") is None
+    assert len(cache) == 0
+
+
+def test_refresh_after_stale_makes_entry_fresh_again():
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=10, stale_ttl=20, timer=timer)
+    cache.set("k", "eski")
+    timer.advance(12)
+    assert cache.get_entry("k") == ("eski", True)
+    cache.set("k", "yeni")
+    assert cache.get_entry("k") == ("yeni", False)
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = TTLCache(maxsize=2, ttl=60, timer=FakeTimer())
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_remaining_does_not_touch_counters():
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=30, timer=timer)
+    assert cache.ttl_remaining("yok") is None
+    cache.set("k", "v")
+    timer.advance(10)
+    assert cache.ttl_remaining("k") == pytest.approx(20)
+    assert cache.stats()["hits"] == 0
+    assert cache.stats()["misses"] == 0
+
+
+def test_invalid_maxsize_is_rejected():
+    with pytest.raises(ValueError):
+        TTLCache(maxsize=0, ttl=1)
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import math
+
+import httpx
+import pytest
+
+from client import MarketFiyatApiClient
+from utils.geo import haversine_m
+
+# Kullanıcının bulunduğu karonun merkezinden uzakta bir nokta.
+USER_LAT, USER_LON = 41.0019, 29.0019
+DEPOTS = [
+    {"id": f"d{i}", "marketName": "bim", "latitude": 41.0 + i * 0.003, "longitude": 29.0, "distance": 0.0}
+    for i in range(4)
+]
+
+
+class FakeUpstream:
+    """Nearest ve search uç noktalarını taklit eden, gelen istekleri kaydeden sahte API."""
+
+    def __init__(self, items_per_page=20, number_of_found=100, depots=DEPOTS):
+        self.depots = depots
+        self.items_per_page = items_per_page
+        self.number_of_found = number_of_found
+        self.nearest_requests = []
+        self.search_requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if request.url.path.endswith("/nearest"):
+            self.nearest_requests.append(body)
+            radius_m = body["distance"] * 1000
+            return httpx.Response(200, json=[
+                {**d, "distance": haversine_m(body["latitude"], body["longitude"], d["latitude"], d["longitude"])}
+                for d in self.depots
+                if haversine_m(body["latitude"], body["longitude"], d["latitude"], d["longitude"]) <= radius_m
+            ])
+        self.search_requests.append(body)
+        page = body["pages"]
+        return httpx.Response(200, json={"numberOfFound": self.number_of_found, "content": [
+            {
+                "id": f"{page}-{k}", "title": f"Süt {page}-{k}", "brand": "Marka", "refinedQuantityUnit": "1 L",
+                "productDepotInfoList": [
+                    {"depotId": d, "price": 10.0 + k, "unitPrice": "10,00 ₺/L", "marketAdi": "bim",
+                     "latitude": 41.0, "longitude": 29.0}
+                    for d in body["depots"]
+                ],
+            }
+            for k in range(self.items_per_page)
+        ]})
+
+
+@pytest.fixture
+def make_client(monkeypatch):
+    monkeypatch.setenv("NEAREST_API_URL", "http://upstream/nearest")
+    monkeypatch.setenv("SEARCH_API_URL", "http://upstream/search")
+    for name in ("PRICE_SNAPSHOT_DB", "SHARED_CACHE_DB", "SEARCH_DEPOT_BATCH_SIZE", "SEARCH_PAGE_SIZE", "SEARCH_MAX_PAGES"):
+        monkeypatch.delenv(name, raising=False)
+
+    def factory(upstream):
+        client = MarketFiyatApiClient()
+        client._client = client.upstream.client = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+        return client
+
+    return factory
+
+
+def _run(client, coro):
+    async def scenario():
+        try:
+            return await coro
+        finally:
+            await client.close_client()
+
+    return asyncio.run(scenario())
+
+
+def test_nearest_distances_are_measured_from_caller(make_client):
+    upstream = FakeUpstream()
+    client = make_client(upstream)
+    stores = _run(client, client._find_nearby_stores(USER_LAT, USER_LON, 1))
+
+    request = upstream.nearest_requests[0]
+    # Sorgu karo merkezinden, yarıçap karonun yarım köşegeni kadar genişletilip tam sayı km'ye
+    # yukarı yuvarlanarak gönderilir.
+    assert request["distance"] == math.ceil(1 + client.nearest_cache.padding_km)
+    assert isinstance(request["distance"], int)
+    assert (request["latitude"], request["longitude"]) != (USER_LAT, USER_LON)
+    for store in stores:
+        assert store["distance"] == pytest.approx(
+            haversine_m(USER_LAT, USER_LON, store["latitude"], store["longitude"])
+        )
+        assert store["distance"] <= 1000
+    assert [s["distance"] for s in stores] == sorted(s["distance"] for s in stores)
+
+
+def test_repeat_nearest_query_in_same_tile_uses_local_data(make_client):
+    upstream = FakeUpstream()
+    client = make_client(upstream)
+
+    async def scenario():
+        await client._find_nearby_stores(USER_LAT, USER_LON, 1)
+        return await client._find_nearby_stores(41.0011, 29.0011, 1)
+
+    stores = _run(client, scenario())
+    assert len(upstream.nearest_requests) == 1
+    assert client.depot_registry.stats()["hits"] == 1
+    assert all(s["distance"] == pytest.approx(haversine_m(41.0011, 29.0011, s["latitude"], s["longitude"])) for s in stores)
+
+
+def test_callers_in_same_tile_share_search_keys_but_keep_their_own_radius(make_client):
+    # "kuzey" karonun genişletilmiş dairesinde, ama yalnızca ilk kullanıcının 1 km'lik yarıçapında.
+    depots = DEPOTS + [{"id": "kuzey", "marketName": "bim", "latitude": 41.0105, "longitude": 29.0, "distance": 0.0}]
+    upstream = FakeUpstream(items_per_page=1, depots=depots)
+    client = make_client(upstream)
+    near_lat, far_lat = 41.0001, 41.0019
+
+    async def scenario():
+        first = await client.find_products_in_shopping_list(["süt"], far_lat, 29.0019, 1)
+        second = await client.find_products_in_shopping_list(["süt"], near_lat, 29.0001, 1)
+        return first, second
+
+    first, second = _run(client, scenario())
+    # Arama karonun market kümesiyle bir kez yapılır; ikinci kullanıcı önbellekten yararlanır.
+    assert len(upstream.search_requests) == 1
+    assert "kuzey" in upstream.search_requests[0]["depots"]
+    assert "kuzey" in {r.depot.depot_id for r in first.records}
+    assert "kuzey" not in {r.depot.depot_id for r in second.records}
+    for search, lat, lon in ((first, far_lat, 29.0019), (second, near_lat, 29.0001)):
+        expected = {d["id"] for d in depots if haversine_m(lat, lon, d["latitude"], d["longitude"]) <= 1000}
+        assert {r.depot.depot_id for r in search.records} == expected
+        assert all(r.distance_km <= 1 for r in search.records)
+
+
+@pytest.mark.parametrize("limit, expected_pages", [(None, [0]), (20, [0]), (80, [0]), (81, [0, 1]), (200, [0, 1, 2])])
+def test_paging_counts_price_rows(make_client, limit, expected_pages):
+    # Yarıçap içinde 4 market vardır; her sayfada 20 ürün x 4 market = 80 fiyat satırı gelir.
+    upstream = FakeUpstream()
+    client = make_client(upstream)
+    _run(client, client.find_products_in_shopping_list(["süt"], USER_LAT, USER_LON, 1, limit=limit))
+    assert [r["pages"] for r in upstream.search_requests] == expected_pages
+
+
+def test_paging_stops_when_upstream_has_no_more_results(make_client):
+    upstream = FakeUpstream(number_of_found=30)
+    client = make_client(upstream)
+    _run(client, client.find_products_in_shopping_list(["süt"], USER_LAT, USER_LON, 1, limit=1000))
+    assert [r["pages"] for r in upstream.search_requests] == [0, 1]
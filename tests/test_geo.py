@@ -0,0 +1,77 @@
+import pytest
+
+from utils.geo import DepotRegistry, NearestStoreCache, haversine_m, stores_within
+
+from conftest import FakeTimer
+
+TILE_DEG = 0.002
+
+
+def _store(depot_id, latitude, longitude, distance=0.0):
+    return {"id": depot_id, "latitude": latitude, "longitude": longitude, "distance": distance}
+
+
+def test_haversine_known_distance():
+    # Enlemde 0.01 derece yaklaşık 1.11 km'dir.
+    assert haversine_m(41.0, 29.0, 41.01, 29.0) == pytest.approx(1111.95, rel=1e-3)
+    assert haversine_m(41.0, 29.0, 41.0, 29.0) == 0.0
+
+
+def test_stores_within_recomputes_distance_from_caller():
+    stores = [_store("yakın", 41.0005, 29.0), _store("uzak", 41.02, 29.0), {"id": "konumsuz", "distance": 300.0}]
+    result = stores_within(stores, 41.0, 29.0, 1)
+    assert [s["id"] for s in result] == ["yakın", "konumsuz"]
+    assert result[0]["distance"] == pytest.approx(haversine_m(41.0, 29.0, 41.0005, 29.0))
+    # Önbellekteki sözlükler değiştirilmez.
+    assert stores[0]["distance"] == 0.0
+
+
+def test_nearest_cache_uses_tile_as_key_but_caller_position_for_distances():
+    cache = NearestStoreCache(tile_deg=TILE_DEG, maxsize=16, ttl=60)
+    assert cache.padding_km == pytest.approx(0.1574, rel=1e-3)
+    tile, center_lat, center_lon = cache.snap(41.0001, 29.0001)
+    store = _store("d1", center_lat + 0.0089, center_lon)  # karo merkezine ~990 m
+    cache.set(41.0001, 29.0001, 1, [store])
+
+    # Karonun güney köşesindeki kullanıcıya market 1 km'den uzaktır.
+    assert cache.get(41.0001, 29.0001, 1) == []
+    # Kuzey köşesindeki kullanıcıya yakındır ve mesafe onun konumundan ölçülür.
+    north = cache.get(41.0019, 29.0001, 1)
+    assert [s["id"] for s in north] == ["d1"]
+    assert north[0]["distance"] == pytest.approx(haversine_m(41.0019, 29.0001, store["latitude"], store["longitude"]))
+
+
+def test_nearest_cache_answers_smaller_radius_from_wider_entry():
+    cache = NearestStoreCache(tile_deg=TILE_DEG, maxsize=16, ttl=60)
+    cache.set(41.0001, 29.0001, 5, [_store("yakın", 41.001, 29.001), _store("uzak", 41.03, 29.001)])
+    assert [s["id"] for s in cache.get(41.0001, 29.0001, 1)] == ["yakın"]
+    assert cache.get(41.0001, 29.0001, 10) is None
+
+
+def _registry_with_padded_coverage(radius_km, stores):
+    registry = DepotRegistry(cell_deg=0.01, coverage_ttl=60, timer=FakeTimer())
+    cache = NearestStoreCache(tile_deg=TILE_DEG, maxsize=16, ttl=60)
+    _, center_lat, center_lon = cache.snap(41.0001, 29.0001)
+    registry.add_stores(stores, center_lat, center_lon, radius_km + cache.padding_km)
+    return registry
+
+
+def test_registry_answers_same_radius_anywhere_in_tile():
+    stores = [_store("d1", 41.005, 29.001), _store("d2", 41.02, 29.001)]
+    registry = _registry_with_padded_coverage(1, stores)
+    for latitude, longitude in [(41.0001, 29.0001), (41.0019, 29.0019), (41.0001, 29.0019)]:
+        found = registry.find_within(latitude, longitude, 1)
+        assert found is not None
+        assert [s["id"] for s in found] == ["d1"]
+        assert found[0]["distance"] == pytest.approx(haversine_m(latitude, longitude, 41.005, 29.001))
+    assert registry.find_within(41.0001, 29.0001, 2) is None
+    assert registry.stats()["hits"] == 3
+
+
+def test_registry_coverage_expires():
+    timer = FakeTimer()
+    registry = DepotRegistry(cell_deg=0.01, coverage_ttl=60, timer=timer)
+    registry.add_stores([_store("d1", 41.001, 29.001)], 41.001, 29.001, 2)
+    assert registry.find_within(41.001, 29.001, 1) is not None
+    timer.advance(60)
+    assert registry.find_within(41.001, 29.001, 1) is None
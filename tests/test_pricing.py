@@ -0,0 +1,25 @@
+import pytest
+
+from utils.pricing import normalize_unit_price
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("101,37 ₺/kg", (101.37, "kg")),
+    ("5,90 ₺/100 g", (59.0, "kg")),
+    ("12,5 ₺/L", (12.5, "L")),
+    ("0,25₺/adet", (0.25, "adet")),
+    ("1.234,56 ₺/kg", (1234.56, "kg")),
+    # Virgül yoksa, ardından tam üç hane gelen nokta binlik ayracıdır.
+    ("45 ₺/ 1.000 ml", (45.0, "L")),
+    ("1.250 ₺/kg", (1250.0, "kg")),
+    ("2.500.000 ₺/adet", (2500000.0, "adet")),
+    ("1.5 ₺/L", (1.5, "L")),
+])
+def test_normalize_unit_price(text, expected):
+    value, unit = normalize_unit_price(text)
+    assert (value, unit) == (pytest.approx(expected[0]), expected[1])
+
+
+def test_unparseable_unit_price_is_infinite():
+    assert normalize_unit_price(None) == (float("inf"), None)
+    assert normalize_unit_price("fiyat yok") == (float("inf"), None)
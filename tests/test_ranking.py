@@ -0,0 +1,31 @@
+from models import ContentItem, PriceRecord, ProductDepotInfo
+from utils.ranking import rank_records
+
+
+def _record(depot_id, price, unit_price):
+    item = ContentItem.model_construct(
+        id=depot_id, title=depot_id, brand=None, image_url=None, refined_quantity_unit=None, product_depot_info_list=[],
+    )
+    depot = ProductDepotInfo.model_construct(
+        depot_id=depot_id, price=price, unit_price=unit_price, market_adi=f"market-{depot_id}",
+        latitude=41.0, longitude=29.0,
+    )
+    return PriceRecord(item, depot, 1.0, "ürün")
+
+
+def test_unit_price_ranking_groups_by_base_unit_and_puts_unparsed_last():
+    records = [
+        _record("bilinmiyor", 1.0, None),
+        _record("adet", 5.0, "0,50 ₺/adet"),
+        _record("kg-pahalı", 50.0, "200,00 ₺/kg"),
+        _record("litre", 30.0, "30,00 ₺/L"),
+        _record("kg-ucuz", 40.0, "80,00 ₺/kg"),
+    ]
+    ranked = rank_records(records, "unit_price")
+    assert [r.depot.depot_id for r in ranked] == ["kg-ucuz", "kg-pahalı", "litre", "adet", "bilinmiyor"]
+    assert [r.depot.depot_id for r in rank_records(records, "unit_price", limit=1)] == ["kg-ucuz"]
+
+
+def test_price_ranking_uses_package_price():
+    records = [_record("a", 30.0, "30,00 ₺/L"), _record("b", 5.0, "0,50 ₺/adet")]
+    assert [r.depot.depot_id for r in rank_records(records, "price")] == ["b", "a"]
@@ -0,0 +1,56 @@
+import asyncio
+
+import httpx
+
+from client import MarketFiyatApiClient
+from utils.shared_cache import SharedCache
+
+
+def test_get_counts_hits_and_misses(tmp_path):
+    cache = SharedCache(str(tmp_path / "shared.db"))
+    assert cache.get("k") is None
+    cache.set("k", b"v", ttl=60)
+    assert cache.get("k")[0] == b"v"
+    assert cache.get("k", count=False)[0] == b"v"
+    assert cache.get("yok", count=False) is None
+    assert {k: cache.stats()[k] for k in ("hits", "misses")} == {"hits": 1, "misses": 1}
+    cache.close()
+
+
+def test_waiting_on_another_workers_lease_counts_one_miss(tmp_path, monkeypatch):
+    path = str(tmp_path / "shared.db")
+    monkeypatch.setenv("NEAREST_API_URL", "http://upstream/nearest")
+    monkeypatch.setenv("SEARCH_API_URL", "http://upstream/search")
+    monkeypatch.setenv("SHARED_CACHE_DB", path)
+    monkeypatch.delenv("PRICE_SNAPSHOT_DB", raising=False)
+    client = MarketFiyatApiClient()
+    client._client = client.upstream.client = httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(500)))
+    client.shared_cache.poll_interval = 0.01
+    # Kirayı başka bir çalışan tutuyor; sonucu birkaç bekleme turundan sonra yazar.
+    other = SharedCache(path)
+    assert other.claim("anahtar")
+
+    async def fetch():
+        raise AssertionError("kira başkasındayken upstream'e gidilmemeli")
+
+    async def scenario():
+        async def other_worker():
+            await asyncio.sleep(0.05)
+            other.set("anahtar", b"\"deger\"", ttl=60)
+            other.release("anahtar")
+
+        writer = asyncio.create_task(other_worker())
+        try:
+            result = await client._shared_fetch("anahtar", 60, fetch, encode=str.encode, decode=bytes.decode)
+            return result, client.shared_cache.stats()
+        finally:
+            await writer
+            await client.close_client()
+
+    (value, cacheable, _), stats = asyncio.run(scenario())
+    other.close()
+    assert (value, cacheable) == ("\"deger\"", True)
+    # Kira beklenirken yapılan okumalar ıska sayılmaz; bekleme lease_waits'te görünür.
+    assert stats["misses"] == 1
+    assert stats["hits"] == 0
+    assert stats["lease_waits"] >= 2
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_request():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "sonuç"
+
+        results = await asyncio.gather(*[flight.do("k", fetch) for _ in range(5)])
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert results == ["sonuç"] * 5
+    assert flight.shared == 4
+    assert len(flight) == 0
+
+
+def test_different_keys_do_not_share():
+    async def scenario():
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch(key):
+            calls.append(key)
+            await asyncio.sleep(0)
+            return key
+
+        results = await asyncio.gather(flight.do("a", lambda: fetch("a")), flight.do("b", lambda: fetch("b")))
+        return calls, results
+
+    calls, results = asyncio.run(scenario())
+    assert sorted(calls) == ["a", "b"]
+    assert results == ["a", "b"]
+
+
+def test_error_is_delivered_to_every_waiter_and_key_is_released():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream hatası")
+
+        results = await asyncio.gather(*[flight.do("k", fail) for _ in range(3)], return_exceptions=True)
+        # Hata sonrası anahtar bırakılmalı; yeni çağrı yeni bir istek başlatır.
+        retried = await flight.do("k", lambda: asyncio.sleep(0, result="tekrar"))
+        return results, retried
+
+    results, retried = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert retried == "tekrar"
+
+
+def test_cancelling_one_waiter_does_not_cancel_shared_request():
+    async def scenario():
+        flight = SingleFlight()
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def fetch():
+            started.set()
+            await release.wait()
+            return 42
+
+        first = asyncio.create_task(flight.do("k", fetch))
+        await started.wait()
+        second = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return first, await second
+
+    first, second_result = asyncio.run(scenario())
+    assert first.cancelled()
+    assert second_result == 42
+
+
+def test_cancel_all_cancels_waiters():
+    async def scenario():
+        flight = SingleFlight()
+        waiter = asyncio.create_task(flight.do("k", lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        flight.cancel_all()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+        return len(flight)
+
+    assert asyncio.run(scenario()) == 0
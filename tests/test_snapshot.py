@@ -0,0 +1,128 @@
+import sqlite3
+
+import pytest
+
+from client import _depot_set_hash
+from models import ApiSearchResponse
+from utils.snapshot import PriceSnapshotStore
+
+
+def _response(rows, number_of_found=None):
+    """rows: (ürün kimliği, market kimliği, fiyat) üçlüleri."""
+    items = {}
+    for product_id, depot_id, price in rows:
+        item = items.setdefault(product_id, {
+            "id": product_id, "title": f"Ürün {product_id}", "brand": "Marka",
+            "refinedQuantityUnit": "1 L", "productDepotInfoList": [],
+        })
+        item["productDepotInfoList"].append({
+            "depotId": depot_id, "price": price, "unitPrice": f"{price:.2f} ₺/L",
+            "marketAdi": "bim", "latitude": 41.0, "longitude": 29.0,
+        })
+    return ApiSearchResponse.model_validate({"numberOfFound": number_of_found, "content": list(items.values())})
+
+
+def _prices(response):
+    return sorted(
+        (item.id, depot.depot_id, depot.price)
+        for item in response.content
+        for depot in item.product_depot_info_list
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PriceSnapshotStore(str(tmp_path / "snapshot.db"))
+    yield store
+    store.close()
+
+
+def test_read_after_write_returns_same_page(store):
+    depots = _depot_set_hash(["d1", "d2", "d3"])
+    written = _response([("p1", "d1", 10.0), ("p1", "d2", 11.0), ("p2", "d3", 5.5)], number_of_found=42)
+    store.write("sut", depots, 0, 20, written)
+
+    stored = store.read("sut", depots, 0, 20, max_age=900)
+    assert stored is not None
+    assert _prices(stored) == _prices(written)
+    assert [item.id for item in stored.content] == ["p1", "p2"]
+    assert stored.number_of_found == 42
+
+
+def test_depot_set_is_order_independent(store):
+    store.write("sut", _depot_set_hash(["d1", "d2"]), 0, 20, _response([("p1", "d1", 10.0)]))
+    assert store.read("sut", _depot_set_hash(["d2", "d1"]), 0, 20, max_age=900) is not None
+
+
+def test_subset_of_depots_is_not_treated_as_fresh(store):
+    # d2 ve d3 bu sayfada yalnızca yer almadı; ürünü satmadıkları doğrulanmış değil.
+    store.write("sut", _depot_set_hash(["d1", "d2", "d3"]), 0, 20, _response([("p1", "d1", 10.0)]))
+    assert store.read("sut", _depot_set_hash(["d2", "d3"]), 0, 20, max_age=900) is None
+
+
+def test_pages_and_sizes_are_stored_separately(store):
+    depots = _depot_set_hash(["d1"])
+    store.write("sut", depots, 0, 20, _response([("p1", "d1", 10.0)]))
+    store.write("sut", depots, 1, 20, _response([("p2", "d1", 12.0)]))
+    assert _prices(store.read("sut", depots, 0, 20, None)) == [("p1", "d1", 10.0)]
+    assert _prices(store.read("sut", depots, 1, 20, None)) == [("p2", "d1", 12.0)]
+    assert store.read("sut", depots, 0, 50, None) is None
+
+
+def test_rewrite_replaces_previous_rows(store):
+    depots = _depot_set_hash(["d1", "d2"])
+    store.write("sut", depots, 0, 20, _response([("p1", "d1", 10.0), ("p2", "d2", 7.0)]))
+    store.write("sut", depots, 0, 20, _response([("p1", "d1", 9.5)]))
+    assert _prices(store.read("sut", depots, 0, 20, None)) == [("p1", "d1", 9.5)]
+    assert store.stats() == {"price_rows": 1, "page_rows": 1}
+
+
+def test_empty_page_is_cached(store):
+    depots = _depot_set_hash(["d1"])
+    store.write("yok", depots, 0, 20, _response([], number_of_found=0))
+    stored = store.read("yok", depots, 0, 20, max_age=900)
+    assert stored is not None
+    assert stored.content == []
+
+
+def test_max_age_expires_page_but_unbounded_read_still_returns_it(store, monkeypatch):
+    depots = _depot_set_hash(["d1"])
+    now = [1_000_000.0]
+    monkeypatch.setattr("utils.snapshot.time.time", lambda: now[0])
+    store.write("sut", depots, 0, 20, _response([("p1", "d1", 10.0)]))
+
+    now[0] += 60
+    assert store.read("sut", depots, 0, 20, max_age=120) is not None
+    now[0] += 120
+    assert store.read("sut", depots, 0, 20, max_age=120) is None
+    # Upstream erişilemezken kullanılan yaşa bakmayan okuma.
+    assert store.read("sut", depots, 0, 20, max_age=None) is not None
+
+
+def test_stats_track_writes_and_survive_reopen(tmp_path):
+    path = str(tmp_path / "snapshot.db")
+    store = PriceSnapshotStore(path)
+    store.write("sut", "a", 0, 20, _response([("p1", "d1", 1.0), ("p1", "d2", 2.0)]))
+    store.write("sut", "b", 0, 20, _response([("p1", "d1", 1.0)]))
+    assert store.stats() == {"price_rows": 3, "page_rows": 2}
+    store.close()
+
+    reopened = PriceSnapshotStore(path)
+    assert reopened.stats() == {"price_rows": 3, "page_rows": 2}
+    reopened.close()
+
+
+def test_old_schema_is_replaced_on_open(tmp_path):
+    path = str(tmp_path / "snapshot.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE search_coverage (keyword TEXT, depot_id TEXT, page INTEGER, size INTEGER, fetched_at REAL)")
+    conn.execute("CREATE TABLE product_prices (keyword TEXT, page INTEGER)")
+    conn.execute("INSERT INTO product_prices VALUES ('sut', 0)")
+    conn.commit()
+    conn.close()
+
+    store = PriceSnapshotStore(path)
+    assert store.stats() == {"price_rows": 0, "page_rows": 0}
+    store.write("sut", "a", 0, 20, _response([("p1", "d1", 1.0)]))
+    assert store.read("sut", "a", 0, 20, None) is not None
+    store.close()
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from utils.text import QueryCanonicalizer, RelevanceIndex, fold_text, load_synonyms, tokenize, turkish_lower
+
+
+def test_turkish_lower_handles_dotted_and_dotless_i():
+    assert turkish_lower("IŞIK") == "ışık"
+    assert turkish_lower("İNCİR") == "incir"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Süt", "sut"),
+    ("  ÇAY   şekeri ", "cay sekeri"),
+    ("Zeytinyağı, 1L!", "zeytinyagi 1l"),
+    ("Crème brûlée", "creme brulee"),
+])
+def test_fold_text(text, expected):
+    assert fold_text(text) == expected
+
+
+def test_spelling_variants_share_key_and_query():
+    canonicalizer = QueryCanonicalizer()
+    variants = {canonicalizer.canonicalize(text) for text in ["Süt", "sut ", "SÜT", "süt"]}
+    assert len(variants) == 1
+    canonical = variants.pop()
+    assert canonical.key == "sut"
+    assert canonical.query == "süt"
+
+
+def test_synonyms_map_to_preferred_query():
+    canonicalizer = QueryCanonicalizer()
+    assert canonicalizer.canonicalize("Yoghurt").query == "yoğurt"
+    assert canonicalizer.canonicalize("zeytin yagi") == canonicalizer.canonicalize("Zeytinyağı")
+
+
+def test_unknown_keyword_keeps_turkish_spelling():
+    canonical = QueryCanonicalizer().canonicalize("  Kırmızı   MERCİMEK ")
+    assert canonical.key == "kirmizi mercimek"
+    assert canonical.query == "kırmızı mercimek"
+
+
+def test_load_synonyms_extends_defaults(tmp_path):
+    path = tmp_path / "synonyms.json"
+    path.write_text(json.dumps({"Kaşar": "kaşar peyniri"}), encoding="utf-8")
+    synonyms = load_synonyms(str(path))
+    assert synonyms["kasar"] == "kaşar peyniri"
+    assert synonyms["sut"] == "süt"
+    assert QueryCanonicalizer(synonyms).canonicalize("KAŞAR").query == "kaşar peyniri"
+
+
+def test_relevance_scores_match_prefixes_and_ignore_diacritics():
+    index = RelevanceIndex([
+        ("Pınar Tam Yağlı Süt 1 L", "Pınar"),
+        ("Sütlü Çikolata", "Ülker"),
+        ("Domates Salçası", "Tat"),
+    ])
+    assert tokenize("Tam Yağlı Süt") == ("tam", "yagli", "sut")
+    assert index.scores("süt") == [1.0, 1.0, 0.0]
+    assert index.scores("tam yağlı süt") == [1.0, pytest.approx(1 / 3), 0.0]
+    assert index.scores("") == [1.0, 1.0, 1.0]
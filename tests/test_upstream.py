@@ -0,0 +1,127 @@
+import asyncio
+
+import httpx
+import pytest
+
+from utils.upstream import AdaptiveConcurrencyLimiter, CircuitBreaker, CircuitOpenError, UpstreamExecutor, count_attempts
+
+from conftest import FakeTimer
+
+
+def test_limiter_grows_additively_and_shrinks_multiplicatively():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4, min_limit=2, max_limit=8, target_latency=1.0)
+        await limiter.acquire()
+        limiter.release(0.1, overloaded=False)
+        grown = limiter.limit
+        await limiter.acquire()
+        limiter.release(0.1, overloaded=True)
+        return grown, limiter.limit
+
+    grown, shrunk = asyncio.run(scenario())
+    assert grown == pytest.approx(4.25)
+    assert shrunk == pytest.approx(4.25 * 0.7)
+
+
+def test_limiter_respects_bounds():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=2, max_limit=3, target_latency=1.0)
+        for _ in range(50):
+            await limiter.acquire()
+            limiter.release(0.1, overloaded=False)
+        high = limiter.current_limit
+        for _ in range(10):
+            await limiter.acquire()
+            limiter.release(0.1, overloaded=True)
+        return high, limiter.current_limit
+
+    assert asyncio.run(scenario()) == (3, 2)
+
+
+def test_limiter_queues_requests_above_limit():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1, max_limit=1, target_latency=1.0)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        queued = (waiter.done(), limiter.stats()["waiting"])
+        limiter.release(0.1, overloaded=False)
+        await waiter
+        return queued, limiter.in_flight
+
+    assert asyncio.run(scenario()) == ((False, 1), 1)
+
+
+def test_breaker_opens_after_threshold_and_allows_single_probe():
+    timer = FakeTimer()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, timer=timer)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    timer.advance(10)
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # Deneme isteği sürerken ikinci isteğe izin verilmez.
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens_breaker():
+    timer = FakeTimer()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, timer=timer)
+    breaker.record_failure()
+    timer.advance(5)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+
+def _executor(handler, **kwargs):
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return UpstreamExecutor(client, backoff_base=0.0, backoff_max=0.0, **kwargs)
+
+
+def test_executor_retries_and_counts_attempts():
+    statuses = iter([503, 429, 200])
+
+    async def scenario():
+        executor = _executor(lambda request: httpx.Response(next(statuses)), max_retries=2)
+        with count_attempts() as attempts:
+            response = await executor.post("http://upstream/search", json={})
+        return response.status_code, attempts, executor.stats()["upstream"]
+
+    status, attempts, stats = asyncio.run(scenario())
+    assert status == 200
+    assert attempts == {"upstream": 3}
+    assert stats["requests"] == 3
+    assert stats["retries"] == 2
+
+
+def test_executor_gives_up_after_retries_and_opens_breaker():
+    async def scenario():
+        executor = _executor(lambda request: httpx.Response(503), max_retries=1, failure_threshold=2)
+        with pytest.raises(httpx.HTTPStatusError):
+            await executor.post("http://upstream/search", json={})
+        with pytest.raises(CircuitOpenError):
+            await executor.post("http://upstream/search", json={})
+        return executor.stats()["upstream"]
+
+    stats = asyncio.run(scenario())
+    assert stats["requests"] == 2
+    assert stats["rejected"] == 1
+    assert stats["state"] == CircuitBreaker.OPEN
+
+
+def test_non_idempotent_request_is_not_retried():
+    async def scenario():
+        executor = _executor(lambda request: httpx.Response(503), max_retries=3)
+        with pytest.raises(httpx.HTTPStatusError):
+            await executor.post("http://upstream/search", json={}, idempotent=False)
+        return executor.stats()["upstream"]["requests"]
+
+    assert asyncio.run(scenario()) == 1
@@ -0,0 +1,84 @@
+"""
+Token doğrulaması için yardımcı programlar: token özetleri ve dashboard'un
+yazdığı iptal listesinin (revocation list) dosyadan izlenmesi.
+"""
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Set
+
+
+def token_hash(token: str) -> str:
+    """Token'ın önbellek anahtarı ve iptal listesinde kullanılan SHA-256 özetini döndürür."""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def append_revoked_token(path: str, token: str) -> None:
+    """Token'ın özetini iptal listesi dosyasının sonuna ekler (dashboard tarafından kullanılır)."""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(token_hash(token) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class RevocationList:
+    """
+    İptal edilmiş token özetlerini tutan küme. Dosya yalnızca sona ekleme ile
+    büyüdüğü için değişiklik (mtime/boyut) görüldüğünde sadece yeni satırlar
+    okunur; dosya küçülür veya değiştirilirse baştan yüklenir. Dosya en fazla
+    `check_interval` saniyede bir kontrol edilir.
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0, timer: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            path: Her satırında bir token özeti bulunan iptal listesi dosyası.
+            check_interval: Dosyanın değişip değişmediğinin kontrol aralığı (saniye).
+            timer: Zaman kaynağı.
+        """
+        self.path = path
+        self.check_interval = check_interval
+        self._timer = timer
+        self._lock = threading.Lock()
+        self._hashes: Set[str] = set()
+        self._signature: Optional[tuple] = None
+        self._offset = 0
+        self._checked_at = float("-inf")
+        self.reloads = 0
+
+    def _refresh(self) -> None:
+        now = self._timer()
+        if now - self._checked_at < self.check_interval:
+            return
+        with self._lock:
+            self._checked_at = now
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                self._hashes, self._signature, self._offset = set(), None, 0
+                return
+            signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+            if signature == self._signature:
+                return
+            if self._signature is None or st.st_ino != self._signature[0] or st.st_size < self._offset:
+                # Dosya yeniden oluşturulmuş veya kısalmış: baştan oku.
+                self._hashes, self._offset = set(), 0
+            with open(self.path, "r", encoding="utf-8") as f:
+                f.seek(self._offset)
+                chunk = f.read()
+            # Yarım yazılmış son satır bir sonraki kontrolde okunur.
+            complete, _, _ = chunk.rpartition("\n")
+            if complete:
+                self._hashes.update(line.strip() for line in complete.split("\n") if line.strip())
+                self._offset += len(complete.encode("utf-8")) + 1
+            self._signature = signature
+            self.reloads += 1
+
+    def is_revoked(self, digest: str) -> bool:
+        """Verilen token özeti iptal edildiyse True döner."""
+        self._refresh()
+        return digest in self._hashes
+
+    def stats(self) -> Dict[str, int]:
+        return {"revoked": len(self._hashes), "reloads": self.reloads}
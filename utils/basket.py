@@ -0,0 +1,202 @@
+"""
+Bulunan fiyatlardan alışveriş sepeti planları çıkaran yardımcı programlar.
+
+Tüm (ürün, market) satırlarını ajana göndermek yerine, sunucu tarafında
+market bazında gruplayıp tek marketli, en fazla N markete bölünmüş ve
+mesafe ağırlıklı üç sepet planı hesaplanır.
+"""
+from itertools import combinations
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from models import BasketItem, BasketOptimizationResult, BasketPlan, BasketStore, PriceRecord
+
+_INF = float("inf")
+_NO_OFFER = (_INF, _INF)
+
+OfferKey = Tuple[float, float]
+
+
+def _offer_key(sort_by: str) -> Callable[[PriceRecord], OfferKey]:
+    """
+    Aynı marketteki bir ürünün ambalajlarından hangisinin seçileceğini belirleyen
+    (puan, fiyat) anahtarını döndürür. 'unit_price' ölçütünde puan, ambalaj boyutundan
+    bağımsız olan birim fiyattır; birim fiyatı bilinmeyen kayıtlarda fiyat kullanılır.
+    Birim fiyatlar farklı birimlerde (TL/kg, TL/L, TL/adet) olabildiğinden marketler ve
+    market kombinasyonları her zaman seçilen kayıtların gerçek fiyat toplamıyla karşılaştırılır.
+    """
+    if sort_by.lower() == 'unit_price':
+        return lambda r: (r.unit_price_value if r.unit_price_value != _INF else r.depot.price, r.depot.price)
+    return lambda r: (r.depot.price, r.unit_price_value)
+
+
+class _DepotOffers:
+    """Bir marketin, listedeki her ürün için seçilen kaydı (ürün sırasına göre)."""
+    __slots__ = ("depot_id", "records", "keys", "prices", "distance_km", "covered", "total")
+
+    def __init__(self, depot_id: str, product_count: int):
+        self.depot_id = depot_id
+        self.records: List[Optional[PriceRecord]] = [None] * product_count
+        # Seçilen kaydın (puan, fiyat) anahtarı ve fiyatı; 'total' fiyatların toplamıdır.
+        self.keys: List[OfferKey] = [_NO_OFFER] * product_count
+        self.prices: List[float] = [_INF] * product_count
+        self.distance_km = 0.0
+        self.covered = 0
+        self.total = 0.0
+
+
+def _group_by_depot(
+    records: Sequence[PriceRecord], product_names: Sequence[str], offer_key: Callable[[PriceRecord], OfferKey]
+) -> Dict[str, _DepotOffers]:
+    """Kayıtları tek geçişte market bazında gruplar ve her ürün için anahtarı en küçük kaydı tutar."""
+    index = {name: i for i, name in enumerate(product_names)}
+    depots: Dict[str, _DepotOffers] = {}
+    for record in records:
+        i = index.get(record.product_name)
+        if i is None:
+            continue
+        depot_id = record.depot.depot_id
+        offers = depots.get(depot_id)
+        if offers is None:
+            offers = depots[depot_id] = _DepotOffers(depot_id, len(product_names))
+            offers.distance_km = record.distance_km or 0.0
+        key = offer_key(record)
+        if key < offers.keys[i]:
+            offers.keys[i] = key
+            offers.prices[i] = record.depot.price
+            offers.records[i] = record
+    for offers in depots.values():
+        found = [price for price in offers.prices if price != _INF]
+        offers.covered = len(found)
+        offers.total = sum(found)
+    return depots
+
+
+def _candidate_depots(
+    depots: Dict[str, _DepotOffers], product_count: int, max_candidates: int, per_product: int = 3
+) -> List[_DepotOffers]:
+    """
+    Kombinasyon araması için aday marketleri seçer: her ürünü en düşük fiyatla
+    sunan `per_product` market ile en çok ürünü en düşük toplamla sunan marketler.
+    """
+    by_coverage = sorted(depots.values(), key=lambda o: (-o.covered, o.total, o.distance_km))
+    chosen: Dict[str, _DepotOffers] = {}
+    for i in range(product_count):
+        cheapest = sorted((o for o in depots.values() if o.prices[i] != _INF), key=lambda o: o.prices[i])
+        for offers in cheapest[:per_product]:
+            chosen.setdefault(offers.depot_id, offers)
+    # Tek marketli en iyi sepet her zaman aday olsun; ardından ürün bazında en ucuzlar gelir.
+    best_single, rest = by_coverage[0], by_coverage[1:]
+    ranked = [best_single] + [o for o in rest if o.depot_id in chosen] + [o for o in rest if o.depot_id not in chosen]
+    return ranked[:max_candidates]
+
+
+def _combo_cost(combo: Tuple[_DepotOffers, ...]) -> Tuple[int, float, float]:
+    """(eksik ürün sayısı, toplam fiyat, toplam mesafe) üçlüsünü döndürür."""
+    best = [min(col) for col in zip(*(o.prices for o in combo))]
+    missing = sum(1 for p in best if p == _INF)
+    return missing, sum(p for p in best if p != _INF), sum(o.distance_km for o in combo)
+
+
+def _best_combo(
+    candidates: List[_DepotOffers], max_stores: int,
+    score: Callable[[Tuple[int, float, float]], Tuple[float, ...]],
+) -> Optional[Tuple[_DepotOffers, ...]]:
+    best_combo, best_score = None, None
+    for size in range(1, min(max_stores, len(candidates)) + 1):
+        for combo in combinations(candidates, size):
+            combo_score = score(_combo_cost(combo))
+            if best_score is None or combo_score < best_score:
+                best_combo, best_score = combo, combo_score
+    return best_combo
+
+
+def _build_plan(combo: Tuple[_DepotOffers, ...], product_names: Sequence[str], available: List[bool]) -> BasketPlan:
+    """Seçilen marketlerden her ürün için fiyatı en düşük kaydı alarak sepet planını oluşturur."""
+    items: List[BasketItem] = []
+    missing: List[str] = []
+    subtotals: Dict[str, List[float]] = {}
+    for i, name in enumerate(product_names):
+        if not available[i]:
+            continue
+        offers = min(combo, key=lambda o: o.prices[i])
+        record = offers.records[i]
+        if record is None:
+            missing.append(name)
+            continue
+        items.append(BasketItem(
+            product_name=name,
+            product_title=record.item.title,
+            product_quantity=record.item.refined_quantity_unit,
+            price=record.depot.price,
+            unit_price=record.depot.unit_price,
+            market_name=record.depot.market_adi,
+        ))
+        subtotal = subtotals.setdefault(offers.depot_id, [0.0, 0])
+        subtotal[0] += record.depot.price
+        subtotal[1] += 1
+
+    stores = []
+    for offers in combo:
+        if offers.depot_id not in subtotals:
+            continue
+        subtotal, count = subtotals[offers.depot_id]
+        market_name = next(r.depot.market_adi for r in offers.records if r is not None)
+        stores.append(BasketStore(
+            market_name=market_name, distance_km=offers.distance_km,
+            subtotal=round(subtotal, 2), item_count=count,
+        ))
+    return BasketPlan(
+        total_price=round(sum(item.price for item in items), 2),
+        total_distance_km=round(sum(store.distance_km or 0.0 for store in stores), 3),
+        stores=stores,
+        items=items,
+        missing_products=missing,
+    )
+
+
+def optimize_basket(
+    records: Sequence[PriceRecord],
+    product_names: Sequence[str],
+    max_stores: int = 2,
+    distance_cost_per_km: float = 5.0,
+    max_candidates: int = 20,
+    sort_by: str = "price",
+) -> BasketOptimizationResult:
+    """
+    Bulunan fiyatlardan üç sepet planı hesaplar.
+
+    Args:
+        records: `find_products_in_shopping_list` ile bulunan fiyat kayıtları.
+        product_names: Kullanıcının alışveriş listesi.
+        max_stores: Bölünmüş ve mesafe ağırlıklı planlarda uğranabilecek en fazla market sayısı.
+        distance_cost_per_km: Mesafe ağırlıklı planda, uğranan her marketin mesafesinin
+            km başına TL cinsinden maliyeti.
+        max_candidates: Kombinasyon aramasına alınacak en fazla market sayısı.
+        sort_by: Bir markette aynı ürünün birden çok ambalajı varsa hangisinin seçileceği:
+            'price' (en düşük tutar) veya 'unit_price' (kg / L / adet başına fiyat, bilinmiyorsa
+            fiyat; ambalaj boyutundan bağımsız). Marketler ve kombinasyonlar her iki durumda
+            da gerçek fiyat toplamıyla karşılaştırılır.
+
+    Returns:
+        Planların özetini içeren BasketOptimizationResult. Hiçbir plan her ürünü
+        içeremiyorsa, en çok ürünü içeren planlar seçilir ve eksikler listelenir.
+    """
+    product_names = list(dict.fromkeys(product_names))
+    depots = _group_by_depot(records, product_names, _offer_key(sort_by))
+    available = [any(o.prices[i] != _INF for o in depots.values()) for i in range(len(product_names))]
+    unavailable = [name for name, ok in zip(product_names, available) if not ok]
+    if not depots:
+        return BasketOptimizationResult(unavailable_products=unavailable)
+
+    single = min(depots.values(), key=lambda o: (-o.covered, o.total, o.distance_km))
+    candidates = _candidate_depots(depots, len(product_names), max(max_candidates, 1))
+    max_stores = max(1, max_stores)
+    split = _best_combo(candidates, max_stores, lambda c: (c[0], c[1], c[2]))
+    weighted = _best_combo(candidates, max_stores, lambda c: (c[0], c[1] + distance_cost_per_km * c[2]))
+
+    return BasketOptimizationResult(
+        cheapest_single_store=_build_plan((single,), product_names, available),
+        cheapest_split=_build_plan(split, product_names, available) if split else None,
+        distance_weighted=_build_plan(weighted, product_names, available) if weighted else None,
+        unavailable_products=unavailable,
+    )
@@ -0,0 +1,128 @@
+"""
+Proje için bellek içi önbellek (cache) yardımcı programları.
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Boyutu sınırlı, her kaydı belirli bir süre (TTL) geçerli tutan LRU önbellek.
+
+    `stale_ttl` verilirse, süresi dolan kayıtlar bu ek süre boyunca "bayat"
+    olarak saklanır ve `get_entry` ile okunabilir (stale-while-revalidate).
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        stale_ttl: float = 0.0,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            maxsize: Önbellekte tutulacak en fazla kayıt sayısı.
+            ttl: Bir kaydın saniye cinsinden taze kalma süresi.
+            stale_ttl: TTL dolduktan sonra kaydın bayat olarak sunulabileceği ek süre.
+            timer: Zaman kaynağı (testlerde değiştirilebilmesi için).
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize sıfırdan büyük olmalıdır.")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._timer = timer
+        # anahtar -> (tazeliğin_bittiği_zaman, değer)
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Anahtara karşılık gelen değeri döndürür; kayıt yoksa veya süresi
+        dolmuşsa `default` döner.
+        """
+        entry = self.get_entry(key, allow_stale=False)
+        return default if entry is None else entry[0]
+
+    def get_entry(self, key: Hashable, allow_stale: bool = True) -> Optional[Tuple[Any, bool]]:
+        """
+        Kaydı bayatlık bilgisiyle birlikte döndürür.
+
+        Args:
+            key: Önbellek anahtarı.
+            allow_stale: True ise TTL'i dolmuş ama `stale_ttl` içindeki kayıtlar da döner.
+
+        Returns:
+            (değer, bayat_mı) ikilisi veya kayıt yoksa None.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        fresh_until, value = entry
+        now = self._timer()
+        if fresh_until > now:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value, False
+        if fresh_until + self.stale_ttl <= now:
+            del self._data[key]
+        elif allow_stale:
+            self._data.move_to_end(key)
+            self.stale_hits += 1
+            return value, True
+        self.misses += 1
+        return None
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Değeri önbelleğe yazar, gerekirse en eski kaydı çıkarır."""
+        fresh_until = self._timer() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (fresh_until, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def ttl_remaining(self, key: Hashable) -> Optional[float]:
+        """
+        Kaydın taze kalacağı kalan süreyi döndürür (bayatsa negatif). Kayıt yoksa None döner.
+        İsabet/ıska sayaçlarını ve LRU sırasını etkilemez.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        remaining = entry[0] - self._timer()
+        if remaining + self.stale_ttl <= 0:
+            return None
+        return remaining
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Kaydı önbellekten siler ve değerini döndürür."""
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self) -> None:
+        """Tüm kayıtları siler."""
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > self._timer()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        """İsabet/ıska sayaçlarını ve mevcut boyutu döndürür."""
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,310 @@
+"""
+Proje için coğrafi (konum) yardımcı programları.
+"""
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from utils.cache import TTLCache
+
+Tile = Tuple[int, int]
+
+EARTH_RADIUS_M = 6371008.8
+KM_PER_DEGREE_LAT = 111.32
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """İki koordinat arasındaki büyük daire mesafesini metre cinsinden döndürür."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def snap_to_tile(latitude: float, longitude: float, tile_deg: float) -> Tile:
+    """
+    Bir koordinatı, `tile_deg` derecelik ızgaradaki karo (tile) indeksine çevirir.
+
+    Args:
+        latitude: Enlem.
+        longitude: Boylam.
+        tile_deg: Karo kenarının derece cinsinden uzunluğu.
+
+    Returns:
+        (enlem_indeksi, boylam_indeksi) ikilisi.
+    """
+    return math.floor(latitude / tile_deg), math.floor(longitude / tile_deg)
+
+
+def tile_center(tile: Tile, tile_deg: float) -> Tuple[float, float]:
+    """Karonun merkez noktasının (enlem, boylam) koordinatını döndürür."""
+    return (tile[0] + 0.5) * tile_deg, (tile[1] + 0.5) * tile_deg
+
+
+def stores_within(
+    stores: Iterable[Dict[str, Any]], latitude: float, longitude: float, radius_km: float
+) -> List[Dict[str, Any]]:
+    """
+    Market listesindeki 'distance' alanını (metre) verilen noktaya göre yeniden hesaplar,
+    `radius_km` dışında kalanları eler ve listeyi mesafeye göre sıralar. Koordinatı
+    olmayan marketlerde upstream'in verdiği mesafe kullanılır.
+    """
+    radius_m = radius_km * 1000
+    result = []
+    for store in stores:
+        store_lat, store_lon = store.get("latitude"), store.get("longitude")
+        if store_lat is not None and store_lon is not None:
+            distance = haversine_m(latitude, longitude, store_lat, store_lon)
+        else:
+            distance = store.get("distance", 0)
+        if distance <= radius_m:
+            # Önbellekteki sözlükler paylaşıldığı için kopyası değiştirilir.
+            result.append({**store, "distance": distance})
+    result.sort(key=lambda store: store["distance"])
+    return result
+
+
+class NearestStoreCache:
+    """
+    En yakın market sorgularını coğrafi karolara göre önbelleğe alır.
+
+    Karo yalnızca önbellek anahtarıdır: upstream'e karo merkezinden, yarıçapı karonun
+    yarım köşegeni (`padding_km`) kadar genişletilmiş bir sorgu gönderilir. Böylece
+    karodaki her nokta için istenen daire bu sonucun içinde kalır. `get_tile` karodaki
+    herkes için aynı market kümesini verir (arama anahtarları bu kümeden üretilir);
+    `get` ise mesafeleri kullanıcının kendi konumuna göre yeniden hesaplayıp süzer. Aynı karo
+    için daha büyük bir yarıçapla önbelleğe alınmış bir sonuç da aynı şekilde kullanılır.
+    """
+
+    def __init__(self, tile_deg: float, maxsize: int, ttl: float):
+        """
+        Args:
+            tile_deg: Karo kenarının derece cinsinden uzunluğu.
+            maxsize: Önbellekte tutulacak en fazla (karo, yarıçap) kaydı.
+            ttl: Kayıtların saniye cinsinden geçerlilik süresi.
+        """
+        self.tile_deg = tile_deg
+        # Karo merkezinden en uzak köşesine olan mesafe (enlem yönündeki derece uzunluğuyla üst sınır).
+        self.padding_km = math.hypot(tile_deg / 2, tile_deg / 2) * KM_PER_DEGREE_LAT
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # karo -> o karo için önbellekte bulunan yarıçaplar
+        self._radii: Dict[Tile, set] = {}
+
+    def snap(self, latitude: float, longitude: float) -> Tuple[Tile, float, float]:
+        """Koordinatın karosunu ve upstream'e gönderilecek karo merkezini döndürür."""
+        tile = snap_to_tile(latitude, longitude, self.tile_deg)
+        center_lat, center_lon = tile_center(tile, self.tile_deg)
+        return tile, center_lat, center_lon
+
+    def query_radius(self, radius_km: float) -> int:
+        """
+        Upstream'e gönderilecek yarıçapı döndürür: karonun yarım köşegeni kadar genişletilip
+        API'nin beklediği tam sayı km'ye yukarı yuvarlanır.
+        """
+        return math.ceil(radius_km + self.padding_km)
+
+    def _lookup(self, tile: Tile, radius_km: int) -> Optional[List[Dict[str, Any]]]:
+        """Karo için `radius_km` veya daha büyük yarıçapla önbelleğe alınmış listeyi döndürür."""
+        stores = self._cache.get((tile, radius_km))
+        if stores is not None:
+            return stores
+
+        # Aynı karo için daha büyük yarıçaplı bir sonuç varsa o kullanılır.
+        for cached_radius in sorted(r for r in self._radii.get(tile, ()) if r > radius_km):
+            wider = self._cache.get((tile, cached_radius))
+            if wider is None:
+                self._radii[tile].discard(cached_radius)
+                continue
+            return wider
+        return None
+
+    def get(self, latitude: float, longitude: float, radius_km: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Önbellekteki market listesini, mesafeleri (latitude, longitude) noktasına göre
+        hesaplanmış ve `radius_km` ile süzülmüş olarak döndürür; uygun kayıt yoksa None döner.
+        """
+        tile, _, _ = self.snap(latitude, longitude)
+        stores = self._lookup(tile, radius_km)
+        if stores is None:
+            return None
+        return stores_within(stores, latitude, longitude, radius_km)
+
+    def get_tile(self, latitude: float, longitude: float, radius_km: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Koordinatın karosundaki herhangi bir noktadan `radius_km` içinde kalabilecek marketleri,
+        yani karo merkezinden `radius_km + padding_km` içindekileri döndürür. Sonuç karodaki
+        tüm kullanıcılar için aynıdır; mesafeler karo merkezine göredir.
+        """
+        tile, center_lat, center_lon = self.snap(latitude, longitude)
+        stores = self._lookup(tile, radius_km)
+        if stores is None:
+            return None
+        return stores_within(stores, center_lat, center_lon, radius_km + self.padding_km)
+
+    def set(self, latitude: float, longitude: float, radius_km: int, stores: List[Dict[str, Any]]) -> None:
+        """
+        Karo ve yarıçap için upstream'den (genişletilmiş yarıçapla) alınan market listesini
+        önbelleğe yazar.
+        """
+        tile, _, _ = self.snap(latitude, longitude)
+        self._cache.set((tile, radius_km), stores)
+        radii = self._radii.setdefault(tile, set())
+        radii.add(radius_km)
+        # Önbellekten düşmüş yarıçapları temizleyerek indeksin büyümesini engelle.
+        radii.intersection_update(r for r in radii if (tile, r) in self._cache)
+        if len(self._radii) > self._cache.maxsize:
+            for other_tile in list(self._radii):
+                alive = {r for r in self._radii[other_tile] if (other_tile, r) in self._cache}
+                if alive:
+                    self._radii[other_tile] = alive
+                else:
+                    del self._radii[other_tile]
+
+    def stats(self) -> Dict[str, int]:
+        """Önbellek sayaçlarını döndürür."""
+        return self._cache.stats()
+
+
+class _Coverage(NamedTuple):
+    """Upstream'den eksiksiz market listesi alınmış bir daire."""
+    latitude: float
+    longitude: float
+    radius_km: float
+    expires_at: float
+    members: frozenset
+
+
+class DepotRegistry:
+    """
+    Daha önce görülen marketlerin koordinatlarını tutan yerel kayıt.
+
+    Marketler bir ızgara (grid) indeksinde saklanır; "(enlem, boylam) çevresinde
+    `radius_km` içindeki marketler" sorgusu haversine mesafesiyle yerel olarak
+    yanıtlanır. Sonucun eksiksiz olduğundan emin olmak için yalnızca daha önce
+    nearest API'si ile taranmış bir dairenin tamamen içinde kalan sorgular
+    yanıtlanır.
+    """
+
+    def __init__(
+        self,
+        cell_deg: float,
+        coverage_ttl: float,
+        max_coverage: int = 4096,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            cell_deg: Izgara hücresinin derece cinsinden kenar uzunluğu.
+            coverage_ttl: Taranmış bir dairenin geçerli sayılacağı süre (saniye).
+            max_coverage: Saklanacak en fazla taranmış daire sayısı.
+            timer: Zaman kaynağı.
+        """
+        self.cell_deg = cell_deg
+        self.coverage_ttl = coverage_ttl
+        self._timer = timer
+        # market_id -> market bilgisi ('distance' hariç)
+        self._depots: Dict[str, Dict[str, Any]] = {}
+        self._depot_cells: Dict[str, Tile] = {}
+        self._cells: Dict[Tile, Set[str]] = {}
+        self._coverage: Deque[_Coverage] = deque(maxlen=max_coverage)
+        self.hits = 0
+        self.misses = 0
+
+    def _index(self, depot_id: str, latitude: float, longitude: float) -> None:
+        cell = snap_to_tile(latitude, longitude, self.cell_deg)
+        old_cell = self._depot_cells.get(depot_id)
+        if old_cell == cell:
+            return
+        if old_cell is not None:
+            self._cells[old_cell].discard(depot_id)
+        self._cells.setdefault(cell, set()).add(depot_id)
+        self._depot_cells[depot_id] = cell
+
+    def _has_location(self, depot_id: str) -> bool:
+        return depot_id in self._depot_cells
+
+    def add_stores(
+        self, stores: Iterable[Dict[str, Any]], center_lat: float, center_lon: float, radius_km: float
+    ) -> None:
+        """
+        Nearest API'sinin (center_lat, center_lon, radius_km) için döndürdüğü eksiksiz
+        market listesini kaydeder ve bu daireyi taranmış olarak işaretler.
+        """
+        member_ids = []
+        for store in stores:
+            depot_id = store["id"]
+            info = self._depots.setdefault(depot_id, {})
+            info.update((k, v) for k, v in store.items() if k != "distance")
+            latitude, longitude = info.get("latitude"), info.get("longitude")
+            if latitude is not None and longitude is not None:
+                self._index(depot_id, latitude, longitude)
+            member_ids.append(depot_id)
+        self._coverage.append(_Coverage(
+            center_lat, center_lon, radius_km, self._timer() + self.coverage_ttl, frozenset(member_ids)
+        ))
+
+    def add_depot_location(self, depot_id: str, latitude: float, longitude: float) -> None:
+        """Arama yanıtlarındaki market koordinatlarını (ProductDepotInfo) kayda ekler."""
+        if depot_id in self._depot_cells:
+            return
+        info = self._depots.setdefault(depot_id, {"id": depot_id})
+        info.setdefault("latitude", latitude)
+        info.setdefault("longitude", longitude)
+        self._index(depot_id, info["latitude"], info["longitude"])
+
+    def _covering(self, latitude: float, longitude: float, radius_km: float) -> Optional[_Coverage]:
+        now = self._timer()
+        while self._coverage and self._coverage[0].expires_at <= now:
+            self._coverage.popleft()
+        for coverage in reversed(self._coverage):
+            if coverage.radius_km < radius_km or coverage.expires_at <= now:
+                continue
+            center_km = haversine_m(coverage.latitude, coverage.longitude, latitude, longitude) / 1000.0
+            if center_km + radius_km <= coverage.radius_km and all(
+                self._has_location(m) for m in coverage.members
+            ):
+                return coverage
+        return None
+
+    def _nearby_ids(self, latitude: float, longitude: float, radius_km: float) -> Iterable[str]:
+        """Sorgu dairesini çevreleyen kutudaki ızgara hücrelerinin marketlerini döndürür."""
+        dlat = radius_km / KM_PER_DEGREE_LAT
+        dlon = radius_km / (KM_PER_DEGREE_LAT * max(math.cos(math.radians(latitude)), 1e-6))
+        min_i, min_j = snap_to_tile(latitude - dlat, longitude - dlon, self.cell_deg)
+        max_i, max_j = snap_to_tile(latitude + dlat, longitude + dlon, self.cell_deg)
+        for i in range(min_i, max_i + 1):
+            for j in range(min_j, max_j + 1):
+                yield from self._cells.get((i, j), ())
+
+    def find_within(self, latitude: float, longitude: float, radius_km: float) -> Optional[List[Dict[str, Any]]]:
+        """
+        (latitude, longitude) çevresinde `radius_km` içindeki marketleri, metre cinsinden
+        'distance' alanıyla ve mesafeye göre sıralı döndürür. Bölge daha önce eksiksiz
+        taranmamışsa None döner.
+        """
+        coverage = self._covering(latitude, longitude, radius_km)
+        if coverage is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        radius_m = radius_km * 1000
+        stores = []
+        for depot_id in self._nearby_ids(latitude, longitude, radius_km):
+            if depot_id not in coverage.members:
+                continue
+            info = self._depots[depot_id]
+            distance = haversine_m(latitude, longitude, info["latitude"], info["longitude"])
+            if distance <= radius_m:
+                stores.append({**info, "distance": distance})
+        stores.sort(key=lambda store: store["distance"])
+        return stores
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "depots": len(self._depot_cells),
+            "covered_areas": len(self._coverage),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -2,13 +2,49 @@
 Proje için loglama (günlük tutma) yardımcı programları.
 """
 import os
+import copy
+import json
+import queue
+import atexit
+import random
 import logging
-from datetime import datetime
-from typing import Optional
+import logging.handlers
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+LOG_FORMAT = '%(asctime)s - %(day_name)s - %(name)s - %(levelname)s - %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# LogRecord'un standart alanları; JSON çıktısında yalnızca bunların dışındaki (extra) alanlar eklenir.
+_STANDARD_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "day_name"}
+
+
+class _DayNameCache:
+    """Gün adını her kayıt için yeniden hesaplamamak adına gün değişene kadar saklar."""
+
+    def __init__(self):
+        self._day_start = 0.0
+        self._day_end = 0.0
+        self._name = ""
+
+    def get(self, created: float) -> str:
+        if not (self._day_start <= created < self._day_end):
+            moment = datetime.fromtimestamp(created)
+            start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+            self._day_start = start.timestamp()
+            self._day_end = (start + timedelta(days=1)).timestamp()
+            self._name = moment.strftime('%A')
+        return self._name
+
 
 class DayNameFormatter(logging.Formatter):
     """Log kayıtlarına gün adını ekleyen özel formatlayıcı."""
-    
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._day_names = _DayNameCache()
+
     def format(self, record):
         """
         Log kaydını formatlar.
@@ -19,10 +55,153 @@ class DayNameFormatter(logging.Formatter):
         Returns:
             Formatlanmış log kaydı.
         """
-        day_name = datetime.now().strftime('%A')
-        record.day_name = day_name
+        record.day_name = self._day_names.get(record.created)
         return super().format(record)
 
+
+class JsonFormatter(logging.Formatter):
+    """Her log kaydını tek satırlık bir JSON nesnesine çeviren formatlayıcı."""
+
+    def __init__(self, datefmt: Optional[str] = DATE_FORMAT):
+        super().__init__(datefmt=datefmt)
+        self._day_names = _DayNameCache()
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, self.datefmt),
+            "day": self._day_names.get(record.created),
+            "logger": record.name,
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def daily_log_filename(log_dir: str, moment: datetime) -> str:
+    """Verilen günün log dosyasının yolunu döndürür (mcp_sunucu_{tarih}_{gün}.log)."""
+    return os.path.join(log_dir, f"mcp_sunucu_{moment.strftime('%Y-%m-%d')}_{moment.strftime('%A')}.log")
+
+
+class DailyFileHandler(logging.FileHandler):
+    """
+    Gün değiştiğinde `mcp_sunucu_{tarih}_{gün}.log` adlı yeni dosyaya geçen
+    dosya handler'ı. Uzun süre çalışan süreçler de her günün loglarını kendi
+    dosyasına yazar.
+    """
+
+    def __init__(self, log_dir: str, encoding: str = 'utf-8'):
+        self.log_dir = log_dir
+        self._day_end = 0.0
+        super().__init__(self._filename_for(datetime.now().timestamp()), mode='a', encoding=encoding, delay=True)
+
+    def _filename_for(self, created: float) -> str:
+        moment = datetime.fromtimestamp(created)
+        start = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        self._day_end = (start + timedelta(days=1)).timestamp()
+        return daily_log_filename(self.log_dir, moment)
+
+    def emit(self, record):
+        if record.created >= self._day_end:
+            self.acquire()
+            try:
+                if record.created >= self._day_end:
+                    self.close()
+                    self.baseFilename = os.path.abspath(self._filename_for(record.created))
+            finally:
+                self.release()
+        super().emit(record)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Seviyesine göre kayıtların yalnızca bir kısmını geçiren filtre. Çağrı başına
+    yazılan gürültülü INFO/DEBUG loglarını seyreltmek için kullanılır.
+    """
+
+    def __init__(self, rates: Dict[int, float]):
+        """
+        Args:
+            rates: Seviye -> geçirilecek oran (0-1). Listede olmayan seviyeler her zaman geçer.
+        """
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno)
+        return rate is None or rate >= 1.0 or random.random() < rate
+
+
+def parse_sample_rates(spec: Optional[str]) -> Dict[int, float]:
+    """'DEBUG=0.1,INFO=0.5' biçimindeki metni {seviye: oran} sözlüğüne çevirir."""
+    rates: Dict[int, float] = {}
+    for part in (spec or "").split(","):
+        if "=" not in part:
+            continue
+        level_name, rate = part.split("=", 1)
+        level = logging.getLevelName(level_name.strip().upper())
+        if isinstance(level, int):
+            rates[level] = float(rate)
+    return rates
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Kaydı kuyruğa koymadan önce yalnızca mesajı ve istisna metnini hazırlar;
+    biçimlendirme ve disk yazımı arka plandaki dinleyici iş parçacığında yapılır.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_listener_lock = threading.Lock()
+# log dizini -> o dizine yazan arka plan dinleyicisinin kuyruk handler'ı
+_listeners: Dict[str, logging.handlers.QueueHandler] = {}
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ("1", "true", "yes")
+
+
+def _build_output_handlers(log_dir: str, json_format: bool):
+    formatter = JsonFormatter() if json_format else DayNameFormatter(LOG_FORMAT, datefmt=DATE_FORMAT)
+    file_handler = DailyFileHandler(log_dir)
+    file_handler.setFormatter(formatter)
+    # Konsol handler'ı da ekleyelim ki terminalde de logları görelim
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    return file_handler, stream_handler
+
+
+def _shared_queue_handler(log_dir: str, json_format: bool) -> logging.handlers.QueueHandler:
+    """Log dizini başına tek bir kuyruk ve arka plan dinleyicisi oluşturur."""
+    with _listener_lock:
+        handler = _listeners.get(log_dir)
+        if handler is None:
+            log_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(
+                log_queue, *_build_output_handlers(log_dir, json_format), respect_handler_level=True
+            )
+            listener.start()
+            # Süreç kapanırken kuyrukta kalan kayıtlar da yazılsın.
+            atexit.register(listener.stop)
+            handler = _listeners[log_dir] = _QueueHandler(log_queue)
+        return handler
+
+
 def setup_logger(
     name: str,
     log_dir: Optional[str] = None,
@@ -30,12 +209,18 @@ def setup_logger(
 ) -> logging.Logger:
     """
     Dosya çıktısı ve gün adı formatlaması ile bir logger (günlükleyici) ayarlar.
-    
+
+    Davranış ortam değişkenleriyle ayarlanır:
+        LOG_ASYNC: true ise (varsayılan) kayıtlar kuyruğa konur, disk ve konsol
+            yazımı arka plandaki bir iş parçacığında yapılır.
+        LOG_FORMAT: 'text' (varsayılan) veya satır başına bir JSON nesnesi için 'json'.
+        LOG_SAMPLE_RATES: Seviye bazında örnekleme oranları, örn. 'DEBUG=0.1,INFO=0.5'.
+
     Args:
         name: Logger'ın adı.
         log_dir: Logların kaydedileceği dizin (varsayılan: ./logs).
         level: Loglama seviyesi.
-        
+
     Returns:
         Yapılandırılmış logger nesnesi.
     """
@@ -45,44 +230,33 @@ def setup_logger(
         script_dir = os.path.dirname(os.path.abspath(__file__))
         # Ana proje dizinine çıkıp 'logs' klasörünü hedefle
         log_dir = os.path.join(os.path.dirname(script_dir), "logs")
-    
+
     # 'logs' dizini yoksa oluştur
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
-    
-    # Mevcut tarih ve gün adıyla log dosya adı oluştur
-    current_date = datetime.now()
-    day_name = current_date.strftime('%A')
-    date_str = current_date.strftime('%Y-%m-%d')
-    log_filename = os.path.join(log_dir, f"mcp_sunucu_{date_str}_{day_name}.log")
-    
+
+    json_format = os.getenv("LOG_FORMAT", "text").lower() == "json"
+    sample_rates = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES"))
+
     # Logger oluştur
     logger = logging.getLogger(name)
     logger.setLevel(level)
-    
+
     # Tekrarlanan logları önlemek için mevcut handler'ları temizle
     if logger.hasHandlers():
         logger.handlers.clear()
-    
-    # Dosya handler'ı oluştur
-    file_handler = logging.FileHandler(log_filename, mode='a', encoding='utf-8')
-    file_handler.setLevel(level)
-    
-    # Formatlayıcı oluştur
-    formatter = DayNameFormatter(
-        '%(asctime)s - %(day_name)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
-    file_handler.setFormatter(formatter)
-    
-    # Handler'ı logger'a ekle
-    logger.addHandler(file_handler)
-    
-    # Konsol handler'ı da ekleyelim ki terminalde de logları görelim
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
-    
+    logger.filters.clear()
+    if sample_rates:
+        logger.addFilter(SamplingFilter(sample_rates))
+
+    if _env_flag("LOG_ASYNC", "true"):
+        logger.addHandler(_shared_queue_handler(log_dir, json_format))
+    else:
+        for handler in _build_output_handlers(log_dir, json_format):
+            handler.setLevel(level)
+            logger.addHandler(handler)
+
+    log_filename = daily_log_filename(log_dir, datetime.now())
     logger.info(f"Logger '{name}' başlatıldı. Loglar şu dosyaya kaydedilecek: {log_filename}")
-    
+
     return logger
@@ -0,0 +1,243 @@
+"""
+Sunucu için hafif ölçüm (metrics) ve izleme yardımcı programları.
+
+Aşama süreleri histogramlarda, upstream durum kodları ve hatalar sayaçlarda
+tutulur; önbellek ve eş zamanlılık durumları okunduğu anda hesaplanan
+göstergelerle (gauge) verilir. Çıktı Prometheus metin biçimindedir.
+Ölçüm kapalıyken `stage` ortak bir boş bağlam yöneticisi döndürür; böylece
+ölçüm noktalarının maliyeti bir fonksiyon çağrısından ibaret kalır.
+"""
+import bisect
+import contextvars
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEFAULT_SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Her araç çağrısına verilen izleme kimliği ve o çağrıda ölçülen aşama süreleri.
+trace_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("trace_id", default=None)
+_call_stages: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar("call_stages", default=None)
+
+
+def _format_labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        # Kayda eklenince atanır; ölçüm kapalıyken değer yazımı atlanır.
+        self.registry: Optional["MetricsRegistry"] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.registry is None or self.registry.enabled
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Yalnızca artan sayaç."""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.label_names, labels)} {value}" for labels, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """Sabit kovalara (bucket) göre dağılım tutan histogram."""
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, help_text: str, label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # etiketler -> (kova sayaçları, toplam, adet)
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        if not self.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0, 0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+            entry[1][1] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(counts), list(totals)) for labels, (counts, totals) in self._values.items()]
+        lines = self._header()
+        for labels, counts, (total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                le_label = 'le="' + le + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {int(count)}")
+        return lines
+
+
+class CallbackGauge(_Metric):
+    """Değerleri her okumada bir fonksiyondan alınan gösterge."""
+    kind = "gauge"
+
+    def __init__(
+        self, name: str, help_text: str, label_names: Sequence[str],
+        callback: Callable[[], Iterable[Tuple[LabelValues, float]]],
+    ):
+        super().__init__(name, help_text, label_names)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        return self._header() + [
+            f"{self.name}{_format_labels(self.label_names, labels)} {value}" for labels, value in self.callback()
+        ]
+
+
+class MetricsRegistry:
+    """Sunucunun tüm ölçümlerini tutan kayıt."""
+
+    def __init__(self, enabled: bool = True, namespace: str = "market_fiyati"):
+        self.enabled = enabled
+        self.namespace = namespace
+        self._metrics: Dict[str, _Metric] = {}
+        self.stage_seconds = self.histogram(
+            "stage_duration_seconds", "İşlem aşamalarının süresi (saniye).", ["stage"]
+        )
+        self.upstream_responses = self.counter(
+            "upstream_responses_total", "Upstream yanıtlarının durum koduna göre sayısı.", ["host", "status"]
+        )
+        self.upstream_errors = self.counter(
+            "upstream_errors_total", "Upstream isteklerindeki hataların türüne göre sayısı.", ["host", "error"]
+        )
+        self.payload_bytes = self.histogram(
+            "payload_bytes", "Upstream yanıt gövdelerinin boyutu (bayt).", ["kind"], buckets=DEFAULT_SIZE_BUCKETS
+        )
+        self.tool_calls = self.counter("tool_calls_total", "Araç çağrılarının sonuca göre sayısı.", ["tool", "outcome"])
+
+    def _register(self, metric: _Metric) -> _Metric:
+        metric.name = f"{self.namespace}_{metric.name}"
+        metric.registry = self
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, label_names))
+
+    def histogram(
+        self, name: str, help_text: str, label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def gauge(
+        self, name: str, help_text: str, label_names: Sequence[str],
+        callback: Callable[[], Iterable[Tuple[LabelValues, float]]],
+    ) -> CallbackGauge:
+        return self._register(CallbackGauge(name, help_text, label_names, callback))
+
+    def stage(self, name: str):
+        """Bir aşamanın süresini ölçen bağlam yöneticisi; ölçüm kapalıysa hiçbir şey yapmaz."""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed_stage(name)
+
+    @contextmanager
+    def _timed_stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - started)
+
+    def record_stage(self, name: str, seconds: float) -> None:
+        """Ölçülmüş bir aşama süresini histogramaya ve (varsa) çağrının aşama dökümüne ekler."""
+        if not self.enabled:
+            return
+        self.stage_seconds.observe(seconds, name)
+        stages = _call_stages.get()
+        if stages is not None:
+            stages[name] = stages.get(name, 0.0) + seconds
+
+    def render(self) -> str:
+        """Tüm ölçümleri Prometheus metin biçiminde döndürür."""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            try:
+                lines.extend(metric.render())
+            except Exception:
+                # Bir göstergenin okunamaması tüm çıktıyı bozmamalı.
+                continue
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def traced_call() -> Iterator[Tuple[str, Dict[str, float]]]:
+    """
+    Bir araç çağrısı için yeni bir izleme kimliği başlatır. Çağrı içinde
+    ölçülen aşama süreleri, dönen sözlükte toplanır (eş zamanlı aşamalar
+    üst üste binebileceği için toplamları duvar saatini aşabilir).
+    """
+    trace_id = uuid.uuid4().hex[:16]
+    stages: Dict[str, float] = {}
+    trace_token = trace_id_var.set(trace_id)
+    stages_token = _call_stages.set(stages)
+    try:
+        yield trace_id, stages
+    finally:
+        _call_stages.reset(stages_token)
+        trace_id_var.reset(trace_token)
+
+
+class TraceIdFilter:
+    """Log kayıtlarına, o anki araç çağrısının izleme kimliğini (`trace_id`) ekleyen filtre."""
+
+    def filter(self, record) -> bool:
+        trace_id = trace_id_var.get()
+        if trace_id is not None:
+            record.trace_id = trace_id
+        return True
@@ -0,0 +1,190 @@
+"""
+Popüler (ürün, bölge) sorgularını öğrenip önbellek süresi dolmadan önceden
+yenileyen arka plan zamanlayıcısı.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.geo import snap_to_tile
+from utils.upstream import count_attempts
+
+HotKey = Tuple[str, int, int, int]
+
+
+class _HotQuery:
+    """Takip edilen bir (ürün, bölge, yarıçap) sorgusu ve zamanla sönümlenen popülerlik puanı."""
+    __slots__ = ("keyword", "latitude", "longitude", "radius_km", "score", "updated_at")
+
+    def __init__(self, keyword: str, latitude: float, longitude: float, radius_km: int, now: float):
+        self.keyword = keyword
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius_km = radius_km
+        self.score = 0.0
+        self.updated_at = now
+
+
+class PrefetchScheduler:
+    """
+    Araç çağrılarından sık sorulan (ürün, bölge) çiftlerini öğrenir ve arka planda,
+    önbellekteki kayıtlarının süresi dolmadan yeniler. Upstream'e gönderilen ön
+    getirme istekleri dakika başına bir bütçeyle (token bucket) sınırlanır; bütçe
+    bu sürece aittir, birden fazla çalışan varsa her biri kendi bütçesini kullanır.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        interval: float = 30.0,
+        budget_per_minute: float = 30.0,
+        max_hot: int = 200,
+        max_tracked: int = 5000,
+        half_life: float = 3600.0,
+        min_score: float = 2.0,
+        area_deg: float = 0.01,
+        refresh_margin: float = 60.0,
+        logger: Optional[logging.Logger] = None,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Args:
+            client: `prefetch` ve `normalize_keyword` metotlarını sağlayan API istemcisi; upstream
+                istekleri `UpstreamExecutor` üzerinden gönderilmelidir ki bütçeye sayılsın.
+            interval: İki ön getirme turu arasındaki süre (saniye).
+            budget_per_minute: Dakika başına en fazla ön getirme upstream isteği.
+            max_hot: Bir turda değerlendirilecek en popüler sorgu sayısı.
+            max_tracked: Bellekte takip edilecek en fazla sorgu sayısı.
+            half_life: Popülerlik puanının yarıya inme süresi (saniye).
+            min_score: Bir sorgunun ön getirilmesi için gereken en düşük puan.
+            area_deg: Bölgelerin gruplandığı ızgaranın derece cinsinden kenarı.
+            refresh_margin: Önbellek kaydının tazeliği bu süreden az kaldıysa yenilenir (saniye).
+            logger: Tur özetlerinin yazılacağı logger.
+            timer: Zaman kaynağı.
+        """
+        self.client = client
+        self.interval = interval
+        self.budget_per_minute = budget_per_minute
+        self.max_hot = max_hot
+        self.max_tracked = max_tracked
+        self.half_life = half_life
+        self.min_score = min_score
+        self.area_deg = area_deg
+        self.refresh_margin = refresh_margin
+        self.logger = logger or logging.getLogger(__name__)
+        self._timer = timer
+        self._queries: Dict[HotKey, _HotQuery] = {}
+        self._tokens = budget_per_minute
+        self._tokens_updated_at = timer()
+        self._task: Optional[asyncio.Task] = None
+        self.rounds = 0
+        self.prefetched_requests = 0
+        self.budget_exhausted = 0
+        self.errors = 0
+
+    def _decayed_score(self, query: _HotQuery, now: float) -> float:
+        return query.score * 0.5 ** ((now - query.updated_at) / self.half_life)
+
+    def record(self, keywords: List[str], latitude: float, longitude: float, radius_km: int) -> None:
+        """Bir araç çağrısındaki (ürün, bölge) çiftlerinin popülerliğini artırır."""
+        now = self._timer()
+        tile = snap_to_tile(latitude, longitude, self.area_deg)
+        for keyword in keywords:
+            normalized = self.client.normalize_keyword(keyword)
+            key = (normalized, tile[0], tile[1], radius_km)
+            query = self._queries.get(key)
+            if query is None:
+                query = self._queries[key] = _HotQuery(keyword, latitude, longitude, radius_km, now)
+            query.score = self._decayed_score(query, now) + 1.0
+            query.updated_at = now
+            # Ön getirme, kullanıcılarla aynı market kümesine ve aynı upstream aramasına denk gelsin
+            # diye son görülen yazım ve konumla yapılır.
+            query.keyword = keyword
+            query.latitude, query.longitude = latitude, longitude
+        if len(self._queries) > self.max_tracked:
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        """En düşük puanlı sorguları atarak takip listesini sınır içinde tutar."""
+        ranked = sorted(self._queries.items(), key=lambda kv: self._decayed_score(kv[1], now))
+        for key, _ in ranked[:len(self._queries) - self.max_tracked]:
+            del self._queries[key]
+
+    def hot_queries(self) -> List[_HotQuery]:
+        """Puanı eşiği geçen en popüler sorguları, en popülerden başlayarak döndürür."""
+        now = self._timer()
+        scored = [(self._decayed_score(q, now), q) for q in self._queries.values()]
+        hot = [(score, q) for score, q in scored if score >= self.min_score]
+        hot.sort(key=lambda sq: sq[0], reverse=True)
+        return [q for _, q in hot[:self.max_hot]]
+
+    def _refill_tokens(self) -> None:
+        now = self._timer()
+        elapsed = now - self._tokens_updated_at
+        self._tokens = min(self.budget_per_minute, self._tokens + elapsed * self.budget_per_minute / 60.0)
+        self._tokens_updated_at = now
+
+    async def run_once(self) -> int:
+        """
+        Tek bir ön getirme turu çalıştırır.
+
+        Returns:
+            Bu turda yapılan upstream istek sayısı.
+        """
+        self.rounds += 1
+        requests_made = 0
+        for query in self.hot_queries():
+            self._refill_tokens()
+            if self._tokens < 1:
+                self.budget_exhausted += 1
+                break
+            # Bütçeden, başarısız olanlar ve yeniden denemeler dahil upstream'e gerçekten giden istekler düşülür.
+            with count_attempts() as attempts:
+                try:
+                    await self.client.prefetch(
+                        query.keyword, query.latitude, query.longitude, query.radius_km, self.refresh_margin
+                    )
+                except Exception as e:
+                    self.errors += 1
+                    self.logger.warning(f"'{query.keyword}' ön getirilirken hata: {e}")
+            cost = sum(attempts.values())
+            self._tokens -= cost
+            requests_made += cost
+        self.prefetched_requests += requests_made
+        if requests_made:
+            self.logger.info(f"Ön getirme turu tamamlandı: {requests_made} upstream isteği, takip edilen sorgu: {len(self._queries)}")
+        return requests_made
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                self.errors += 1
+                self.logger.exception("Ön getirme turunda beklenmedik hata.")
+
+    def ensure_running(self) -> None:
+        """Zamanlayıcıyı, çalışan olay döngüsünde (henüz başlamadıysa) başlatır."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Arka plan görevini durdurur."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Zamanlayıcının gözlemlenebilir sayaçlarını döndürür."""
+        return {
+            "tracked": len(self._queries),
+            "hot": len(self.hot_queries()),
+            "rounds": self.rounds,
+            "prefetched_requests": self.prefetched_requests,
+            "budget_exhausted": self.budget_exhausted,
+            "errors": self.errors,
+            "tokens": round(self._tokens, 2),
+        }
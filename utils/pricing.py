@@ -0,0 +1,83 @@
+"""
+Fiyat metinlerini ayrıştırma ve birim fiyatları ortak birime çevirme yardımcı programları.
+"""
+import re
+from functools import lru_cache
+from typing import Optional, Tuple
+
+# Birim -> (ortak birim, 1 birimin ortak birim cinsinden miktarı)
+_UNIT_FACTORS = {
+    "kg": ("kg", 1.0),
+    "kilo": ("kg", 1.0),
+    "g": ("kg", 0.001),
+    "gr": ("kg", 0.001),
+    "gram": ("kg", 0.001),
+    "l": ("L", 1.0),
+    "lt": ("L", 1.0),
+    "litre": ("L", 1.0),
+    "cl": ("L", 0.01),
+    "ml": ("L", 0.001),
+    "adet": ("adet", 1.0),
+    "ad": ("adet", 1.0),
+    "paket": ("adet", 1.0),
+}
+
+# '101,37 ₺/kg', '5,90 TL / 100 g', '0,25₺/adet' gibi metinler için.
+_UNIT_PRICE_RE = re.compile(r"(\d[\d.,]*)[^/]*/\s*(\d[\d.,]*)?\s*([^\d\s.,/]+)")
+
+# Ondalık kısmı olmayan '1.000' veya '12.500.000' gibi binlik ayraçlı sayılar.
+_THOUSANDS_RE = re.compile(r"\d{1,3}(?:\.\d{3})+")
+
+
+def _parse_turkish_number(text: str) -> float:
+    """'1.234,56', '1.000' veya '12,5' gibi Türkçe biçimli bir sayıyı float'a çevirir."""
+    text = text.rstrip(".")
+    if "," in text:
+        text = text.replace(".", "").replace(",", ".")
+    elif _THOUSANDS_RE.fullmatch(text):
+        # Virgül yoksa, ardından tam üç hane gelen nokta binlik ayracıdır.
+        text = text.replace(".", "")
+    return float(text)
+
+
+def parse_unit_price(unit_price_str: Optional[str]) -> float:
+    """'101,37 ₺/kg' gibi bir metni 101.37 sayısına çevirir."""
+    if not unit_price_str:
+        return float('inf')
+    try:
+        cleaned_str = re.sub(r'[^\d,]', '', unit_price_str).replace(',', '.')
+        return float(cleaned_str)
+    except (ValueError, TypeError):
+        return float('inf')
+
+
+@lru_cache(maxsize=65536)
+def normalize_unit_price(unit_price_str: Optional[str]) -> Tuple[float, Optional[str]]:
+    """
+    Birim fiyat metnini ortak birime (kg, L veya adet başına) çevrilmiş sayıya dönüştürür.
+
+    Örnekler: '5,90 ₺/100 g' -> (59.0, 'kg'), '12,50 ₺/L' -> (12.5, 'L').
+    Aynı metinler çok sık tekrarlandığı için sonuçlar önbelleğe alınır.
+
+    Args:
+        unit_price_str: API'den gelen birim fiyat metni.
+
+    Returns:
+        (ortak_birim_başına_fiyat, ortak_birim) ikilisi. Metin ayrıştırılamazsa
+        (inf, None), birim tanınmazsa (sayı, None) döner.
+    """
+    if not unit_price_str:
+        return float('inf'), None
+    match = _UNIT_PRICE_RE.search(unit_price_str)
+    if match is None:
+        return parse_unit_price(unit_price_str), None
+    try:
+        value = _parse_turkish_number(match.group(1))
+        amount = _parse_turkish_number(match.group(2)) if match.group(2) else 1.0
+    except ValueError:
+        return float('inf'), None
+    unit = _UNIT_FACTORS.get(match.group(3).lower())
+    if unit is None or amount <= 0:
+        return value, None
+    base_unit, factor = unit
+    return value / (amount * factor), base_unit
@@ -0,0 +1,70 @@
+"""
+Fiyat kayıtlarını sıralama, ilk `limit` kaydı seçme ve ürün bazında gruplama yardımcı programları.
+"""
+import heapq
+from typing import Any, Callable, Dict, List, Optional
+
+from models import GroupedProduct, MarketOffer, PriceRecord
+
+# Birim fiyat sıralamasında ortak birimlerin sırası; birimi tanınmayan veya
+# ayrıştırılamayan kayıtlar en sona kalır.
+_UNIT_ORDER = {"kg": 0, "L": 1, "adet": 2}
+
+
+def _ranking_key(sort_by: str) -> Callable[[PriceRecord], Any]:
+    """
+    Sıralama ölçütüne göre, kayıt üzerinde önceden hesaplanmış anahtarı döndürür.
+    TL/kg, TL/L ve TL/adet değerleri aynı eksende karşılaştırılamayacağından
+    birim fiyat sıralaması (ortak birim, değer) ikilisine göre yapılır.
+    """
+    if sort_by.lower() == 'unit_price':
+        unplaced = len(_UNIT_ORDER)
+        return lambda r: (_UNIT_ORDER.get(r.unit_price_unit, unplaced), r.unit_price_value)
+    return lambda r: r.depot.price
+
+
+def _top_k(records: List[PriceRecord], key: Callable[[PriceRecord], Any], limit: Optional[int]) -> List[PriceRecord]:
+    """`limit` verilmişse tam sıralama yerine sınırlı bir yığın (heap) seçimi yapar."""
+    if limit and 0 < limit < len(records):
+        return heapq.nsmallest(limit, records, key=key)
+    return sorted(records, key=key)
+
+
+def rank_records(
+    records: List[PriceRecord], sort_by: str, limit: Optional[int] = None, per_product: bool = False
+) -> List[PriceRecord]:
+    """
+    Kayıtları 'price' veya 'unit_price' (kg / L / adet başına) ölçütüne göre sıralayıp ilk `limit` kaydı seçer.
+    `per_product` True ise seçim, listedeki her ürün için ayrı ayrı yapılır.
+    """
+    key = _ranking_key(sort_by)
+    if not per_product:
+        return _top_k(records, key, limit)
+    by_product: Dict[str, List[PriceRecord]] = {}
+    for record in records:
+        by_product.setdefault(record.product_name, []).append(record)
+    return [record for group in by_product.values() for record in _top_k(group, key, limit)]
+
+
+def group_records(records: List[PriceRecord]) -> List[GroupedProduct]:
+    """
+    Sıralanmış kayıtları ürün bazında gruplar. Ürünler ilk (en iyi) tekliflerinin
+    sırasını korur; her ürünün başlık, miktar ve resim bilgisi bir kez yazılır.
+    """
+    groups: Dict[int, GroupedProduct] = {}
+    for record in records:
+        group = groups.get(id(record.item))
+        if group is None:
+            group = groups[id(record.item)] = GroupedProduct(
+                product_title=record.item.title,
+                product_quantity=record.item.refined_quantity_unit,
+                image_url=record.item.image_url,
+                offers=[],
+            )
+        group.offers.append(MarketOffer(
+            price=record.depot.price,
+            unit_price=record.depot.unit_price,
+            market_name=record.depot.market_adi,
+            distance_km=record.distance_km,
+        ))
+    return list(groups.values())
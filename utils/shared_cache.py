@@ -0,0 +1,131 @@
+"""
+Aynı makinedeki sunucu çalışanlarının (worker) ortak kullandığı SQLite tabanlı önbellek.
+
+Her çalışan kendi bellek içi önbelleğini tutar; bellekte bulunamayan nearest ve
+arama sonuçları önce bu depodan okunur. Bir sonucu ilk isteyen çalışan kısa süreli
+bir kira (lease) alır; aynı anahtarı isteyen diğer çalışanlar upstream'e gitmek
+yerine sonucun depoya yazılmasını bekler. Böylece çalışan sayısı artınca upstream
+istekleri çoğalmaz. Depo diskte olduğundan yeniden başlatmalarda da korunur.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key         TEXT PRIMARY KEY,
+    value       BLOB NOT NULL,
+    expires_at  REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS leases (
+    key         TEXT PRIMARY KEY,
+    owner       INTEGER NOT NULL,
+    expires_at  REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Bu kadar yazmada bir süresi dolmuş kayıtlar silinir.
+_PURGE_EVERY_WRITES = 256
+
+
+class SharedCache:
+    """
+    Süreçler arası paylaşılan anahtar-değer önbelleği. Süreler duvar saatiyle
+    (time.time) tutulur ki tüm süreçler aynı zamanı görsün. Metotlar senkrondur;
+    asenkron koddan `asyncio.to_thread` ile çağrılmalıdır.
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 10.0, poll_interval: float = 0.05):
+        """
+        Args:
+            path: SQLite veritabanı dosyasının yolu.
+            lease_seconds: Bir çalışanın upstream isteği için aldığı kiranın süresi; bu süre
+                dolarsa (ör. çalışan çöktüyse) diğer çalışanlar isteği kendileri yapar.
+            poll_interval: Kira başkasındayken sonucun depoda olup olmadığına bakma aralığı.
+        """
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._owner = os.getpid()
+        self._lock = threading.Lock()
+        # Yazma kilidi başka bir süreçteyse beklenir (busy timeout).
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lease_waits = 0
+
+    def get(self, key: str, min_fresh: float = 0.0, count: bool = True) -> Optional[Tuple[bytes, float]]:
+        """
+        Anahtarın değerini döndürür.
+
+        Args:
+            key: Önbellek anahtarı.
+            min_fresh: Kaydın en az bu kadar saniye daha taze kalması gerekir.
+            count: False ise isabet/ıska sayaçları değiştirilmez; başka bir çalışanın kirası
+                beklenirken yapılan tekrar okumalar için kullanılır (bekleme `lease_waits`te sayılır).
+
+        Returns:
+            (değer, kalan tazelik süresi) ikilisi; kayıt yoksa veya süresi dolmak üzereyse None.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ? AND expires_at > ?", (key, now + min_fresh)
+            ).fetchone()
+            if row is None:
+                if count:
+                    self.misses += 1
+                return None
+            if count:
+                self.hits += 1
+        return row[0], row[1] - now
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        """Değeri `ttl` saniye taze kalacak şekilde yazar."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)", (key, value, now + ttl)
+            )
+            self._writes += 1
+            if self._writes % _PURGE_EVERY_WRITES == 0:
+                self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+                self._conn.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+
+    def claim(self, key: str) -> bool:
+        """
+        Anahtar için upstream isteği yapma kirasını almaya çalışır.
+
+        Returns:
+            Kira alındıysa True; başka bir çalışan geçerli bir kira tutuyorsa False.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, self._owner, now + self.lease_seconds),
+            )
+            claimed = cursor.rowcount == 1
+            if not claimed:
+                self.lease_waits += 1
+        return claimed
+
+    def release(self, key: str) -> None:
+        """Bu sürecin tuttuğu kirayı bırakır."""
+        with self._lock:
+            self._conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self._owner))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "lease_waits": self.lease_waits, "writes": self._writes}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
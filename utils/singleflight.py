@@ -0,0 +1,58 @@
+"""
+Aynı anda yapılan özdeş asenkron istekleri tek bir istekte birleştiren yardımcı programlar.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Aynı anahtarla eş zamanlı gelen çağrıların tek bir uçuştaki (in-flight)
+    isteği paylaşmasını sağlar.
+
+    İlk çağıran isteği başlatır, sonrakiler aynı görevin sonucunu bekler.
+    Paylaşılan istek hata verirse veya iptal edilirse, bekleyen herkes aynı
+    hatayı alır. Bekleyenlerden birinin iptal edilmesi ise paylaşılan isteği
+    iptal etmez.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self.shared = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Anahtar için uçuşta bir istek varsa onu bekler, yoksa `func` ile başlatır.
+
+        Args:
+            key: İsteği tanımlayan anahtar (örn. payload'dan türetilmiş).
+            func: İsteği başlatan, argümansız coroutine fonksiyonu.
+
+        Returns:
+            Paylaşılan isteğin sonucu.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Tüm bekleyenler iptal edilmişse hatanın "alınmadı" uyarısı vermesini engelle.
+        if not task.cancelled():
+            task.exception()
+
+    def cancel_all(self) -> None:
+        """Uçuştaki tüm istekleri iptal eder."""
+        for task in list(self._inflight.values()):
+            task.cancel()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
@@ -0,0 +1,188 @@
+"""
+Fiyat verilerini diskte (SQLite) saklayan anlık görüntü (snapshot) deposu.
+
+Upstream araması market kümesine göre ilk N sonucu döndürdüğü için tazelik, her
+(arama kelimesi, market kümesi, sayfa, boyut) sayfası için ayrı ayrı tutulur; bir
+markette sonuç çıkmaması, o marketin ürünü satmadığı anlamına gelmez. Böylece
+yalnızca süresi dolmuş sayfalar yeniden sorgulanır, yeniden başlatmadan sonra
+veriler diskten okunur ve upstream erişilemezken eski veriyle yanıt verilebilir.
+"""
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from models import ApiSearchResponse, ContentItem, ProductDepotInfo
+
+# Şema değiştiğinde artırılır; eski sürümdeki tablolar önbellek verisi olduğu için silinip yeniden oluşturulur.
+_SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_pages (
+    keyword          TEXT    NOT NULL,
+    depot_set        TEXT    NOT NULL,
+    page             INTEGER NOT NULL,
+    size             INTEGER NOT NULL,
+    number_of_found  INTEGER,
+    fetched_at       REAL    NOT NULL,
+    PRIMARY KEY (keyword, depot_set, page, size)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS product_prices (
+    keyword      TEXT    NOT NULL,
+    depot_set    TEXT    NOT NULL,
+    page         INTEGER NOT NULL,
+    size         INTEGER NOT NULL,
+    depot_id     TEXT    NOT NULL,
+    product_key  TEXT    NOT NULL,
+    position     INTEGER NOT NULL,
+    item_id      TEXT,
+    title        TEXT    NOT NULL,
+    brand        TEXT,
+    image_url    TEXT,
+    quantity     TEXT,
+    price        REAL    NOT NULL,
+    unit_price   TEXT,
+    market_adi   TEXT    NOT NULL,
+    latitude     REAL    NOT NULL,
+    longitude    REAL    NOT NULL,
+    PRIMARY KEY (keyword, depot_set, page, size, depot_id, product_key)
+);
+CREATE INDEX IF NOT EXISTS idx_product_prices_depot ON product_prices (depot_id);
+CREATE INDEX IF NOT EXISTS idx_product_prices_product ON product_prices (product_key);
+"""
+
+_OLD_TABLES = ("search_coverage", "search_pages", "product_prices")
+
+
+def _product_key(item: ContentItem) -> str:
+    return item.id or "|".join([item.title, item.brand or "", item.refined_quantity_unit or ""])
+
+
+class PriceSnapshotStore:
+    """
+    Arama sonuçlarını SQLite'ta saklayan, sayfa bazında tazelik bilgisi tutan depo.
+    Metotlar senkrondur; asenkron koddan `asyncio.to_thread` ile çağrılmalıdır.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite veritabanı dosyasının yolu.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < _SCHEMA_VERSION:
+            for table in _OLD_TABLES:
+                self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        self._conn.executescript(_SCHEMA)
+        # Kayıt sayıları /metrics her okunduğunda tabloyu saymamak için bellekte tutulur.
+        self._price_rows = self._conn.execute("SELECT COUNT(*) FROM product_prices").fetchone()[0]
+        self._page_rows = self._conn.execute("SELECT COUNT(*) FROM search_pages").fetchone()[0]
+
+    def read(
+        self, keyword: str, depot_set: str, page: int, size: int, max_age: Optional[float]
+    ) -> Optional[ApiSearchResponse]:
+        """
+        Bir sonuç sayfasının kaydedilmiş halini okur.
+
+        Args:
+            keyword: Normalize edilmiş arama kelimesi.
+            depot_set: Sorgulanan market kümesinin özeti.
+            page: Sonuç sayfası.
+            size: Sayfa boyutu.
+            max_age: Saniye cinsinden en fazla veri yaşı; None ise yaşa bakılmaz.
+
+        Returns:
+            Kayıtlı ve yeterince taze sayfa varsa yanıtı, yoksa None.
+        """
+        min_fetched_at = time.time() - max_age if max_age is not None else float("-inf")
+        key = (keyword, depot_set, page, size)
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT number_of_found FROM search_pages WHERE keyword = ? AND depot_set = ? AND page = ? "
+                "AND size = ? AND fetched_at >= ?",
+                (*key, min_fetched_at),
+            ).fetchone()
+            if found is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT product_key, item_id, title, brand, image_url, quantity, depot_id, price, "
+                "unit_price, market_adi, latitude, longitude FROM product_prices "
+                "WHERE keyword = ? AND depot_set = ? AND page = ? AND size = ? ORDER BY position",
+                key,
+            ).fetchall()
+        return self._rows_to_response(rows, found[0])
+
+    @staticmethod
+    def _rows_to_response(rows: List[tuple], number_of_found: Optional[int]) -> ApiSearchResponse:
+        # Veriler daha önce doğrulanarak yazıldığı için model_construct ile yeniden doğrulama yapılmaz.
+        items: Dict[str, ContentItem] = {}
+        for (product_key, item_id, title, brand, image_url, quantity,
+             depot_id, price, unit_price, market_adi, latitude, longitude) in rows:
+            item = items.get(product_key)
+            if item is None:
+                item = items[product_key] = ContentItem.model_construct(
+                    id=item_id, title=title, brand=brand, image_url=image_url,
+                    refined_quantity_unit=quantity, product_depot_info_list=[],
+                )
+            item.product_depot_info_list.append(ProductDepotInfo.model_construct(
+                depot_id=depot_id, price=price, unit_price=unit_price,
+                market_adi=market_adi, latitude=latitude, longitude=longitude,
+            ))
+        return ApiSearchResponse.model_construct(content=list(items.values()), number_of_found=number_of_found)
+
+    def write(
+        self, keyword: str, depot_set: str, page: int, size: int, response: ApiSearchResponse
+    ) -> None:
+        """Upstream'den alınan sonuç sayfasını, aynı sayfanın eski kaydının yerine yazar."""
+        now = time.time()
+        key = (keyword, depot_set, page, size)
+        # Aynı (market, ürün) sayfada iki kez geçerse, INSERT OR REPLACE gibi sonuncusu kalır.
+        price_rows = {
+            (d.depot_id, _product_key(item)): (
+                *key, d.depot_id, _product_key(item), position, item.id, item.title, item.brand,
+                item.image_url, item.refined_quantity_unit, d.price, d.unit_price, d.market_adi,
+                d.latitude, d.longitude,
+            )
+            for position, item in enumerate(response.content)
+            for d in item.product_depot_info_list
+        }
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                deleted_prices = self._conn.execute(
+                    "DELETE FROM product_prices WHERE keyword = ? AND depot_set = ? AND page = ? AND size = ?", key
+                ).rowcount
+                deleted_pages = self._conn.execute(
+                    "DELETE FROM search_pages WHERE keyword = ? AND depot_set = ? AND page = ? AND size = ?", key
+                ).rowcount
+                self._conn.executemany(
+                    "INSERT INTO product_prices VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    price_rows.values(),
+                )
+                self._conn.execute(
+                    "INSERT INTO search_pages VALUES (?, ?, ?, ?, ?, ?)", (*key, response.number_of_found, now)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._price_rows += len(price_rows) - deleted_prices
+            self._page_rows += 1 - deleted_pages
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Depodaki kayıt sayılarını veritabanına erişmeden döndürür. Sayılar açılıştaki
+        durum ile bu sürecin yazmalarından hesaplanır; aynı dosyayı kullanan başka
+        süreçlerin yazmaları bir sonraki açılışta yansır.
+        """
+        return {"price_rows": self._price_rows, "page_rows": self._page_rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
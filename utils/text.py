@@ -0,0 +1,147 @@
+"""
+Türkçe arama kelimelerini sadeleştirme (canonicalization) ve arama sonuçlarını
+yerel olarak alaka düzeyine göre süzme yardımcı programları.
+"""
+import json
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set
+
+# Türkçeye özgü harflerin ASCII karşılıkları (ı/i ayrımı ve şapkalı harfler dahil).
+_FOLD_TABLE = str.maketrans({
+    "ç": "c", "ğ": "g", "ı": "i", "ö": "o", "ş": "s", "ü": "u",
+    "â": "a", "î": "i", "û": "u",
+})
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Sadeleştirilmiş (katlanmış) yazım -> upstream'e gönderilecek tercih edilen arama.
+# Aynı ürün için farklı yazımlar tek bir önbellek anahtarında ve tek bir upstream isteğinde birleşir.
+DEFAULT_SYNONYMS: Dict[str, str] = {
+    "sut": "süt",
+    "yogurt": "yoğurt",
+    "yoghurt": "yoğurt",
+    "seker": "şeker",
+    "toz seker": "toz şeker",
+    "cay": "çay",
+    "kofte": "köfte",
+    "peynir beyaz": "beyaz peynir",
+    "zeytin yagi": "zeytinyağı",
+    "zeytinyagi": "zeytinyağı",
+    "aycicek yagi": "ayçiçek yağı",
+    "aycicegi yagi": "ayçiçek yağı",
+    "tuvalet kagidi": "tuvalet kağıdı",
+    "kagit havlu": "kağıt havlu",
+    "cocuk bezi": "bebek bezi",
+    "bulasik deterjani": "bulaşık deterjanı",
+    "camasir deterjani": "çamaşır deterjanı",
+    "domates salcasi": "domates salçası",
+    "salca": "salça",
+    "pirinc": "pirinç",
+}
+
+
+class CanonicalQuery(NamedTuple):
+    """Bir arama kelimesinin önbellek anahtarı ve upstream'e gönderilecek biçimi."""
+    key: str
+    query: str
+
+
+def turkish_lower(text: str) -> str:
+    """Türkçe kurallarıyla küçük harfe çevirir ('I' -> 'ı', 'İ' -> 'i')."""
+    return text.replace("I", "ı").replace("İ", "i").lower()
+
+
+def fold_diacritics(text: str) -> str:
+    """Küçük harfli metindeki Türkçe ve diğer aksanlı harfleri ASCII karşılıklarına indirger."""
+    text = text.translate(_FOLD_TABLE)
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+@lru_cache(maxsize=65536)
+def fold_text(text: str) -> str:
+    """Metni eşleştirme için sadeleştirir: Türkçe küçük harf, aksansız, tek boşluklu."""
+    return " ".join(_TOKEN_RE.findall(fold_diacritics(turkish_lower(text))))
+
+
+@lru_cache(maxsize=65536)
+def tokenize(text: str) -> Sequence[str]:
+    """Metni sadeleştirilmiş kelimelere böler."""
+    return tuple(fold_text(text).split())
+
+
+def load_synonyms(path: Optional[str]) -> Dict[str, str]:
+    """
+    Varsayılan eş anlamlılar tablosunu, verilmişse bir JSON dosyasıyla
+    ({"yazım": "tercih edilen arama"}) genişleterek döndürür.
+    """
+    synonyms = dict(DEFAULT_SYNONYMS)
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            synonyms.update((fold_text(k), v) for k, v in json.load(f).items())
+    return synonyms
+
+
+class QueryCanonicalizer:
+    """
+    Kullanıcının yazdığı ürün adlarını sadeleştirir. "Süt", "sut " ve "SÜT" aynı
+    anahtara ve aynı upstream aramasına dönüşür.
+    """
+
+    def __init__(self, synonyms: Optional[Dict[str, str]] = None, maxsize: int = 65536):
+        self.synonyms = DEFAULT_SYNONYMS if synonyms is None else synonyms
+        self.canonicalize = lru_cache(maxsize=maxsize)(self._canonicalize)
+
+    def _canonicalize(self, text: str) -> CanonicalQuery:
+        folded = fold_text(text)
+        preferred = self.synonyms.get(folded)
+        if preferred is not None:
+            return CanonicalQuery(fold_text(preferred), preferred)
+        # Eş anlamlısı yoksa upstream'e kullanıcının yazımı (Türkçe küçük harfle) gönderilir.
+        return CanonicalQuery(folded, " ".join(turkish_lower(text).split()))
+
+
+class RelevanceIndex:
+    """
+    Bir arama yanıtındaki ürünlerin başlık ve marka kelimeleri üzerine kurulan
+    ters indeks (inverted index). Sorgu kelimelerinin ürünlerde geçme oranına
+    göre puanlama yapar; kelimeler önek olarak da eşleşir ("süt" -> "sütlü").
+    """
+
+    def __init__(self, documents: Iterable[Sequence[Optional[str]]]):
+        """
+        Args:
+            documents: Her ürün için (başlık, marka) gibi metin alanları.
+        """
+        self._postings: Dict[str, Set[int]] = {}
+        self.size = 0
+        for doc_id, fields in enumerate(documents):
+            self.size += 1
+            for field in fields:
+                if not field:
+                    continue
+                for token in tokenize(field):
+                    self._postings.setdefault(token, set()).add(doc_id)
+
+    def _matching(self, query_token: str) -> Set[int]:
+        exact = self._postings.get(query_token)
+        matched = set(exact) if exact else set()
+        for token, doc_ids in self._postings.items():
+            if token != query_token and token.startswith(query_token):
+                matched |= doc_ids
+        return matched
+
+    def scores(self, query: str) -> List[float]:
+        """Her ürün için, sorgu kelimelerinden kaçının eşleştiğinin oranını (0-1) döndürür."""
+        query_tokens = set(tokenize(query))
+        if not query_tokens:
+            return [1.0] * self.size
+        counts = [0] * self.size
+        for query_token in query_tokens:
+            for doc_id in self._matching(query_token):
+                counts[doc_id] += 1
+        return [count / len(query_tokens) for count in counts]
@@ -0,0 +1,150 @@
+"""
+Dashboard'un ürettiği token'ları saklayan SQLite tabanlı depo.
+
+Token'lar özetleri (SHA-256) birincil anahtar olacak şekilde tutulur; iptal ve
+arama tek satırlık indeksli işlemlerdir. Listeleme sayfalı yapılır.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from utils.auth import token_hash
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tokens (
+    token_hash  TEXT PRIMARY KEY,
+    subject     TEXT NOT NULL,
+    token       TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    revoked_at  REAL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_tokens_active ON tokens (revoked_at, created_at);
+"""
+
+
+class TokenStore:
+    """
+    Token'ları SQLite'ta saklayan depo. Her yazma tek bir işlem (transaction)
+    içinde yapıldığı için eş zamanlı istekler birbirinin yazdığını ezmez.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLite veritabanı dosyasının yolu.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    def add(self, subject: str, token: str) -> str:
+        """Yeni bir token kaydeder ve özetini döndürür."""
+        digest = token_hash(token)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO tokens (token_hash, subject, token, created_at) VALUES (?, ?, ?, ?)",
+                (digest, subject, token, time.time()),
+            )
+        return digest
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Özeti verilen token kaydını döndürür; yoksa None döner."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT token_hash, subject, token, created_at, revoked_at FROM tokens WHERE token_hash = ?",
+                (digest,),
+            ).fetchone()
+        return None if row is None else self._row_to_dict(row)
+
+    def revoke(self, digest: str) -> Optional[str]:
+        """
+        Token'ı iptal edilmiş olarak işaretler.
+
+        Returns:
+            İptal edilen token metni; token yoksa veya zaten iptal edildiyse None.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT token FROM tokens WHERE token_hash = ? AND revoked_at IS NULL", (digest,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE tokens SET revoked_at = ? WHERE token_hash = ?", (time.time(), digest)
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return None if row is None else row[0]
+
+    def list_active(self, page: int = 0, page_size: int = 50) -> List[Dict[str, Any]]:
+        """Aktif token'ları en yeniden başlayarak sayfa sayfa döndürür."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT token_hash, subject, token, created_at, revoked_at FROM tokens "
+                "WHERE revoked_at IS NULL ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (page_size, page * page_size),
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def count_active(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tokens WHERE revoked_at IS NULL").fetchone()[0]
+
+    def import_json(self, json_path: str) -> int:
+        """
+        Eski `tokens.json` dosyasındaki token'ları depoya aktarır ve dosyayı
+        '.migrated' uzantısıyla yeniden adlandırır.
+
+        Returns:
+            Aktarılan token sayısı.
+        """
+        if not os.path.exists(json_path):
+            return 0
+        try:
+            with open(json_path, "r") as f:
+                tokens = json.load(f)
+        except json.JSONDecodeError:
+            tokens = []
+        now = time.time()
+        rows = [
+            # Eski listedeki sıra korunsun diye oluşturulma zamanları artan şekilde verilir.
+            (token_hash(t["token"]), t.get("subject", ""), t["token"], now + i * 1e-6)
+            for i, t in enumerate(tokens) if t.get("token")
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO tokens (token_hash, subject, token, created_at) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        os.replace(json_path, json_path + ".migrated")
+        return len(rows)
+
+    @staticmethod
+    def _row_to_dict(row: tuple) -> Dict[str, Any]:
+        digest, subject, token, created_at, revoked_at = row
+        return {
+            "token_hash": digest,
+            "subject": subject,
+            "token": token,
+            "created_at": created_at,
+            "revoked_at": revoked_at,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
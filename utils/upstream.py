@@ -0,0 +1,323 @@
+"""
+marketfiyati.org.tr API'sine yapılan isteklerin yürütülmesi için yardımcı programlar:
+uyarlanabilir eş zamanlılık sınırı, yeniden deneme ve devre kesici (circuit breaker).
+"""
+import asyncio
+import contextvars
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Union
+
+import httpx
+
+from utils.metrics import MetricsRegistry
+
+# `count_attempts` bloğu içinde (ve oradan başlatılan görevlerde) host başına yapılan upstream denemeleri.
+_attempt_counts: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar(
+    "upstream_attempt_counts", default=None
+)
+
+
+@contextmanager
+def count_attempts() -> Iterator[Dict[str, int]]:
+    """
+    Blok içinde upstream'e gönderilen istekleri, yeniden denemeler dahil, host bazında
+    dönen sözlükte sayar. Başka bir çağrının başlattığı ve ortak beklenen (single-flight)
+    istekler, onu başlatan çağrıya sayılır.
+    """
+    counts: Dict[str, int] = {}
+    token = _attempt_counts.set(counts)
+    try:
+        yield counts
+    finally:
+        _attempt_counts.reset(token)
+
+
+class CircuitOpenError(Exception):
+    """Devre kesici açıkken upstream'e istek gönderilmeye çalışıldığında fırlatılır."""
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Gözlenen gecikme ve aşırı yük yanıtlarına (429/5xx) göre ayarlanan
+    eş zamanlılık sınırı (AIMD: toplamsal artış, çarpımsal azalış).
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int,
+        max_limit: int,
+        target_latency: float,
+        decrease_factor: float = 0.7,
+    ):
+        """
+        Args:
+            initial_limit: Başlangıçtaki eş zamanlı istek sınırı.
+            min_limit: Sınırın düşebileceği en küçük değer.
+            max_limit: Sınırın çıkabileceği en büyük değer.
+            target_latency: Saniye cinsinden hedef gecikme; altında kalındıkça sınır artar.
+            decrease_factor: Aşırı yük görüldüğünde sınırın çarpılacağı katsayı.
+        """
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def current_limit(self) -> int:
+        return max(1, int(self.limit))
+
+    async def acquire(self) -> None:
+        """Bir istek yuvası boşalana kadar bekler ve yuvayı ayırır."""
+        if self.in_flight < self.current_limit and not self._waiters:
+            self.in_flight += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Yuva tam iptal anında verilmişti; geri bırakıp sıradakini uyandır.
+                self.in_flight -= 1
+                self._wake_waiters()
+            else:
+                try:
+                    self._waiters.remove(future)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self, latency: float, overloaded: bool) -> None:
+        """
+        Yuvayı bırakır ve sınırı isteğin sonucuna göre günceller.
+
+        Args:
+            latency: İsteğin saniye cinsinden süresi.
+            overloaded: Upstream'in aşırı yük belirtisi (429/5xx/zaman aşımı) verip vermediği.
+        """
+        self.in_flight -= 1
+        if overloaded:
+            self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        elif latency <= self.target_latency:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        elif latency > 2 * self.target_latency:
+            self.limit = max(self.min_limit, self.limit * 0.95)
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self.in_flight < self.current_limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": self.current_limit, "in_flight": self.in_flight, "waiting": len(self._waiters)}
+
+
+class CircuitBreaker:
+    """
+    Art arda gelen hatalardan sonra devreyi açarak upstream çökmüşken
+    isteklerin hızlıca başarısız olmasını sağlar. `reset_timeout` sonra
+    tek bir deneme isteğine (half-open) izin verilir.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float, timer: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            failure_threshold: Devreyi açacak art arda hata sayısı.
+            reset_timeout: Açık devrenin deneme isteğine izin vermeden önce bekleyeceği süre (saniye).
+            timer: Zaman kaynağı.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._timer = timer
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow_request(self) -> bool:
+        """İsteğin gönderilip gönderilemeyeceğini döndürür."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if self._timer() - self._opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        if self._probe_in_flight:
+            return False
+        self._probe_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = self._timer()
+        self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """Sonucu bilinmeyen (örn. iptal edilen) bir deneme isteğinin hakkını geri verir."""
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.consecutive_failures}
+
+
+class _HostState:
+    """Bir upstream sunucusu (host) için sınırlayıcı, devre kesici ve sayaçlar."""
+
+    def __init__(self, limiter: AdaptiveConcurrencyLimiter, breaker: CircuitBreaker):
+        self.limiter = limiter
+        self.breaker = breaker
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+
+
+class UpstreamExecutor:
+    """
+    Upstream isteklerini host bazında eş zamanlılık sınırı, üstel geri çekilmeli
+    (jitter'lı) yeniden deneme ve devre kesici ile yürütür.
+    """
+
+    def __init__(
+        self,
+        client: Union[httpx.AsyncClient, Callable[[], httpx.AsyncClient]],
+        max_retries: int = 2,
+        backoff_base: float = 0.2,
+        backoff_max: float = 2.0,
+        initial_limit: int = 16,
+        min_limit: int = 2,
+        max_limit: int = 64,
+        target_latency: float = 1.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 15.0,
+        metrics: Optional[MetricsRegistry] = None,
+    ):
+        self.client = client
+        self.metrics = metrics or MetricsRegistry(enabled=False)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._limiter_args = (initial_limit, min_limit, max_limit, target_latency)
+        self._breaker_args = (failure_threshold, reset_timeout)
+        self._hosts: Dict[str, _HostState] = {}
+
+    def _client(self) -> httpx.AsyncClient:
+        # İstemci yerine onu döndüren bir fonksiyon verildiyse, istemci ilk istekte oluşturulur.
+        return self.client if isinstance(self.client, httpx.AsyncClient) else self.client()
+
+    def _host_state(self, url: str) -> _HostState:
+        host = httpx.URL(url).host
+        state = self._hosts.get(host)
+        if state is None:
+            state = _HostState(
+                AdaptiveConcurrencyLimiter(*self._limiter_args), CircuitBreaker(*self._breaker_args)
+            )
+            self._hosts[host] = state
+        return state
+
+    def _backoff_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        """Full-jitter üstel geri çekilme süresi; 429'da Retry-After başlığına uyar."""
+        if response is not None and response.status_code == 429:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def post(self, url: str, json: Any, idempotent: bool = True) -> httpx.Response:
+        """
+        POST isteğini gönderir ve başarılı yanıtı döndürür.
+
+        Args:
+            url: İstek adresi.
+            json: Gönderilecek JSON gövdesi.
+            idempotent: True ise geçici hatalarda (bağlantı, 429, 5xx) istek yeniden denenir.
+
+        Returns:
+            2xx/3xx durum kodlu yanıt.
+
+        Raises:
+            CircuitOpenError: Devre kesici açıksa.
+            httpx.HTTPError: Yeniden denemeler tükendikten sonra son hata.
+        """
+        state = self._host_state(url)
+        host = httpx.URL(url).host
+        attempts = self.max_retries + 1 if idempotent else 1
+        for attempt in range(attempts):
+            if not state.breaker.allow_request():
+                state.rejected += 1
+                self.metrics.upstream_errors.inc(host, "circuit_open")
+                raise CircuitOpenError(f"'{host}' için devre kesici açık, istek gönderilmedi.")
+
+            await state.limiter.acquire()
+            state.requests += 1
+            counts = _attempt_counts.get()
+            if counts is not None:
+                counts[host] = counts.get(host, 0) + 1
+            started = time.monotonic()
+            response: Optional[httpx.Response] = None
+            error: Optional[Exception] = None
+            try:
+                response = await self._client().post(url, json=json)
+            except httpx.TransportError as e:
+                error = e
+            except BaseException:
+                state.limiter.release(time.monotonic() - started, overloaded=False)
+                state.breaker.release_probe()
+                raise
+            overloaded = error is not None or response.status_code == 429 or response.status_code >= 500
+            latency = time.monotonic() - started
+            state.limiter.release(latency, overloaded=overloaded)
+            self.metrics.record_stage("upstream_request", latency)
+            if error is not None:
+                self.metrics.upstream_errors.inc(host, type(error).__name__)
+            else:
+                self.metrics.upstream_responses.inc(host, str(response.status_code))
+
+            if not overloaded:
+                state.breaker.record_success()
+                response.raise_for_status()
+                return response
+
+            state.breaker.record_failure()
+            state.failures += 1
+            if attempt == attempts - 1:
+                if error is not None:
+                    raise error
+                response.raise_for_status()
+            state.retries += 1
+            await asyncio.sleep(self._backoff_delay(attempt, response))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Host bazında sınırlayıcı, devre kesici ve istek sayaçlarını döndürür."""
+        return {
+            host: {
+                **state.limiter.stats(),
+                **state.breaker.stats(),
+                "requests": state.requests,
+                "retries": state.retries,
+                "failures": state.failures,
+                "rejected": state.rejected,
+            }
+            for host, state in self._hosts.items()
+        }